@@ -0,0 +1,162 @@
+"""
+Runs Ontolopy's benchmarks and writes the results as JSON, e.g. to compare them across commits:
+
+    python benchmarks/run.py --terms 20000 --output results.json
+    python benchmarks/run.py --terms 20000 --compare results.json
+
+Each benchmark is timed `--repeat` times (keeping the fastest), then run once more to measure peak memory (with
+`tracemalloc`).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ontolopy as opy  # noqa: E402
+from ontolopy.synthetic import write_synthetic_obo  # noqa: E402
+
+uberon_subset = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'uberon-subset.obo')
+
+
+def benchmarks(args, data_dir):
+    """
+    Prepares the data for the benchmarks, and returns {name: (function with no arguments, number of items)}.
+    """
+    rng = random.Random(args.seed)
+    synthetic_obo = os.path.join(data_dir, 'synthetic.obo')
+    write_synthetic_obo(synthetic_obo, n_terms=args.terms, depth=args.depth, branching=args.branching,
+                        fan_in=args.fan_in, seed=args.seed)
+    ont = opy.load_obo(synthetic_obo, ont_ids=['SYN'])
+    names = [attributes['name'] for attributes in ont.values()]
+    uberon = opy.uberon_from_obo(opy.load_obo(uberon_subset, ont_ids=['UBERON', 'CL']))
+    cells = ['CL:0000746', 'CL:0000540', 'CL:0000182']
+
+    terms = list(ont)
+    sources = rng.sample(terms, min(args.sources, len(terms)))
+    targets = rng.sample(terms, max(1, len(terms) // 100))
+    source_targets = list(zip(sources, rng.choices(terms, k=len(sources))))
+    sample_names = rng.choices(names, k=args.names)
+    misspelt = [name[:-4] + name[-3:] for name in sample_names]  # drops one character
+    half = len(terms) // 2
+    first_half = opy.Obo({term: ont[term] for term in terms[:half]})
+    second_half = opy.Obo({term: ont[term] for term in terms[half - half // 10:]})  # overlaps first half
+
+    def relations():
+        ont.clear_cache()
+        return opy.Relations(['is_a', 'part_of'], ont, sources=sources, targets=targets)
+
+    def name_index():
+        ont.clear_cache()
+        return ont.name_index()
+
+    def import_ontolopy():
+        subprocess.run([sys.executable, '-c', 'import ontolopy'], check=True,
+                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    return {
+        'import': (import_ontolopy, 1),
+        'load_obo/synthetic': (lambda: opy.load_obo(synthetic_obo, ont_ids=['SYN']), args.terms),
+        'load_obo/uberon_subset': (lambda: opy.load_obo(uberon_subset, ont_ids=['UBERON', 'CL']), len(uberon)),
+        'relations/any': (relations, len(sources)),
+        'relations/pair': (lambda: opy.Relations(['is_a', 'part_of'], ont, source_targets=source_targets, mode='pair'),
+                           len(sources)),
+        'names/index': (name_index, args.terms),
+        'names/exact': (lambda: opy.Uberon.sample_map_by_name(ont, sample_names, to=['SYN']), len(sample_names)),
+        'names/fuzzy': (lambda: opy.Uberon.sample_map_by_name(ont, misspelt, to=['SYN'], fuzzy=True),
+                        len(misspelt)),
+        'uberon_subset/sample_map_by_ont': (lambda: uberon.sample_map_by_ont(cells), len(cells)),
+        'merge': (lambda: first_half.merge(second_half), len(terms)),
+    }
+
+
+def measure(function, repeat):
+    """
+    :return: (fastest time in seconds, peak memory in bytes)
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run Ontolopy benchmarks.')
+    parser.add_argument('--terms', type=int, default=20000, help='number of terms in the synthetic ontology')
+    parser.add_argument('--depth', type=int, default=10, help='maximum depth of the synthetic ontology')
+    parser.add_argument('--branching', type=int, default=4, help='maximum number of children of each term')
+    parser.add_argument('--fan-in', type=float, default=0.1, help='probability that a term has a second parent')
+    parser.add_argument('--sources', type=int, default=200, help='number of sources to find relations for')
+    parser.add_argument('--names', type=int, default=2000, help='number of names to map')
+    parser.add_argument('--repeat', type=int, default=3, help='number of times to time each benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    parser.add_argument('--compare', help='JSON file of earlier results to compare with')
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        for name, (function, n_items) in benchmarks(args, data_dir).items():
+            if args.filter not in name:
+                continue
+            seconds, peak = measure(function, args.repeat)
+            results[name] = {
+                'seconds': seconds,
+                'items': n_items,
+                'seconds_per_item': seconds / n_items,
+                'items_per_second': n_items / seconds if seconds else None,
+                'peak_memory_mb': peak / 2 ** 20,
+            }
+
+    report = {
+        'commit': commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': vars(args),
+        'results': results,
+    }
+
+    earlier = {}
+    if args.compare:
+        with open(args.compare) as f:
+            earlier = json.load(f)['results']
+
+    print(f"{'benchmark':36} {'seconds':>10} {'items/s':>12} {'peak MB':>9}" + ('  vs earlier' if earlier else ''))
+    for name, result in results.items():
+        line = (f"{name:36} {result['seconds']:10.4f} {result['items_per_second'] or 0:12.1f} "
+                f"{result['peak_memory_mb']:9.1f}")
+        if name in earlier:
+            line += f"  {result['seconds'] / earlier[name]['seconds']:.2f}x time"
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
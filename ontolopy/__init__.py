@@ -1,3 +1,35 @@
 from .obo import Obo, download_obo, load_obo
-from .relations import Relations, relation_path_to_text
-from .uberon import Uberon, uberon_from_obo
+from .progress import CancelToken
+
+# Loaded when first used, as they import pandas and NumPy, which are slow to import.
+_lazy_attributes = {
+    'Relations': 'relations',
+    'iter_relation_paths': 'relations',
+    'iter_relations': 'relations',
+    'read_relations': 'relations',
+    'relation_path_to_text': 'relations',
+    'shortest_relation': 'relations',
+    'write_relations': 'relations',
+    'Uberon': 'uberon',
+    'uberon_from_obo': 'uberon',
+}
+_lazy_modules = ['aio', 'cli', 'graph', 'names', 'parquet', 'relations', 'server', 'similarity', 'synthetic',
+                 'uberon']
+
+__all__ = ['Obo', 'download_obo', 'load_obo', 'CancelToken'] + list(_lazy_attributes)
+
+
+def __getattr__(name):
+    import importlib
+
+    if name in _lazy_attributes:
+        value = getattr(importlib.import_module(f'.{_lazy_attributes[name]}', __name__), name)
+        globals()[name] = value
+        return value
+    if name in _lazy_modules:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes) | set(_lazy_modules))
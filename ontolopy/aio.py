@@ -0,0 +1,206 @@
+"""
+This module contains code for using Ontolopy from asyncio applications (e.g. web services) without blocking the event
+loop: `AsyncMapper` runs `Relations` and `Uberon.sample_map_by_name` in a background executor.
+
+Requests with the same configuration that arrive in the same tick of the event loop are coalesced into one job, e.g.:
+
+    mapper = AsyncMapper(uberon)
+    relations_a, relations_b = await asyncio.gather(
+        mapper.relations(['is_a', 'part_of'], sources_a, targets=['UBERON']),
+        mapper.relations(['is_a', 'part_of'], sources_b, targets=['UBERON']),
+    )
+
+searches from the sources of both requests in one `Relations` job (each source once), and then splits the results.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .relations import Relations
+
+
+def _freeze(value):
+    """
+    Hashable version of a configuration value (lists become tuples, etc.). Values that can't be hashed (e.g. a
+    `NameIndex`) are identified by their `id`, so only requests sharing the same object are coalesced.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    try:
+        hash(value)
+    except TypeError:
+        return 'id', id(value)
+    return value
+
+
+class AsyncMapper:
+    """
+    Async entry points for mapping with an ontology. Jobs run one at a time (by default) in a background thread, so
+    they share the ontology's cached indexes (e.g. the reverse adjacency and name index), which are built once by the
+    first job that needs them.
+    """
+
+    def __init__(self, ont, executor=None, max_workers=1):
+        """
+        :param ont: Obo ontology object (an `Uberon` object for `sample_map_by_name`).
+        :param executor: optional `concurrent.futures.Executor` to run jobs in. It must share memory with the event
+          loop (e.g. a `ThreadPoolExecutor`) and is not shut down by `close()`.
+        :param max_workers: number of threads of the executor created if `executor` is not given.
+        """
+        self.ont = ont
+        self._own_executor = executor is None
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers, thread_name_prefix='ontolopy')
+        self.executor = executor
+        # (kind, frozen configuration): [(items, future, extra)] for the requests of the current tick
+        self._pending = {}
+
+    async def relations(self, allowed_relations, sources=None, targets=None, source_targets=None, **kwargs):
+        """
+        Finds relations without blocking the event loop (see `Relations`). Coalesced with other requests with the same
+        arguments (apart from `sources`/`source_targets`) in the same tick.
+
+        :param allowed_relations: a list of allowed relations, e.g. ['is_a', 'part_of']
+        :param sources: list of sources (modes 'any' and 'all').
+        :param targets: list of targets (modes 'any' and 'all').
+        :param source_targets: list of (source, target) tuples (mode 'pair').
+        :param kwargs: other arguments for `Relations`, e.g. `mode`, `excluded`, `max_depth`.
+        :return: `pd.DataFrame` with the rows of `Relations` for these sources. Sources that were interrupted (see
+          `Relations.incomplete`) are listed in its `attrs['incomplete']`.
+        """
+        if source_targets is not None:
+            items = [tuple(source_target) for source_target in source_targets]
+        else:
+            items = list(sources)
+        kwargs = dict(kwargs, allowed_relations=list(allowed_relations), targets=targets,
+                      pair=source_targets is not None)
+        return await self._submit('relations', items, kwargs)
+
+    async def sample_map_by_name(self, sample_names, **kwargs):
+        """
+        Maps sample names to terms without blocking the event loop (see `Uberon.sample_map_by_name`). Coalesced with
+        other requests with the same arguments (apart from `sample_names`) in the same tick.
+
+        :param sample_names: map from sample identifiers to names (`dict` or `pd.Series`), or an iterable of names.
+        :param kwargs: other arguments for `Uberon.sample_map_by_name`, e.g. `to`, `fuzzy`, `xref`.
+        :return: `pd.DataFrame` (see `Uberon.sample_map_by_name`).
+        """
+        if isinstance(sample_names, dict):
+            sample_names = pd.Series(sample_names)
+        elif not isinstance(sample_names, pd.Series):
+            sample_names = pd.Series(list(sample_names))
+        items = [name for name in sample_names.unique() if not pd.isna(name)]
+        return await self._submit('names', items, kwargs, sample_names)
+
+    async def run(self, function, *args):
+        """
+        Runs any other function (e.g. `lambda: ont.similarity().lin(terms)`) in the mapper's executor.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    def close(self):
+        """
+        Shuts down the executor (if the mapper created it), after the jobs that have started.
+        """
+        if self._own_executor:
+            self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def _submit(self, kind, items, kwargs, extra=None):
+        loop = asyncio.get_running_loop()
+        key = (kind, _freeze(kwargs))
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            loop.call_soon(self._flush, key, kind, kwargs)
+        future = loop.create_future()
+        batch.append((items, future, extra))
+        return future
+
+    def _flush(self, key, kind, kwargs):
+        """
+        Starts one job for the requests with the same configuration in this tick.
+        """
+        batch = [request for request in self._pending.pop(key) if not request[1].cancelled()]
+        if not batch:
+            return
+        combined = list(dict.fromkeys(item for items, _, _ in batch for item in items))
+        run = self._run_relations if kind == 'relations' else self._run_names
+        job = asyncio.get_running_loop().run_in_executor(self.executor, run, combined, kwargs)
+        job.add_done_callback(lambda job: self._split(job, batch, combined, kind))
+
+    def _run_relations(self, combined, kwargs):
+        kwargs = dict(kwargs)
+        if kwargs.pop('pair'):
+            kwargs.pop('targets')
+            kwargs['source_targets'] = combined
+        else:
+            kwargs['sources'] = combined
+        return Relations(ont=self.ont, **kwargs)
+
+    def _run_names(self, combined, kwargs):
+        return self.ont.sample_map_by_name(combined, **kwargs)
+
+    @staticmethod
+    def _split(job, batch, combined, kind):
+        """
+        Sets the result of each request of a batch from the result of their job.
+        """
+        exception = None if job.cancelled() else job.exception()
+        if job.cancelled() or exception is not None:
+            for _, future, _ in batch:
+                if not future.done():
+                    if exception is None:
+                        future.cancel()
+                    else:
+                        future.set_exception(exception)
+            return
+
+        result = job.result()
+        for items, future, extra in batch:
+            if future.done():
+                continue
+            if kind == 'relations':
+                future.set_result(_relations_rows(result, combined, items))
+            else:
+                future.set_result(_sample_rows(result, combined, extra))
+
+
+def _relations_rows(relations, combined, items):
+    """
+    Rows of `relations` (found for the `combined` sources) for the sources `items`.
+    """
+    position = {item: i for i, item in enumerate(combined)}
+    rows = pd.DataFrame(relations).iloc[[position[item] for item in items]]
+    sources = set(rows.index)
+    rows.attrs = {'incomplete': {source: reason for source, reason in relations.incomplete.items()
+                                 if source in sources}}
+    return rows
+
+
+def _sample_rows(mapped, combined, sample_names):
+    """
+    Mapping of `sample_names` from the mapping `mapped` of the `combined` names.
+    """
+    name_to_term = dict(zip(combined, mapped.iloc[:, 1]))
+    incomplete_names = {combined[i]: reason for i, reason in mapped.attrs.get('incomplete', {}).items()}
+
+    rows = pd.DataFrame({
+        mapped.columns[0]: sample_names,
+        mapped.columns[1]: sample_names.map(name_to_term),
+    })
+    rows.index.rename(mapped.index.name, inplace=True)
+    rows.attrs['incomplete'] = {sample: incomplete_names[name] for sample, name in sample_names.items()
+                                if name in incomplete_names}
+    return rows
@@ -0,0 +1,289 @@
+"""
+This module contains Ontolopy's command-line interface, e.g.:
+
+    ontolopy download uberon-basic --out-dir data
+    ontolopy compile data/uberon.obo data/uberon --ont-ids UBERON CL
+    ontolopy map-by-ont --ontology data/uberon samples.csv --column sample_id --workers 4 --output tissues.csv
+    ontolopy map-by-name --ontology data/uberon samples.parquet --name-column tissue --id-column sample_id
+    ontolopy leaves --ontology data/uberon --prefix UBERON
+    ontolopy serve --ontology data/uberon --port 8765
+
+Ontologies can be `.obo` files (optionally gzip compressed) or directories compiled by `ontolopy compile` (see
+`Obo.to_parquet`), which load much faster. Samples are read (from CSV or Parquet files, or CSV from stdin with '-') and
+mapped `--chunk-size` rows at a time, and the results are written as they are found, to CSV (stdout by default) or
+Parquet files.
+"""
+
+import argparse
+import os
+import sys
+
+
+def _load(path, ont_ids):
+    """
+    Loads an ontology from an `.obo` file or a compiled (Parquet) directory.
+    """
+    from .obo import Obo, load_obo
+
+    if os.path.isdir(path):
+        return Obo.from_parquet(path)
+    return load_obo(path, ont_ids=ont_ids)
+
+
+def _load_uberon(args):
+    from .uberon import uberon_from_obo
+
+    return uberon_from_obo(_load(args.ontology, args.ont_ids))
+
+
+def _read_chunks(path, columns, chunksize, header=True):
+    """
+    Reads `columns` of a CSV or Parquet file (or CSV from stdin if `path` is '-'), `chunksize` rows at a time.
+
+    :param columns: list of column names, or of column numbers if there is no header. None for the first column.
+    :return: generator of `pd.DataFrame` chunks with the `columns`.
+    """
+    import pandas as pd
+
+    if str(path).endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        if columns is None:
+            columns = parquet_file.schema_arrow.names[:1]
+        n_rows = 0
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            # numbered by row in the file, like CSV chunks (each batch would start from 0)
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(n_rows, n_rows + len(chunk))
+            n_rows += len(chunk)
+            yield chunk
+        return
+
+    reader = pd.read_csv(sys.stdin if path == '-' else path, header=0 if header else None, dtype=str,
+                         keep_default_na=False, na_values=[''], chunksize=chunksize)
+    for chunk in reader:
+        yield chunk.iloc[:, [0]] if columns is None else chunk[columns]
+
+
+def _column(value, header):
+    """
+    Column name, or number (counting from 0) if the input has no header.
+    """
+    if value is None or header:
+        return value
+    return int(value)
+
+
+class _FrameWriter:
+    """
+    Writes `pd.DataFrame` chunks (with their index) to a CSV file (stdout if `path` is None) or a Parquet file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.n_rows = 0
+        self._parquet = None
+
+    def write(self, frame):
+        frame = frame.reset_index()
+        if self.path is not None and str(self.path).endswith('.parquet'):
+            self._write_parquet(frame)
+        else:
+            frame.to_csv(sys.stdout if self.path is None else self.path, mode='a' if self.n_rows else 'w',
+                         header=not self.n_rows, index=False)
+        self.n_rows += len(frame)
+
+    def _write_parquet(self, frame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # strings, with missing values (e.g. unmapped samples) as nulls
+        frame = frame.astype(str).where(frame.notna(), None)
+        if self._parquet is None:
+            schema = pa.schema([(column, pa.string()) for column in frame.columns])
+            self._parquet = pq.ParquetWriter(self.path, schema)
+        self._parquet.write_table(pa.Table.from_pandas(frame, schema=self._parquet.schema, preserve_index=False))
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def download(args):
+    from .obo import download_obo
+
+    print(download_obo(args.name, out_dir=args.out_dir))
+
+
+def compile_ontology(args):
+    from .obo import load_obo
+
+    ont = load_obo(args.obo, ont_ids=args.ont_ids)
+    ont.to_parquet(args.out_dir, compression=args.compression)
+    print(f'Compiled {len(ont)} terms to {args.out_dir}', file=sys.stderr)
+
+
+def map_by_ont(args):
+    from .relations import iter_relations
+
+    uberon = _load_uberon(args)
+    exclude, relation_types, to = uberon._sample_map_config(args.exclude, args.relations, args.to)
+    column = _column(args.column, not args.no_header)
+    sources = (sample for chunk in _read_chunks(args.input, None if column is None else [column], args.chunk_size,
+                                               not args.no_header)
+               for sample in chunk.iloc[:, 0].dropna())
+    chunks = iter_relations(relation_types, uberon, sources, targets=to, excluded=exclude, chunksize=args.chunk_size,
+                            processes=args.workers or None, direction='down' if args.child_mapping else 'up')
+
+    writer = _FrameWriter(args.output)
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+    finally:
+        writer.close()
+    return writer.n_rows
+
+
+def map_by_name(args):
+    import pandas as pd
+    from collections import deque
+    from .names import match_names
+    from .uberon import _sample_map_frame
+
+    uberon = _load_uberon(args)
+    to = args.to or ['UBERON']
+    name_index = uberon.name_index(to, args.synonym_types)
+    preferred = None if args.xref is None else uberon.xref_index().terms_with(args.xref)
+    header = not args.no_header
+    name_column = _column(args.name_column, header)
+    id_column = _column(args.id_column, header)
+    columns = None if name_column is None else [name_column]
+    if id_column is not None:
+        if name_column is None:
+            sys.exit('ontolopy map-by-name: --name-column is needed with --id-column')
+        columns = [id_column, name_column]
+    # each worker matches its share of a chunk
+    match_chunksize = -(-args.chunk_size // args.workers) if args.workers else args.chunk_size
+
+    # (sample names, unique names) of the chunks that have been read but not written yet
+    pending = deque()
+
+    def unique_names():
+        for chunk in _read_chunks(args.input, columns, args.chunk_size, header):
+            sample_names = chunk.iloc[:, -1]
+            if id_column is not None:
+                sample_names.index = chunk.iloc[:, 0]
+            names = [name for name in sample_names.unique() if not pd.isna(name)]
+            pending.append((sample_names, names))
+            yield from names
+
+    # one call (and so one pool of workers) for the names of all the chunks
+    matched = match_names(name_index, unique_names(), preferred, args.fuzzy, args.min_similarity,
+                          args.workers or None, match_chunksize)
+    terms = []
+    writer = _FrameWriter(args.output)
+
+    def write_chunk():
+        sample_names, names = pending.popleft()
+        name_to_term = {name: float('nan') if term is None else term for name, term in zip(names, terms)}
+        del terms[:len(names)]
+        writer.write(_sample_map_frame(sample_names, name_to_term, ['from', 'name_matched_on', 'to']))
+
+    try:
+        for term in matched:
+            terms.append(term)
+            while pending and len(terms) >= len(pending[0][1]):
+                write_chunk()
+        while pending:
+            write_chunk()
+    finally:
+        matched.close()
+        writer.close()
+    return writer.n_rows
+
+
+def leaves(args):
+    ont = _load(args.ontology, args.ont_ids)
+    for term in sorted(ont._get_leaves(args.prefix, args.relations)):
+        print(term)
+
+
+def serve(args):
+    from .server import serve as serve_ontology
+
+    serve_ontology(_load_uberon(args), args.host, args.port, args.cache_size)
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='ontolopy', description='Work with ontology (.obo) files.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ontology = argparse.ArgumentParser(add_help=False)
+    ontology.add_argument('--ontology', required=True,
+                          help='.obo file (optionally gzip compressed) or directory made by `ontolopy compile`')
+    ontology.add_argument('--ont-ids', nargs='+', default=['UBERON', 'CL'],
+                          help='ontology prefixes of terms to load from .obo files (default: UBERON CL)')
+
+    samples = argparse.ArgumentParser(add_help=False)
+    samples.add_argument('input', nargs='?', default='-', help="CSV or Parquet file of samples, or '-' for stdin")
+    samples.add_argument('--no-header', action='store_true',
+                         help='CSV input has no header (columns are then given by number, from 0)')
+    samples.add_argument('--output', help='CSV or Parquet (.parquet) file to write to (default: CSV to stdout)')
+    samples.add_argument('--to', nargs='+', help='ontology prefixes to map to')
+    samples.add_argument('--workers', type=int, default=0, help='number of worker processes (default: none)')
+    samples.add_argument('--chunk-size', type=int, default=10000, help='number of samples mapped at a time')
+
+    download_parser = subparsers.add_parser('download', help='download an .obo file')
+    download_parser.add_argument('name', help='e.g. uberon-basic, uberon-extended or sensory-minimal')
+    download_parser.add_argument('--out-dir', default='.', help='directory to save the file in')
+    download_parser.set_defaults(function=download)
+
+    compile_parser = subparsers.add_parser('compile', aliases=['build-cache'],
+                                           help='compile an .obo file to Parquet files that load quickly')
+    compile_parser.add_argument('obo', help='.obo file (optionally gzip compressed)')
+    compile_parser.add_argument('out_dir', help='directory to write to')
+    compile_parser.add_argument('--ont-ids', nargs='+', default=['UBERON', 'CL'],
+                                help='ontology prefixes of terms to keep (default: UBERON CL)')
+    compile_parser.add_argument('--compression', default='snappy', help='Parquet compression')
+    compile_parser.set_defaults(function=compile_ontology)
+
+    ont_parser = subparsers.add_parser('map-by-ont', parents=[ontology, samples],
+                                       help='map sample terms to tissues through ontology relationships')
+    ont_parser.add_argument('--column', help='column of sample terms (default: the first)')
+    ont_parser.add_argument('--relations', nargs='+', help='relation types to follow')
+    ont_parser.add_argument('--exclude', nargs='+', help='terms not to map to (or through)')
+    ont_parser.add_argument('--child-mapping', action='store_true', help='search children instead of parents')
+    ont_parser.set_defaults(function=map_by_ont)
+
+    name_parser = subparsers.add_parser('map-by-name', parents=[ontology, samples],
+                                        help='map sample names to tissues by term names and synonyms')
+    name_parser.add_argument('--name-column', help='column of sample names (default: the first)')
+    name_parser.add_argument('--id-column', help='column of sample identifiers (default: row numbers)')
+    name_parser.add_argument('--xref', help='prefix of xrefs that denote preferred terms, e.g. FMA')
+    name_parser.add_argument('--synonym-types', nargs='+', help='synonym types to match (default: EXACT BROAD NARROW)')
+    name_parser.add_argument('--fuzzy', action='store_true', help='allow approximate matches')
+    name_parser.add_argument('--min-similarity', type=float, default=0.9, help='minimum similarity of fuzzy matches')
+    name_parser.set_defaults(function=map_by_name)
+
+    leaves_parser = subparsers.add_parser('leaves', parents=[ontology], help='list leaf terms')
+    leaves_parser.add_argument('--prefix', nargs='+', help='ontology prefixes of leaves to list')
+    leaves_parser.add_argument('--relations', nargs='+', help='relation types that make a term a parent')
+    leaves_parser.set_defaults(function=leaves)
+
+    serve_parser = subparsers.add_parser('serve', parents=[ontology],
+                                         help='serve queries about a loaded ontology over HTTP (see ontolopy.server)')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=8765, help='port to listen on (default: 8765)')
+    serve_parser.add_argument('--cache-size', type=int, default=1024, help='maximum number of responses to cache')
+    serve_parser.set_defaults(function=serve)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the `ontolopy` command, e.g. `main(['leaves', '--ontology', 'uberon.obo'])`.
+    """
+    args = _parser().parse_args(argv)
+    args.function(args)
@@ -0,0 +1,175 @@
+"""
+This module contains code for exporting ontologies as edge lists and sparse adjacency matrices (and importing them
+from edge lists), for graph analyses using vectorised linear algebra.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .obo import Obo
+
+
+def _default_relations(ont):
+    return ont._relationships + ont._nestable_attributes + list(ont.typedefs)
+
+
+def term_index(ont):
+    """
+    Terms of the ontology, in order, followed by the terms that are only related to (e.g. imported terms), in order of
+    appearance. Row/column `i` of the adjacency matrices is term `i`.
+
+    :param ont: `Obo` ontology object.
+    :return: `np.ndarray` of terms.
+    """
+    terms = dict.fromkeys(ont)
+    relations = set(_default_relations(ont))
+    for attributes in ont.values():
+        for relation in attributes:
+            if relation in relations:
+                terms.update(dict.fromkeys(attributes[relation]))
+    return np.array(list(terms), dtype=object)
+
+
+def edge_list(ont, relations=None):
+    """
+    Relationships of the ontology as a table, with one row for each (term, relation, related term).
+
+    :param ont: `Obo` ontology object.
+    :param relations: list of relation types, e.g. ['is_a', 'part_of']. By default all known relation types.
+    :return: `pd.DataFrame` with columns 'source', 'relation' (categorical, with categories `relations`) and 'target',
+      e.g. a row 'UBERON:0002084', 'part_of', 'UBERON:0000948'.
+    """
+    if relations is None:
+        relations = _default_relations(ont)
+    relation_set = set(relations)
+
+    sources = []
+    edge_relations = []
+    targets = []
+    for term, attributes in ont.items():
+        for relation in attributes:
+            if relation not in relation_set:
+                continue
+            related = attributes[relation]
+            sources += [term] * len(related)
+            edge_relations += [relation] * len(related)
+            targets += related
+
+    return pd.DataFrame({
+        'source': pd.Series(sources, dtype=object),
+        'relation': pd.Categorical(edge_relations, categories=list(dict.fromkeys(relations))),
+        'target': pd.Series(targets, dtype=object),
+    })
+
+
+def edge_table(ont, relations=None):
+    """
+    Relationships of the ontology as an Arrow table (see `edge_list`), e.g. for writing to Parquet or sharing with other
+    tools. Needs `pyarrow`.
+
+    :param ont: `Obo` ontology object.
+    :param relations: list of relation types, e.g. ['is_a', 'part_of']. By default all known relation types.
+    :return: `pyarrow.Table` with columns 'source', 'relation' (dictionary encoded) and 'target'.
+    """
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(edge_list(ont, relations), preserve_index=False)
+
+
+def _edge_numbers(edges, terms):
+    """
+    Row and column numbers of `edges` in the adjacency matrices of `terms`, and which edges are between `terms`.
+    """
+    index = pd.Index(terms)
+    rows = index.get_indexer(edges['source'])
+    columns = index.get_indexer(edges['target'])
+    in_terms = (rows >= 0) & (columns >= 0)
+    return rows, columns, in_terms
+
+
+def adjacency_matrices(ont, relations=None, terms=None):
+    """
+    Sparse adjacency matrix of each relation type. Entry (i, j) is 1 if term i is related to term j, e.g. if term i
+    is_a term j. Needs `scipy`.
+
+    :param ont: `Obo` ontology object.
+    :param relations: list of relation types, e.g. ['is_a', 'part_of']. By default all known relation types.
+    :param terms: terms that the rows and columns represent, by default `term_index(ont)`. Relationships with other
+      terms are left out.
+    :return: `dict` mapping relation type to a `scipy.sparse.csr_matrix`.
+    """
+    from scipy import sparse
+
+    if terms is None:
+        terms = term_index(ont)
+    edges = edge_list(ont, relations)
+    rows, columns, in_terms = _edge_numbers(edges, terms)
+    codes = edges['relation'].cat.codes.to_numpy()
+
+    matrices = {}
+    for code, relation in enumerate(edges['relation'].cat.categories):
+        edge = in_terms & (codes == code)
+        matrix = sparse.csr_matrix((np.ones(edge.sum(), dtype=np.int8), (rows[edge], columns[edge])),
+                                   shape=(len(terms), len(terms)))
+        matrix.data[:] = 1  # a term can list the same related term twice
+        matrices[relation] = matrix
+    return matrices
+
+
+def adjacency_matrix(ont, relations=None, terms=None):
+    """
+    Sparse adjacency matrix of all relation types, with edge-type codes as entries: entry (i, j) is `k + 1` if term i is
+    related to term j by `relations[k]`. If terms are related in more than one way, the first of `relations` is used.
+    Needs `scipy`.
+
+    :param ont: `Obo` ontology object.
+    :param relations: list of relation types, e.g. ['is_a', 'part_of']. By default all known relation types.
+    :param terms: terms that the rows and columns represent, by default `term_index(ont)`. Relationships with other
+      terms are left out.
+    :return: (`scipy.sparse.csr_matrix`, list of relation types) tuple.
+    """
+    from scipy import sparse
+
+    if terms is None:
+        terms = term_index(ont)
+    edges = edge_list(ont, relations)
+    rows, columns, in_terms = _edge_numbers(edges, terms)
+    codes = edges['relation'].cat.codes.to_numpy().astype(np.int16) + 1
+    relations = list(edges['relation'].cat.categories)
+
+    edges = pd.DataFrame({'row': rows[in_terms], 'column': columns[in_terms], 'code': codes[in_terms]})
+    edges = edges.sort_values('code', kind='stable').drop_duplicates(['row', 'column'])
+    matrix = sparse.csr_matrix((edges['code'].to_numpy(), (edges['row'].to_numpy(), edges['column'].to_numpy())),
+                               shape=(len(terms), len(terms)))
+    return matrix, relations
+
+
+def from_edge_list(edges, terms=None, names=None):
+    """
+    Creates an ontology from a table of relationships (e.g. from `edge_list`).
+
+    :param edges: `pd.DataFrame` (or Arrow table) with columns 'source', 'relation' and 'target'.
+    :param terms: optional iterable of terms to include even if they have no relationships (e.g. from `term_index`).
+      Otherwise, the ontology's terms are the sources of `edges`.
+    :param names: optional mapping (e.g. `dict` or `pd.Series`) of term to name.
+    :return: `Obo` ontology object.
+    """
+    if not isinstance(edges, pd.DataFrame):
+        edges = edges.to_pandas()
+
+    ont = {}
+    if terms is not None:
+        for term in terms:
+            ont[term] = {'id': term}
+    for source, relation, target in zip(edges['source'], edges['relation'], edges['target']):
+        try:
+            attributes = ont[source]
+        except KeyError:
+            attributes = ont[source] = {'id': source}
+        attributes.setdefault(relation, []).append(target)
+
+    if names is not None:
+        for term, name in names.items():
+            if term in ont:
+                ont[term]['name'] = name
+    return Obo(ont)
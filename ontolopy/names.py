@@ -0,0 +1,250 @@
+"""
+This module contains code for indexing the names and synonyms of ontology terms, so that free-text labels (e.g. sample
+names) can be matched to terms exactly or approximately.
+"""
+
+import multiprocessing
+import re
+from itertools import islice
+
+from .obo import _extract_synonym, _extract_synonym_type
+
+# synonym type used for matches on a term's name
+_name_type = 'NAME'
+
+
+def _normalise(name: str) -> str:
+    """
+    Normalises a name for approximate matching: lowercase words, sorted, so that e.g. "Left ventricle, heart" and
+    "heart left ventricle" are the same.
+    """
+    return ' '.join(sorted(re.findall(r'[a-z0-9]+', name.lower())))
+
+
+def _ngrams(text: str, n: int = 3) -> set:
+    """
+    Character n-grams of `text`, padded with spaces so that the start and end of the text are included.
+    """
+    text = f' {text} '
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Levenshtein distance between `a` and `b`, giving up as soon as it is more than `max_distance`. Only the band of
+    cells within `max_distance` of the diagonal is calculated.
+
+    :return: the distance, or `max_distance + 1` if it is more than `max_distance`.
+    """
+    too_far = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return too_far
+
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = current[0]
+        char_a = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            distance = previous[j - 1] + (char_a != b[j - 1])
+            if previous[j] + 1 < distance:
+                distance = previous[j] + 1
+            if current[j - 1] + 1 < distance:
+                distance = current[j - 1] + 1
+            current[j] = distance
+            if distance < row_min:
+                row_min = distance
+        if row_min > max_distance:
+            return too_far
+        previous = current
+    return min(previous[-1], too_far)
+
+
+class NameIndex:
+    """
+    Index of the names and synonyms of ontology terms.
+
+    Labels are matched exactly (ignoring case), then on their sorted words (ignoring punctuation and word order),
+    then, optionally, approximately. Approximate matches are found by looking up the rarest character 3-grams of the
+    label in an inverted index, and then checking the edit distance of each candidate.
+    """
+
+    _n = 3  # n-gram size
+
+    def __init__(self, ont, to=None, synonym_types=None):
+        """
+        :param ont: `Obo` ontology object.
+        :param to: list of ontology prefixes that you want to map to, e.g. ['UBERON'], or None for all terms.
+        :param synonym_types: list of synonym types to match on, by default ['EXACT', 'BROAD', 'NARROW'].
+        """
+        if synonym_types is None:
+            synonym_types = ['EXACT', 'BROAD', 'NARROW']
+        else:
+            assert(isinstance(synonym_types, list))
+
+        self.to = to
+        self.synonym_types = synonym_types
+
+        # lowercase name: [(term, synonym type), ...], in ontology order
+        self.exact = {}
+        for term, attributes in ont.items():
+            if to is not None and term.split(':')[0] not in to:
+                continue
+            if 'name' in attributes:
+                self.exact.setdefault(attributes['name'].lower(), []).append((term, _name_type))
+            for synonym_info in attributes.get('synonym', []):
+                syn_type = _extract_synonym_type(synonym_info)
+                if syn_type not in synonym_types:
+                    continue
+                self.exact.setdefault(_extract_synonym(synonym_info), []).append((term, syn_type))
+
+        # normalised name: [(term, synonym type), ...]
+        self.normalised = {}
+        for name, entries in self.exact.items():
+            self.normalised.setdefault(_normalise(name), []).extend(entries)
+
+        # n-gram: [normalised name number, ...]
+        self._keys = list(self.normalised)
+        self._key_ngrams = [frozenset(_ngrams(key, self._n)) for key in self._keys]
+        self._ngram_index = {}
+        for i, ngrams in enumerate(self._key_ngrams):
+            for ngram in ngrams:
+                self._ngram_index.setdefault(ngram, []).append(i)
+
+    def __len__(self):
+        return len(self.exact)
+
+    @staticmethod
+    def _choose(entries, preferred=None):
+        """
+        Chooses a term from matching (term, synonym type) entries: a term whose name matches, else the (last) term in
+        `preferred`, else the first term.
+        """
+        for term, syn_type in entries:
+            if syn_type == _name_type:
+                return term
+        if preferred:
+            chosen = [term for term, _ in entries if term in preferred]
+            if chosen:
+                return chosen[-1]
+        return entries[0][0]
+
+    def candidates(self, name: str, min_similarity: float = 0.9):
+        """
+        Finds approximate matches for `name`.
+
+        :param name: label to match.
+        :param min_similarity: minimum similarity (between 0 and 1), i.e. 1 - (edit distance / length of longer name),
+          between the normalised `name` and a normalised name or synonym.
+        :return: list of (normalised name, similarity) tuples, most similar first.
+        """
+        key = _normalise(name)
+        if not key:
+            return []
+        # tolerance for floating point error, e.g. (1 - 0.9) * 10 is 0.9999...
+        max_distance = int((1 - min_similarity) * len(key) + 1e-9)
+
+        # A name within `max_distance` edits shares all but (at most) `max_distance * n` of its n-grams with `key`,
+        # so it must contain at least one of any `max_distance * n + 1` n-grams of `key`: use the rarest ones.
+        key_ngrams = _ngrams(key, self._n)
+        min_shared = len(key_ngrams) - max_distance * self._n
+        ngrams = sorted(key_ngrams, key=lambda ngram: len(self._ngram_index.get(ngram, [])))
+        candidates = set()
+        for ngram in ngrams[:max_distance * self._n + 1]:
+            candidates.update(self._ngram_index.get(ngram, []))
+
+        matches = []
+        for i in candidates:
+            candidate = self._keys[i]
+            if abs(len(candidate) - len(key)) > max_distance:
+                continue
+            if len(key_ngrams.intersection(self._key_ngrams[i])) < min_shared:
+                continue
+            distance = _edit_distance(key, candidate, max_distance)
+            similarity = 1 - distance / max(len(key), len(candidate))
+            if distance <= max_distance and similarity >= min_similarity - 1e-9:
+                matches.append((candidate, similarity))
+        return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+    def match(self, name: str, preferred=None, fuzzy=False, min_similarity: float = 0.9):
+        """
+        Finds the term that best matches `name`.
+
+        :param name: label to match.
+        :param preferred: set of preferred terms, e.g. terms with an xref to FMA, used to choose between synonyms.
+        :param fuzzy: if True, allow approximate matches.
+        :param min_similarity: minimum similarity of approximate matches (see `NameIndex.candidates`).
+        :return: matched term, or None.
+        """
+        name_l = name.lower()
+        if name_l in self.exact:
+            return self._choose(self.exact[name_l], preferred)
+
+        if not fuzzy:
+            return None
+
+        key = _normalise(name)
+        if key in self.normalised:
+            return self._choose(self.normalised[key], preferred)
+
+        matches = self.candidates(name, min_similarity)
+        if not matches:
+            return None
+        best = [candidate for candidate, similarity in matches if similarity == matches[0][1]]
+        return self._choose([entry for candidate in best for entry in self.normalised[candidate]], preferred)
+
+
+# Arguments for `NameIndex.match` in worker processes, set once per worker by `_init_worker`.
+_worker_args = None
+
+
+def _init_worker(*args):
+    global _worker_args
+    _worker_args = args
+
+
+def _match_chunk(names):
+    index, preferred, fuzzy, min_similarity = _worker_args
+    return [index.match(name, preferred, fuzzy, min_similarity) for name in names]
+
+
+def _chunks(iterable, chunksize):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def match_names(index, names, preferred=None, fuzzy=False, min_similarity=0.9, processes=None, chunksize=10000):
+    """
+    Matches labels to terms using `index` (see `NameIndex.match`), one at a time, or in chunks of `chunksize` labels
+    with worker processes.
+
+    :param index: `NameIndex` object. It is sent to each worker process once.
+    :param names: iterable of labels (e.g. a generator).
+    :param preferred: set of preferred terms, e.g. terms with an xref to FMA, used to choose between synonyms.
+    :param fuzzy: if True, allow approximate matches.
+    :param min_similarity: minimum similarity of approximate matches (see `NameIndex.candidates`).
+    :param processes: if given, the number of worker processes to match chunks in parallel.
+    :param chunksize: number of labels per chunk (with worker processes).
+    :return: generator of matched terms (or None), in the order of `names`.
+    """
+    if not processes:
+        for name in names:
+            yield index.match(name, preferred, fuzzy, min_similarity)
+        return
+
+    args = (index, preferred, fuzzy, min_similarity)
+    chunks = _chunks(names, chunksize)
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=args) as pool:
+        while True:
+            # a few chunks per process at a time, so that `names` is read as the matches are used, not all at once
+            window = list(islice(chunks, 2 * processes))
+            if not window:
+                return
+            for matched in pool.imap(_match_chunk, window):
+                yield from matched
@@ -2,11 +2,14 @@
 This module contains code for creating and working with the Obo class: objects that represent ontologies.
 """
 
-import pandas as pd
-import urllib.request as request
+import gzip
 import os
 import logging
-import validators
+import time
+import types
+from collections.abc import Mapping
+
+from . import stats as _stats
 
 
 def download_obo(data_name, out_dir='../data/'):
@@ -42,6 +45,8 @@ def download_obo(data_name, out_dir='../data/'):
         logging.warning(f'File already exists at location: {os.path.abspath(out_file)}. Cancelling download.')
         return out_file
 
+    import urllib.request as request
+
     # TODO: make sure behaviour is sensible if url doesn't exist. (Write test).
     file_data = request.urlopen(url) 
     data_to_write = file_data.read() 
@@ -188,11 +193,23 @@ def _extract_source(text, ont_ids):
         if _validate_term(source, ont_ids):
             # TODO: explain in Ontolopy part
             new_relations.append((source.split(':')[0], source))
-        elif validators.url(source):
+        elif _is_url(source):
             new_relations.append(('url', source))
     return new_relations
 
 
+def _is_url(source):
+    """
+    Whether `source` is a URL. Most sources aren't (e.g. 'GOC:cjm' or empty), so `validators` (which is slow to import
+    and call) is only used for those with a scheme, e.g. 'http://en.wikipedia.org/wiki/Heart'.
+    """
+    if '://' not in source:
+        return False
+    import validators
+
+    return bool(validators.url(source))
+
+
 def _merge_dict(a, b, prefer='self', path=None):
     """
     Recursively merges dictionary a into dictionary b. Prefers a.
@@ -229,35 +246,195 @@ def _merge_dict(a, b, prefer='self', path=None):
     return c
 
 
+def _read_typedef_line(line_list: list):
+    """
+    Reads a line of a [Typedef] stanza of an obo file.
+
+    :param line_list: list of line elements (original line split by spaces)
+    :return: (tag, value) tuple, e.g. ('inverse_of', 'has_part') or ('holds_over_chain', ('part_of', 'part_of')), or
+      None if the line is not one that is stored.
+    """
+    tag = line_list[0].replace(':', '')
+    values = line_list[1:]
+    if '!' in values:
+        values = values[:values.index('!')]  # drop comments
+    if not values:
+        return None
+
+    if tag in Obo._typedef_strings:
+        return tag, ' '.join(values)
+    elif tag == 'holds_over_chain':
+        return tag, tuple(values[:2])
+    elif tag in Obo._typedef_lists:
+        return tag, values[0]
+    return None
+
+
+def _open_text(path, mode='r'):
+    """
+    Opens a text file for reading or writing, gzip compressed if `path` ends with '.gz'.
+    """
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode + 't')
+    return open(path, mode, buffering=1 << 20)
+
+
+# order of the tags in [Term] stanzas written by `Obo.to_obo`, after 'id' and 'name'
+_term_tag_order = ['namespace', 'alt_id', 'def', 'comments', 'subset', 'synonym', 'xref', 'is_a', 'intersection_of',
+                   'union_of']
+_term_tag_order_last = ['is_obsolete', 'replaced_by', 'consider']
+
+
+def _is_source_key(key, values):
+    """
+    Whether `key` stores sources extracted from definitions and synonyms (e.g. 'FMA': ['FMA:7088'] or 'url'), which
+    `load_obo` recreates from the definitions and synonyms.
+    """
+    return key == 'url' or (isinstance(values, list) and all(str(value).startswith(f'{key}:') for value in values))
+
+
+def _term_lines(term, attributes, relationships):
+    """
+    Lines of the [Term] stanza of `term`, in a fixed tag order, which `load_obo` reads back into `attributes`.
+
+    :param term: term, e.g. 'UBERON:0000948'.
+    :param attributes: `dict` of the term's attributes and relations.
+    :param relationships: relation types written as "relationship: <type> <term>" lines.
+    """
+    yield '[Term]'
+    yield f"id: {attributes.get('id', term)}"
+    if 'name' in attributes:
+        yield f"name: {attributes['name']}"
+
+    def tag_lines(tag):
+        values = attributes[tag]
+        for value in values if isinstance(values, list) else [values]:
+            yield f'{tag}: {value}'
+
+    for tag in _term_tag_order:
+        if tag in attributes:
+            yield from tag_lines(tag)
+    for tag in attributes:
+        if tag in relationships:
+            for value in attributes[tag]:
+                yield f'relationship: {tag} {value}'
+        elif tag == 'relationship':
+            # relationship of a type that isn't stored
+            yield from tag_lines(tag)
+    for tag in attributes:
+        if (tag not in _term_tag_order and tag not in _term_tag_order_last and tag not in relationships
+                and tag not in ['id', 'name', 'relationship'] and not _is_source_key(tag, attributes[tag])):
+            yield from tag_lines(tag)
+    for tag in _term_tag_order_last:
+        if tag in attributes:
+            yield from tag_lines(tag)
+    yield ''
+
+
+def _typedef_lines(typedef, properties):
+    """
+    Lines of the [Typedef] stanza of relation type `typedef`.
+    """
+    yield '[Typedef]'
+    yield f"id: {properties.get('id', typedef)}"
+    for tag in Obo._typedef_strings:
+        if tag in properties and tag != 'id':
+            yield f'{tag}: {properties[tag]}'
+    for tag in Obo._typedef_lists:
+        for value in properties.get(tag, []):
+            yield f"{tag}: {' '.join(value) if isinstance(value, tuple) else value}"
+    yield ''
+
+
 def load_obo(file_loc, ont_ids=None, discard_obsolete=True):
     """
     Loads ontology from `.obo` file at `file_loc`.
 
-    :param file_loc: file location - path to stored obo file.
+    Relation types defined in [Typedef] stanzas are stored in `Obo.typedefs`. Relationships of these types are stored
+    under their own type, even if they are not one of the known relation types.
+
+    :param file_loc: file location - path to stored obo file (gzip compressed if it ends with '.gz').
     :param ont_ids: list of ontology ids, e.g. `['UBERON', 'CL']`
-    :param discard_obsolete: if True discard obsolete terms.
+    :param discard_obsolete: if True discard obsolete terms (marked `is_obsolete: true`). Their replacements are kept,
+      so that their identifiers can still be resolved (see `Obo.id_resolution`).
     :return: `Obo` ontology object.
     """
+    if not _stats.recording():
+        return _load_obo(file_loc, ont_ids, discard_obsolete)
+
+    # keep the statistics of loading this ontology with it (as `Obo.stats`)
+    with _stats.collect() as stats:
+        with _stats.timer('load_obo'):
+            obo = _load_obo(file_loc, ont_ids, discard_obsolete)
+    obo.__dict__['_stats'] = stats
+    return obo
+
+
+def _load_obo(file_loc, ont_ids=None, discard_obsolete=True):
+    recording = _stats.recording()
+    if recording:
+        start = time.perf_counter()
+
     obo = Obo()
     # TODO: check for version/date of ontology file and save if possible
     # terms = {}
     if not ont_ids:
         assert(isinstance(ont_ids, list))
-    with open(file_loc) as f:
+
+    # obsolete term: the term that replaced it, for discarded obsolete terms
+    replacements = {}
+
+    def add_term(term):
+        if len(term) > 0 and 'id' in term.keys():
+            if not ((not ont_ids) or (ont_ids and (term['id'].split(':')[0] in ont_ids))):
+                return
+            if discard_obsolete and _is_obsolete(term):
+                logging.info(f"term {term['id']}: {term.get('name')} is obsolete. Discarding.")
+                replacement = _replacement(term)
+                if replacement is not None:
+                    replacements[term['id']] = replacement
+            else:
+                obo[term['id']] = term
+
+    def add_typedef(typedef):
+        if 'id' in typedef:
+            obo.typedefs[typedef['id']] = typedef
+
+    # (term, relation, value) for relationships that are not in Obo._relationships
+    other_relationships = []
+
+    with _open_text(file_loc) as f:
         term = {}
+        typedef = {}
+        stanza = None
+        i = -1
         for i, line in enumerate(f):
             line = line.strip()
             line = line.strip().split(' ')
 
-            if '[Term]' in line[0]:
-                if len(term) > 0 and 'id' in term.keys():
-                    if 'comment' in term.keys() and 'obsolete' in term['comment'].lower() and discard_obsolete:
-                        logging.info(f"term {term['id']}: {term['name']} is obsolete. Discarding.")
-                        term = {}
-                        continue
-                    elif (not ont_ids) or (ont_ids and (term['id'].split(':')[0] in ont_ids)):
-                        obo[term['id']] = term
+            if line[0].startswith('['):
+                add_term(term)
+                add_typedef(typedef)
                 term = {}
+                typedef = {}
+                stanza = line[0]
+                continue
+
+            if stanza == '[Typedef]':
+                tag_value = _read_typedef_line(line)
+                if tag_value is None:
+                    continue
+                tag, value = tag_value
+                if tag in Obo._typedef_strings:
+                    typedef[tag] = value
+                else:
+                    typedef.setdefault(tag, []).append(value)
+                continue
+            elif stanza != '[Term]':
+                continue
+
+            if line[0] == 'relationship:' and len(line) > 2 and line[1] not in Obo._relationships:
+                other_relationships.append((term, line[1], line[2]))
 
             new_relations = _read_line_obo(line, ont_ids)
             for (relation, value) in new_relations:
@@ -269,9 +446,51 @@ def load_obo(file_loc, ont_ids=None, discard_obsolete=True):
                 except KeyError:
                     term[relation] = [value]
 
+        add_term(term)
+        add_typedef(typedef)
+
+    if recording:
+        parsed = time.perf_counter()
+        _stats.add_time('load_obo.parse', parsed - start)
+        _stats.count(lines_read=i + 1, terms_loaded=len(obo))
+
+    # Store relationships defined in [Typedef] stanzas under their own relation type:
+    for term, relation, value in other_relationships:
+        if relation in obo.typedefs and value in term.get('relationship', []):
+            term['relationship'].remove(value)
+            if not term['relationship']:
+                del term['relationship']
+            term.setdefault(relation, []).append(value)
+
+    if replacements:
+        obo.__dict__['_replacements'] = replacements
+
+    if recording:
+        _stats.add_time('load_obo.typedefs', time.perf_counter() - parsed)
     return obo
 
 
+def _is_obsolete(attributes):
+    """
+    Whether a term is obsolete (`is_obsolete: true`).
+    """
+    value = attributes.get('is_obsolete')
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value == 'true'
+
+
+def _replacement(attributes):
+    """
+    The term that replaced an obsolete term: its `replaced_by` term, or its `consider` term if there is only one.
+    """
+    if attributes.get('replaced_by'):
+        return attributes['replaced_by'][0]
+    if len(attributes.get('consider', [])) == 1:
+        return attributes['consider'][0]
+    return None
+
+
 class Obo(dict):
     """
     Creates `Obo` ontology object from `dict` with ontology terms for keys, mapping to term attributes and relations.
@@ -345,6 +564,24 @@ class Obo(dict):
         'continuous_with',
     ]
 
+    # [Typedef] tags:
+    _typedef_strings = [
+        'id',
+        'name',
+        'namespace',
+        'is_transitive',
+        'is_symmetric',
+        'is_reflexive',
+    ]
+
+    _typedef_lists = [
+        'is_a',
+        'inverse_of',
+        'holds_over_chain',
+        'transitive_over',
+        'xref',
+    ]
+
     def __init__(self, source_dict=dict()):
         """
         Initialise self from a source dictionary.
@@ -355,8 +592,46 @@ class Obo(dict):
         assert(isinstance(source_dict, dict))
         self._from_dict(source_dict)
 
+    def __setitem__(self, key, value):
+        super(Obo, self).__setitem__(key, value)
+        self.clear_cache()
+
+    def __delitem__(self, key):
+        super(Obo, self).__delitem__(key)
+        self.clear_cache()
+
+    # the other methods that add or remove terms also clear the caches
+    def update(self, *args, **kwargs):
+        super(Obo, self).update(*args, **kwargs)
+        self.clear_cache()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        value = super(Obo, self).setdefault(key, default)
+        self.clear_cache()
+        return value
+
+    def pop(self, key, *default):
+        value = super(Obo, self).pop(key, *default)
+        self.clear_cache()
+        return value
+
+    def popitem(self):
+        item = super(Obo, self).popitem()
+        self.clear_cache()
+        return item
+
+    def clear(self):
+        super(Obo, self).clear()
+        self.clear_cache()
+
     def __copy__(self):
-        copy = Obo(dict(self).copy())
+        copy = Obo(dict(self))
 
         for att_key, att_val in self.__dict__.items():
             copy.__dict__[att_key] = att_val
@@ -373,6 +648,24 @@ class Obo(dict):
         """
         return self.keys()
 
+    @property
+    def typedefs(self):
+        """
+        Relation types defined in the ontology's [Typedef] stanzas (a `dict` mapping relation type to its properties,
+        e.g. `'part_of': {'id': 'part_of', 'is_transitive': 'true', 'inverse_of': ['has_part']}`).
+        :return:
+        """
+        return self.__dict__.setdefault('_typedefs', {})
+
+    @property
+    def stats(self):
+        """
+        Statistics of loading the ontology (see `ontolopy.stats.Stats`), if it was loaded by `load_obo` while
+        statistics were being collected, otherwise None.
+        :return:
+        """
+        return self.__dict__.get('_stats')
+
     @property
     def leaves(self):
         """
@@ -383,6 +676,121 @@ class Obo(dict):
 
     # TODO: Write roots(), get_roots()
 
+    def _cached(self, key, build):
+        """
+        Returns the cached value for `key`, calling `build()` to create it if it doesn't exist yet.
+
+        Caches are cleared whenever terms are added to or removed from the ontology (see `Obo.clear_cache`).
+
+        :param key: hashable cache key.
+        :param build: function with no arguments that creates the value to cache.
+        :return:
+        """
+        cache = self.__dict__.setdefault('_cache', {})
+        try:
+            value = cache[key]
+        except KeyError:
+            if _stats.recording():
+                _stats.count(cache_misses=1)
+                with _stats.timer(f'build.{key[0] if isinstance(key, tuple) else key}'):
+                    value = cache[key] = build()
+                return value
+            value = cache[key] = build()
+            return value
+        if _stats.recording():
+            _stats.count(cache_hits=1)
+        return value
+
+    def clear_cache(self):
+        """
+        Clears cached indexes (e.g. reverse adjacency, hierarchy levels). Call this after editing terms in place.
+        :return:
+        """
+        # counts changes, so that views (see `OboView`) know when to clear their own caches
+        self.__dict__['_changes'] = self._version() + 1
+        # re-bind rather than clear, so that copies sharing this cache are not affected
+        if self.__dict__.get('_cache'):
+            self.__dict__['_cache'] = {}
+
+    def _version(self):
+        """
+        Number of times the ontology has changed (i.e. its caches have been cleared).
+        """
+        return self.__dict__.get('_changes', 0)
+
+    def _reverse_adjacency(self, relations):
+        """
+        Maps each term to the terms that point to it (its children) through `relations`. Built once and cached.
+
+        :param relations: iterable of relation types, e.g. ['is_a', 'part_of']
+        :return: `dict` mapping parent term to list of `(relation, child)` tuples.
+        """
+        relations = frozenset(relations)
+
+        def build():
+            reverse = {}
+            for term, attributes in self.items():
+                for relation in attributes:
+                    if relation not in relations:
+                        continue
+                    for parent in attributes[relation]:
+                        try:
+                            reverse[parent].append((relation, term))
+                        except KeyError:
+                            reverse[parent] = [(relation, term)]
+            return reverse
+
+        return self._cached(('reverse_adjacency', relations), build)
+
+    def children(self, term, relations=None):
+        """
+        Terms that are directly related to `term` through `relations`, e.g. its subclasses and parts. Looked up in a
+        reverse adjacency that is built once and cached.
+
+        :param term: term, e.g. 'UBERON:0000948'.
+        :param relations: list of relation types, e.g. ['is_a', 'part_of']. By default all known relation types.
+        :return: list of (relation, child) tuples, e.g. [('part_of', 'UBERON:0002084')]
+        """
+        if relations is None:
+            relations = self._relationships + self._nestable_attributes + list(self.typedefs)
+        return list(self._reverse_adjacency(relations).get(term, []))
+
+    def _levels(self, relations):
+        """
+        Hierarchy level of each term: the number of steps on the longest path from the term up to a root, using
+        `relations`. Every step up through `relations` strictly lowers the level, so a term can only be related to
+        terms with a lower level. Terms that are in (or below) a cycle have no level. Built once and cached.
+
+        :param relations: iterable of relation types, e.g. ['is_a', 'part_of']
+        :return: `dict` mapping term to level (`int`).
+        """
+        relations = frozenset(relations)
+
+        def build():
+            reverse = self._reverse_adjacency(relations)
+            n_parents = {}
+            for term, attributes in self.items():
+                n_parents[term] = len({parent for relation in relations.intersection(attributes)
+                                       for parent in attributes[relation]})
+            # parents outside the ontology (e.g. NCBITaxon terms) are roots.
+            queue = [term for term in reverse if n_parents.get(term, 0) == 0]
+            levels = dict.fromkeys(queue, 0)
+            while queue:
+                parent = queue.pop()
+                for child in {child for _, child in reverse.get(parent, [])}:
+                    levels[child] = max(levels.get(child, 0), levels[parent] + 1)
+                    n_parents[child] -= 1
+                    if n_parents[child] == 0:
+                        queue.append(child)
+            for term, n in n_parents.items():
+                if n == 0 and term not in levels:
+                    levels[term] = 0
+                elif n > 0:
+                    levels.pop(term, None)
+            return levels
+
+        return self._cached(('levels', relations), build)
+
     def _from_dict(self, source_dict):
         """
         Create Obo() from a Python dict.
@@ -400,8 +808,70 @@ class Obo(dict):
         :param ont_id: list of ontology prefixes e.g. ['HP', 'GO']
         :return:
         """
-        return {x for x in self.terms if x.split(':')[0] in ont_id}
-    
+        prefix_index = self._prefix_index()
+        return {term for prefix in ont_id for term in prefix_index.get(prefix, ())}
+
+    def _prefix_index(self):
+        """
+        Maps each ontology prefix to a sorted tuple of the terms with that prefix, e.g. 'CL': ('CL:0000000', ...).
+        Built once and cached.
+
+        :return:
+        """
+        def build():
+            prefix_index = {}
+            for term in self.terms:
+                prefix_index.setdefault(term.split(':')[0], []).append(term)
+            return {prefix: tuple(sorted(terms)) for prefix, terms in prefix_index.items()}
+
+        return self._cached('prefix_index', build)
+
+    def _attribute_index(self, attribute):
+        """
+        Maps each value of `attribute` (e.g. 'subset' or 'namespace') to the set of terms with that value. Built once
+        and cached.
+
+        :param attribute: term attribute, e.g. 'subset'.
+        :return:
+        """
+        def build():
+            attribute_index = {}
+            for term, attributes in self.items():
+                values = attributes.get(attribute, [])
+                for value in ([values] if isinstance(values, str) else values):
+                    attribute_index.setdefault(value, set()).add(term)
+            return attribute_index
+
+        return self._cached(('attribute_index', attribute), build)
+
+    def view(self, prefixes=None, subset=None, namespace=None, predicate=None):
+        """
+        Creates a read-only view of the terms that match all of the given filters, without copying them (see `OboView`).
+
+        :param prefixes: list of ontology prefixes, e.g. ['UBERON', 'CL'].
+        :param subset: name of a subset, e.g. 'uberon_slim'.
+        :param namespace: namespace, e.g. 'uberon'.
+        :param predicate: function taking a term and its attributes `dict`, returning True for terms to include.
+        :return: `OboView` object.
+        """
+        terms = None
+
+        def restrict(new_terms):
+            return set(new_terms) if terms is None else terms.intersection(new_terms)
+
+        if prefixes is not None:
+            assert(isinstance(prefixes, list))
+            terms = restrict(self.terms_from(prefixes))
+        if subset is not None:
+            terms = restrict(self._attribute_index('subset').get(subset, ()))
+        if namespace is not None:
+            terms = restrict(self._attribute_index('namespace').get(namespace, ()))
+        if predicate is not None:
+            candidates = self.terms if terms is None else terms
+            terms = {term for term in candidates if predicate(term, self[term])}
+
+        return OboView(self, terms)
+
     # def get_relations(self, relations_of_interest, source_terms, target_term, ont):
     #     """
     #     get_relations finds all relationships (based on relations_of_interest e.g. ['is_a']) between terms like source
@@ -425,6 +895,180 @@ class Obo(dict):
     #     """
     #     return relations.Relations(relations_of_interest, source_terms, target_term, ont)
 
+    def name_index(self, to=None, synonym_types=None):
+        """
+        Index of the names and synonyms of terms, for matching labels to terms (see `ontolopy.names.NameIndex`).
+        Built once and cached.
+
+        :param to: list of ontology prefixes that you want to map to, e.g. ['UBERON'], or None for all terms.
+        :param synonym_types: list of synonym types to match on, by default ['EXACT', 'BROAD', 'NARROW'].
+        :return: `NameIndex` object.
+        """
+        from .names import NameIndex
+
+        key = ('name_index',
+               None if to is None else tuple(sorted(to)),
+               None if synonym_types is None else tuple(sorted(synonym_types)))
+        return self._cached(key, lambda: NameIndex(self, to, synonym_types))
+
+    def similarity(self, relations=None):
+        """
+        Semantic similarity of terms, with information content from descendant counts (see
+        `ontolopy.similarity.Similarity`). Built once and cached.
+
+        :param relations: list of relation types that lead to ancestors, by default ['is_a', 'part_of'].
+        :return: `Similarity` object.
+        """
+        from .similarity import Similarity
+
+        key = ('similarity', None if relations is None else tuple(sorted(relations)))
+        return self._cached(key, lambda: Similarity(self, relations))
+
+    def relation_registry(self):
+        """
+        Properties of the ontology's relation types, from its [Typedef] stanzas (see `RelationRegistry`). Built once and
+        cached.
+
+        :return: `RelationRegistry` object.
+        """
+        return self._cached('relation_registry', lambda: RelationRegistry(self.typedefs))
+
+    def _ancestor_closure(self, relations):
+        """
+        Maps each term to all of the terms it is related to through any number of steps using `relations` (its
+        ancestors). Built once (for each set of relations) and cached.
+
+        :param relations: iterable of relation types, e.g. ['is_a', 'part_of']
+        :return: `dict` mapping term to `frozenset` of ancestors.
+        """
+        relations = frozenset(relations)
+
+        def build():
+            parents = {term: [parent for relation in attributes if relation in relations
+                              for parent in attributes[relation]]
+                       for term, attributes in self.items()}
+
+            # Tarjan's strongly connected components algorithm (iterative). Components are completed parents first, so
+            # each component's ancestors can be found from its parents' ancestors.
+            closure = {}
+            index = {}
+            low = {}
+            stack = []
+            on_stack = set()
+            for root in parents:
+                if root in index:
+                    continue
+                index[root] = low[root] = len(index)
+                stack.append(root)
+                on_stack.add(root)
+                work = [(root, iter(parents.get(root, ())))]
+                while work:
+                    term, term_parents = work[-1]
+                    for parent in term_parents:
+                        if parent not in index:
+                            index[parent] = low[parent] = len(index)
+                            stack.append(parent)
+                            on_stack.add(parent)
+                            work.append((parent, iter(parents.get(parent, ()))))
+                            break
+                        elif parent in on_stack:
+                            low[term] = min(low[term], index[parent])
+                    else:
+                        work.pop()
+                        if work:
+                            low[work[-1][0]] = min(low[work[-1][0]], low[term])
+                        if low[term] == index[term]:
+                            component = set()
+                            while True:
+                                member = stack.pop()
+                                on_stack.discard(member)
+                                component.add(member)
+                                if member == term:
+                                    break
+                            ancestors = set()
+                            for member in component:
+                                for parent in parents.get(member, ()):
+                                    ancestors.add(parent)
+                                    if parent not in component:
+                                        ancestors |= closure[parent]
+                            ancestors = frozenset(ancestors)
+                            for member in component:
+                                closure[member] = ancestors
+            return closure
+
+        return self._cached(('ancestor_closure', relations), build)
+
+    def id_resolution(self):
+        """
+        Table for resolving alternative and obsolete term identifiers: maps each `alt_id` to its term, and each
+        obsolete term (including those discarded by `load_obo`) to the term that replaced it (its `replaced_by` term,
+        or its `consider` term if there is only one), following chains of replacements. Built once and cached.
+
+        :return: `dict` mapping identifier to term, e.g. {'UBERON:0000000': 'UBERON:0002084'}.
+        """
+        def build():
+            parent = self
+            while isinstance(parent, OboView):
+                parent = parent._parent
+            table = dict(parent.__dict__.get('_replacements', {}))
+            for term, attributes in self.items():
+                for alt_id in attributes.get('alt_id', []):
+                    if alt_id not in self:
+                        table.setdefault(alt_id, term)
+                if _is_obsolete(attributes):
+                    replacement = _replacement(attributes)
+                    if replacement is not None:
+                        table[term] = replacement
+
+            resolved = {}
+            for identifier, term in table.items():
+                seen = {identifier}
+                while term in table and term not in seen:
+                    seen.add(term)
+                    term = table[term]
+                resolved[identifier] = term
+            return resolved
+
+        return self._cached('id_resolution', build)
+
+    def resolve_ids(self, terms):
+        """
+        Resolves alternative and obsolete identifiers to current terms (see `Obo.id_resolution`), in one pass.
+
+        :param terms: iterable of term identifiers.
+        :return: `list` of terms, with other identifiers unchanged.
+        """
+        table = self.id_resolution()
+        if not table:
+            return list(terms)
+        return [table.get(term, term) for term in terms]
+
+    def holds(self, term, relation, other):
+        """
+        Checks whether the relationship `term` `relation` `other` holds, e.g. 'UBERON:0002084' part_of 'UBERON:0000948'.
+        Sub-properties of `relation` count as `relation`, and if `relation` is transitive then chains of relationships
+        count too (looked up in a cached transitive closure).
+
+        :param term: term, e.g. 'UBERON:0002084'.
+        :param relation: relation type, e.g. 'part_of'.
+        :param other: term, e.g. 'UBERON:0000948'.
+        :return: bool
+        """
+        registry = self.relation_registry()
+        relations = registry.expand([relation])
+        if registry.is_transitive(relation):
+            return other in self._ancestor_closure(relations).get(term, ())
+        return any(other in self.get(term, {}).get(sub_relation, []) for sub_relation in relations)
+
+    def xref_index(self):
+        """
+        Index of the cross-references (xrefs) between terms and external identifiers, in both directions (see
+        `XrefIndex`). Built once and cached.
+
+        :return: `XrefIndex` object.
+        """
+        return self._cached('xref_index', lambda: XrefIndex(self))
+
     def merge(self, new, prefer='self'):
         """
         Recursively merges `new` into `self` and returns a merged `Obo` ontology.
@@ -448,8 +1092,9 @@ class Obo(dict):
         except AssertionError:
             logging.error(f"`prefer` must be in {str(prefer_options)}, not {prefer}.")
 
-        merged = _merge_dict(self, new, prefer)
-        return Obo(merged)
+        merged = Obo(_merge_dict(self, new, prefer))
+        merged.typedefs.update(_merge_dict(self.typedefs, new.typedefs, prefer))
+        return merged
 
     def _get_leaves(self, term_types=None, relations_of_interest=None):
         """
@@ -460,7 +1105,7 @@ class Obo(dict):
         :return:
         """
         if not relations_of_interest:
-            relations_of_interest = self._relationships + self._nestable_attributes
+            relations_of_interest = self._relationships + self._nestable_attributes + list(self.typedefs)
         else:
             assert(isinstance(relations_of_interest, list))
 
@@ -481,4 +1126,287 @@ class Obo(dict):
 
         return leaves
 
-    # TODO: Write to_json()
+    def to_obo(self, path, header=None):
+        """
+        Writes the ontology to an `.obo` file, which `load_obo` reads back into the same terms and typedefs. Terms are
+        written in order of their identifiers, one stanza at a time, followed by [Typedef] stanzas.
+
+        Sources that `load_obo` extracts from definitions and synonyms (e.g. 'FMA': ['FMA:7088']) aren't written
+        separately. Relationships other than 'is_a', 'intersection_of' and 'union_of' are written as "relationship:"
+        lines.
+
+        :param path: file to write to, gzip compressed if it ends with '.gz', e.g. 'uberon-slim.obo.gz'.
+        :param header: optional `dict` of header tags, e.g. {'ontology': 'uberon'}. 'format-version' is always 1.2.
+        :return: number of terms written.
+        """
+        relationships = (set(self._relationships) | set(self.typedefs)) - set(_term_tag_order)
+        with _open_text(path, 'w') as f:
+            f.write('format-version: 1.2\n')
+            for tag, value in (header or {}).items():
+                f.write(f'{tag}: {value}\n')
+            f.write('\n')
+            for term in sorted(self):
+                f.write('\n'.join(_term_lines(term, self[term], relationships)) + '\n')
+            for typedef in sorted(self.typedefs):
+                f.write('\n'.join(_typedef_lines(typedef, self.typedefs[typedef])) + '\n')
+        return len(self)
+
+    def to_parquet(self, path, compression='snappy'):
+        """
+        Saves the ontology to a directory of Parquet files, with tables of terms, attributes, edges, synonyms and
+        typedefs (see `ontolopy.parquet.write_obo_parquet`). Needs `pyarrow`.
+
+        :param path: directory to write to (created if it doesn't exist).
+        :param compression: Parquet compression, e.g. 'snappy', 'zstd' or None.
+        :return:
+        """
+        from .parquet import write_obo_parquet
+
+        write_obo_parquet(self, path, compression)
+
+    @staticmethod
+    def from_parquet(path, tables=None):
+        """
+        Loads an ontology saved with `Obo.to_parquet`. Needs `pyarrow`.
+
+        :param path: directory written by `Obo.to_parquet`.
+        :param tables: optional list of the tables to load, e.g. ['terms', 'edges'] to leave out attributes and
+          synonyms.
+        :return: `Obo` ontology object.
+        """
+        from .parquet import read_obo_parquet
+
+        return read_obo_parquet(path, tables)
+
+
+class OboView(Mapping):
+    """
+    Read-only view of some of the terms of an ontology. The view shares the ontology's term dictionaries, so creating
+    it copies nothing, but changes to the ontology are seen by the view. The view's own cached indexes (e.g. its name
+    index) are rebuilt after the ontology changes (see `Obo.clear_cache`).
+
+    Methods of the ontology's class (e.g. `Obo.leaves`, `Uberon.sample_map_by_ont`) can be used on the view, and see
+    only the view's terms. Use `Obo(dict(view))` to make an independent copy.
+    """
+
+    def __init__(self, parent, terms=None, excluded=None, cls=None):
+        """
+        :param parent: `Obo` ontology object (or another view).
+        :param terms: terms to include, or None to include all of the parent's terms.
+        :param excluded: terms to leave out.
+        :param cls: class whose methods can be used on the view, by default the parent's class.
+        """
+        if cls is None:
+            cls = parent._cls if isinstance(parent, OboView) else type(parent)
+        if terms is not None:
+            terms = frozenset(term for term in terms if term in parent)
+        if excluded is not None:
+            excluded = frozenset(term for term in excluded if term in parent)
+            if terms is not None:
+                terms, excluded = terms - excluded, None
+
+        self._parent = parent
+        self._terms = terms
+        self._excluded = excluded
+        self._cls = cls
+
+    def __getattr__(self, name):
+        # Look up methods and other attributes of the ontology's class, bound to the view.
+        if name.startswith('__') or name in ('_parent', '_terms', '_excluded', '_cls'):
+            raise AttributeError(name)
+        attribute = getattr(self._cls, name)
+        if isinstance(attribute, property):
+            return attribute.fget(self)
+        if isinstance(attribute, types.FunctionType):
+            return types.MethodType(attribute, self)
+        return attribute
+
+    def __contains__(self, term):
+        if self._terms is not None:
+            return term in self._terms
+        if self._excluded is not None and term in self._excluded:
+            return False
+        return term in self._parent
+
+    def __getitem__(self, term):
+        if term not in self:
+            raise KeyError(term)
+        return self._parent[term]
+
+    def __iter__(self):
+        if self._terms is None and self._excluded is None:
+            return iter(self._parent)
+        return (term for term in self._parent if term in self)
+
+    def __len__(self):
+        if self._terms is not None:
+            return len(self._terms)
+        return len(self._parent) - (len(self._excluded) if self._excluded is not None else 0)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} of {len(self)} {self._cls.__name__} terms>'
+
+    @property
+    def terms(self):
+        """
+        The ontology terms in the view (a `KeysView` object).
+        :return:
+        """
+        return self.keys()
+
+    @property
+    def typedefs(self):
+        """
+        Relation types defined in the ontology's [Typedef] stanzas (see `Obo.typedefs`).
+        :return:
+        """
+        return self._parent.typedefs
+
+    def _cached(self, key, build):
+        # the view's indexes cover only its terms, so they are cached by the view, until the parent changes
+        version = self._parent._version()
+        if self.__dict__.get('_cache_version') != version:
+            self.__dict__['_cache'] = {}
+            self.__dict__['_cache_version'] = version
+        return Obo._cached(self, key, build)
+
+    def clear_cache(self):
+        self.__dict__['_cache'] = {}
+
+    def _version(self):
+        return self._parent._version()
+
+
+class RelationRegistry:
+    """
+    Properties of relation types, from an ontology's [Typedef] stanzas: whether they are transitive, their inverses,
+    and which relations are sub-properties of them (through `is_a`).
+
+    Searches (`Relations`, `shortest_relation`, ...) use it to follow sub-properties of the allowed relations, but
+    still follow relationships edge by edge; transitivity is only used by `Obo.holds`. `holds_over_chain` tags are
+    kept in `Obo.typedefs` (and written by `Obo.to_obo`), but not used.
+    """
+
+    def __init__(self, typedefs):
+        """
+        :param typedefs: `dict` mapping relation type to its properties (see `Obo.typedefs`).
+        """
+        self.typedefs = typedefs
+
+        self._subproperties = {}  # relation: direct sub-properties
+        self._inverses = {}
+        for relation, typedef in typedefs.items():
+            for parent in typedef.get('is_a', []):
+                self._subproperties.setdefault(parent, []).append(relation)
+            for inverse in typedef.get('inverse_of', []):
+                self._inverses.setdefault(relation, inverse)
+                self._inverses.setdefault(inverse, relation)
+        self._expanded = {}
+
+    def is_transitive(self, relation: str) -> bool:
+        """
+        :param relation: relation type, e.g. 'part_of'.
+        :return: True if `relation` is transitive.
+        """
+        return self.typedefs.get(relation, {}).get('is_transitive') == 'true'
+
+    def inverse(self, relation: str):
+        """
+        :param relation: relation type, e.g. 'part_of'.
+        :return: the inverse of `relation`, e.g. 'has_part', or None if it doesn't have one.
+        """
+        return self._inverses.get(relation)
+
+    def subproperties(self, relation: str) -> list:
+        """
+        :param relation: relation type, e.g. 'part_of'.
+        :return: list of relation types which are (directly or indirectly) sub-properties of `relation`.
+        """
+        subproperties = []
+        to_check = [relation]
+        while to_check:
+            for subproperty in self._subproperties.get(to_check.pop(0), []):
+                if subproperty != relation and subproperty not in subproperties:
+                    subproperties.append(subproperty)
+                    to_check.append(subproperty)
+        return subproperties
+
+    def expand(self, relations) -> list:
+        """
+        Adds the sub-properties of `relations` to `relations`, e.g. so that a search that allows 'part_of' also
+        follows its sub-properties.
+
+        :param relations: list of relation types, e.g. ['is_a', 'part_of']
+        :return: list of relation types.
+        """
+        key = tuple(relations)
+        try:
+            return self._expanded[key]
+        except KeyError:
+            expanded = list(relations)
+            for relation in relations:
+                expanded += [subproperty for subproperty in self.subproperties(relation) if subproperty not in expanded]
+            self._expanded[key] = expanded
+            return expanded
+
+
+class XrefIndex:
+    """
+    Index of cross-references (xrefs) from ontology terms to external identifiers, e.g. 'UBERON:0000948' to
+    'FMA:7088'. Cross-references are read from terms' `xref` entries and from the sources that `load_obo` extracts
+    from definitions and synonyms (stored with the external ontology prefix as the key, e.g. `'FMA': ['FMA:7088']`).
+    """
+
+    def __init__(self, ont):
+        """
+        Builds the index in one pass over `ont`.
+
+        :param ont: `Obo` ontology object.
+        """
+        not_xrefs = set(Obo._relationships + Obo._nestable_attributes + Obo._attributes + Obo._strings)
+
+        self.by_prefix = {}  # external prefix: set of terms, e.g. 'FMA': {'UBERON:0000948', ...}
+        self.by_id = {}  # external identifier: list of terms, e.g. 'FMA:7088': ['UBERON:0000948']
+        for term, attributes in ont.items():
+            for key, values in attributes.items():
+                if key in not_xrefs or not isinstance(values, list):
+                    continue
+                if key != 'xref' and not all(value.startswith(f'{key}:') for value in values):
+                    continue
+                for value in values:
+                    self.by_prefix.setdefault(value.split(':')[0], set()).add(term)
+                    terms = self.by_id.setdefault(value, [])
+                    if term not in terms:
+                        terms.append(term)
+
+    def terms_with(self, prefix: str) -> set:
+        """
+        Terms with a cross-reference to the external ontology `prefix`.
+
+        :param prefix: external ontology prefix, e.g. 'FMA'.
+        :return: `set` of terms.
+        """
+        return self.by_prefix.get(prefix, set())
+
+    def terms_for(self, external_id: str) -> list:
+        """
+        Terms with a cross-reference to `external_id`.
+
+        :param external_id: external identifier, e.g. 'FMA:7088'.
+        :return: `list` of terms.
+        """
+        return self.by_id.get(external_id, [])
+
+    def translate(self, external_ids):
+        """
+        Translates external identifiers into ontology terms. Where several terms refer to the same identifier, the
+        first is given (see `XrefIndex.by_id` for all of them).
+
+        :param external_ids: iterable of external identifiers, e.g. ['FMA:7088', 'FMA:9462'].
+        :return: `pd.Series` of terms (`np.nan` where there is no term), indexed by `external_ids`.
+        """
+        import pandas as pd
+
+        external_ids = pd.Index(list(external_ids))
+        first_terms = {external_id: terms[0] for external_id, terms in self.by_id.items()}
+        return pd.Series(external_ids.map(first_terms), index=external_ids)
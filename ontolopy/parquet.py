@@ -0,0 +1,169 @@
+"""
+This module contains code for saving ontologies to, and loading them from, directories of Parquet files (one table for
+each kind of information: terms, attributes, edges, synonyms and typedefs). Needs `pyarrow`.
+"""
+
+import os
+
+from .obo import Obo, _extract_synonym, _extract_synonym_type
+
+_tables = ['terms', 'attributes', 'edges', 'synonyms', 'typedefs']
+
+
+def _table_path(path, table):
+    return os.path.join(path, f'{table}.parquet')
+
+
+def _relation_types(ont):
+    return set(ont._relationships + ont._nestable_attributes + list(ont.typedefs))
+
+
+def _attribute_rows(items, skip=()):
+    """
+    Rows of (owner, attribute, value, is_list) for the attributes of terms or typedefs, e.g. ('UBERON:1', 'subset',
+    'organ_slim', True). Tuple values (`holds_over_chain` relations) are stored joined by spaces, as in .obo files.
+    """
+    owners, attributes, values, is_list = [], [], [], []
+    for owner, owner_attributes in items:
+        for attribute, value in owner_attributes.items():
+            if attribute in skip:
+                continue
+            value_list = value if isinstance(value, list) else [value]
+            owners += [owner] * len(value_list)
+            attributes += [attribute] * len(value_list)
+            values += [' '.join(x) if isinstance(x, tuple) else str(x) for x in value_list]
+            is_list += [isinstance(value, list)] * len(value_list)
+    return owners, attributes, values, is_list
+
+
+def write_obo_parquet(ont, path, compression='snappy'):
+    """
+    Saves `ont` to a directory of Parquet files:
+
+    - terms.parquet: 'term' and 'name'.
+    - edges.parquet: 'source', 'relation' (dictionary encoded) and 'target', for relationships.
+    - synonyms.parquet: 'term', 'synonym', 'synonym_type' and 'value' (the original line).
+    - attributes.parquet: 'term', 'attribute', 'value' and 'is_list', for everything else.
+    - typedefs.parquet: 'typedef', 'tag', 'value' and 'is_list', for [Typedef] stanzas.
+
+    :param ont: `Obo` ontology object.
+    :param path: directory to write to (created if it doesn't exist).
+    :param compression: Parquet compression, e.g. 'snappy', 'zstd' or None.
+    :return:
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(path, exist_ok=True)
+    relations = _relation_types(ont)
+
+    def write(table, columns):
+        pq.write_table(pa.table(columns), _table_path(path, table), compression=compression)
+
+    write('terms', {
+        'term': pa.array(list(ont), pa.string()),
+        'name': pa.array([attributes.get('name') for attributes in ont.values()], pa.string()),
+    })
+
+    sources, edge_relations, targets, _ = _attribute_rows(
+        ((term, {relation: value for relation, value in attributes.items() if relation in relations})
+         for term, attributes in ont.items()))
+    write('edges', {
+        'source': pa.array(sources, pa.string()),
+        'relation': pa.array(edge_relations, pa.string()).dictionary_encode(),
+        'target': pa.array(targets, pa.string()),
+    })
+
+    terms, _, values, _ = _attribute_rows((term, {'synonym': attributes['synonym']})
+                                          for term, attributes in ont.items() if 'synonym' in attributes)
+    write('synonyms', {
+        'term': pa.array(terms, pa.string()),
+        'synonym': pa.array([_extract_synonym(value) for value in values], pa.string()),
+        'synonym_type': pa.array([_extract_synonym_type(value) for value in values], pa.string()).dictionary_encode(),
+        'value': pa.array(values, pa.string()),
+    })
+
+    terms, attributes, values, is_list = _attribute_rows(ont.items(), skip=relations | {'name', 'synonym'})
+    write('attributes', {
+        'term': pa.array(terms, pa.string()),
+        'attribute': pa.array(attributes, pa.string()).dictionary_encode(),
+        'value': pa.array(values, pa.string()),
+        'is_list': pa.array(is_list, pa.bool_()),
+    })
+
+    typedefs, tags, values, is_list = _attribute_rows(ont.typedefs.items())
+    write('typedefs', {
+        'typedef': pa.array(typedefs, pa.string()),
+        'tag': pa.array(tags, pa.string()),
+        'value': pa.array(values, pa.string()),
+        'is_list': pa.array(is_list, pa.bool_()),
+    })
+
+
+def read_obo_table(path, table, columns=None, filters=None):
+    """
+    Reads one table of an ontology saved with `write_obo_parquet`, without building the ontology, e.g. to look up
+    names or synonyms.
+
+    :param path: directory written by `write_obo_parquet`.
+    :param table: 'terms', 'attributes', 'edges', 'synonyms' or 'typedefs'.
+    :param columns: optional list of columns to read.
+    :param filters: optional row filters (see `pyarrow.parquet.read_table`), e.g. [('relation', '==', 'is_a')].
+    :return: `pd.DataFrame`
+    """
+    import pyarrow.parquet as pq
+
+    assert(table in _tables)
+    return pq.read_table(_table_path(path, table), columns=columns, filters=filters).to_pandas()
+
+
+def read_obo_parquet(path, tables=None):
+    """
+    Loads an ontology saved with `write_obo_parquet`.
+
+    :param path: directory written by `write_obo_parquet`.
+    :param tables: optional list of the tables to load, e.g. ['terms', 'edges'] to leave out attributes and synonyms.
+      Terms are always loaded.
+    :return: `Obo` ontology object.
+    """
+    import pyarrow.parquet as pq
+
+    if tables is None:
+        tables = _tables
+
+    def read(table):
+        return pq.read_table(_table_path(path, table)).to_pydict()
+
+    ont = {}
+    terms = read('terms')
+    for term, name in zip(terms['term'], terms['name']):
+        ont[term] = {} if name is None else {'name': name}
+
+    def add_rows(owners, owner_attributes, attribute_names, values, is_list):
+        for owner, attribute, value, listed in zip(owners, attribute_names, values, is_list):
+            attributes = owner_attributes[owner]
+            if listed:
+                attributes.setdefault(attribute, []).append(value)
+            else:
+                attributes[attribute] = value
+
+    if 'attributes' in tables:
+        columns = read('attributes')
+        add_rows(columns['term'], ont, columns['attribute'], columns['value'], columns['is_list'])
+    if 'edges' in tables:
+        columns = read('edges')
+        add_rows(columns['source'], ont, columns['relation'], columns['target'], [True] * len(columns['target']))
+    if 'synonyms' in tables:
+        columns = read('synonyms')
+        add_rows(columns['term'], ont, ['synonym'] * len(columns['term']), columns['value'],
+                 [True] * len(columns['term']))
+
+    obo = Obo(ont)
+    if 'typedefs' in tables:
+        columns = read('typedefs')
+        typedefs = {typedef: {} for typedef in columns['typedef']}
+        values = [tuple(value.split()) if tag == 'holds_over_chain' else value
+                  for tag, value in zip(columns['tag'], columns['value'])]
+        add_rows(columns['typedef'], typedefs, columns['tag'], values, columns['is_list'])
+        obo.typedefs.update(typedefs)
+    return obo
@@ -0,0 +1,114 @@
+"""
+This module contains code for reporting the progress of long-running jobs (e.g. `Relations`) and for cancelling them,
+either on request or after a time budget.
+"""
+
+import threading
+import time
+
+
+class Interrupted(Exception):
+    """
+    Raised when a search is cancelled or runs out of time. `partial` holds whatever had been found so far.
+    """
+
+    def __init__(self, reason, partial=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.partial = partial
+
+
+class CancelToken:
+    """
+    Cooperative cancellation: long-running jobs check the token regularly, and stop (keeping what they have found so
+    far) once it is cancelled, or once its time budget has run out.
+
+    Tokens can be cancelled from another thread, e.g. by a service that wants to stop a job. A token with a `parent`
+    (e.g. a time budget for one source within a job) is also cancelled when its parent is.
+    """
+
+    def __init__(self, timeout=None, parent=None):
+        """
+        :param timeout: optional time budget in seconds, from now.
+        :param parent: optional parent `CancelToken`.
+        """
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.parent = parent
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def reason(self):
+        """
+        Why the token is cancelled: 'cancelled' (on request), 'timeout', or None if it isn't.
+        """
+        if self._cancelled.is_set():
+            return 'cancelled'
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            return 'timeout'
+        if self.parent is not None:
+            return self.parent.reason
+        return None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def check(self, partial=None):
+        """
+        Raises `Interrupted` if the token is cancelled.
+
+        :param partial: what has been found so far.
+        """
+        reason = self.reason
+        if reason is not None:
+            raise Interrupted(reason, partial)
+
+
+def job_token(cancel=None, timeout=None):
+    """
+    Token for a job with an optional `timeout` (in seconds) that can also be cancelled with `cancel`.
+
+    :return: `CancelToken` or None if there is nothing to cancel the job.
+    """
+    if timeout is None:
+        return cancel
+    return CancelToken(timeout, parent=cancel)
+
+
+class Progress:
+    """
+    Reports the progress of a job to a callback, at most once every `interval` seconds (and when the job is done).
+
+    The callback is called with the number of items done, the total number of items (or None if unknown), and an
+    estimate of the seconds left (or None if unknown), e.g. `callback(500, 2000, 12.5)`.
+    """
+
+    def __init__(self, callback, total=None, interval=0.5):
+        """
+        :param callback: function called with (done, total, eta).
+        :param total: total number of items, if known.
+        :param interval: minimum time between calls in seconds.
+        """
+        self.callback = callback
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.start = self._last = time.monotonic()
+
+    def eta(self):
+        """
+        :return: estimated seconds left, or None if unknown.
+        """
+        if not self.total or not self.done:
+            return None
+        return (time.monotonic() - self.start) / self.done * (self.total - self.done)
+
+    def update(self, n=1):
+        self.done += n
+        now = time.monotonic()
+        if now - self._last >= self.interval or self.done == self.total:
+            self._last = now
+            self.callback(self.done, self.total, self.eta())
@@ -1,7 +1,13 @@
 import logging
+import multiprocessing
 import numpy as np
 import pandas as pd
 import re
+import time
+from itertools import islice
+
+from . import stats as _stats
+from .progress import CancelToken, Interrupted, Progress, job_token
 
 # divide between term (r) and relation (r) in relation path
 divider_tr = '.'
@@ -27,26 +33,45 @@ def relation_path_to_text(relation_path, ont):
     :param relation_path: path describing the relationship between two terms, e.g. "UBERON:123913.is_a-UBERON:1381239"
     :return:
     """
+    if not _stats.recording():
+        return _relation_path_to_text(relation_path, ont)
+    start = time.perf_counter()
+    relation_text = _relation_path_to_text(relation_path, ont)
+    _stats.add_time('relation_path_to_text', time.perf_counter() - start)
+    return relation_text
+
+
+def _relation_path_to_text(relation_path, ont):
     if pd.isna(relation_path):
         return relation_path
-    # TODO: add fix for alt-ids, obsolete terms, etc. For now just keep their ID.
     for i, sub_relation in enumerate(relation_path.split(divider_tr)):
         if i == 0:
             # sub_relation is actually the source *term* identifier for i == 0.
             try:
                 relation_text = ont[sub_relation]['name']
             except KeyError:
-                relation_text = sub_relation
+                relation_text = _resolved_name(sub_relation, ont)
             continue
         relation = sub_relation.split(divider_rt)[0].replace('_', ' ')
         term_id = sub_relation.split(divider_rt)[-1]
         try:
             relation_text += f" {relation} {ont[term_id]['name']}"
         except KeyError:
-            relation_text += f" {relation} {term_id}"
+            relation_text += f" {relation} {_resolved_name(term_id, ont)}"
     return relation_text
 
 
+def _resolved_name(term_id, ont):
+    """
+    Name of the term that an alternative or obsolete identifier resolves to (see `Obo.id_resolution`), or the
+    identifier itself if it can't be resolved (e.g. external terms).
+    """
+    resolved = ont.id_resolution().get(term_id) if hasattr(ont, 'id_resolution') else None
+    if resolved in ont and 'name' in ont[resolved]:
+        return ont[resolved]['name']
+    return term_id
+
+
 def _found_term(relation_path):
     """
     Finds the last term in the relation path.
@@ -61,59 +86,145 @@ def _found_term(relation_path):
         return relation_path.split(divider_rt)[-1]
 
 
-def _check_if_found(new_term: str, targets: list) -> bool:
+def _expand_relations(allowed_relations, ont):
     """
-    Checks if `new_term` matches `targets`.
+    Adds the sub-properties of `allowed_relations`, from the ontology's [Typedef] stanzas (see `Obo.relation_registry`).
+    """
+    try:
+        registry = ont.relation_registry()
+    except AttributeError:
+        return allowed_relations
+    return registry.expand(allowed_relations)
 
-    :param new_term: string to check
-    :param targets: list of strings to match to `new_term`. Targets can be a list of specific targets, e.g.
-        ['UBERON:123219', 'UBERON:1288990'] or of general ontology prefixes, e.g. ['UBERON']
-    :return:
+
+# Names of inverse relations that ontologies don't usually define with `inverse_of`:
+_inverse_relations = {
+    'is_a': 'has_subclass',
+}
+
+
+def _inverse_relation(relation, ont):
     """
+    Name of the inverse of `relation`, e.g. 'has_part' for 'part_of', from the ontology's [Typedef] stanzas if it
+    defines one, otherwise e.g. 'inverse_develops_from'.
+    """
+    try:
+        inverse = ont.relation_registry().inverse(relation)
+    except AttributeError:
+        inverse = None
+    if inverse is None:
+        inverse = _inverse_relations.get(relation, f'inverse_{relation}')
+    return inverse
 
-    if (':' in targets[0]) and (new_term in targets):  # specific
-        relation_found = True
-    elif (':' not in targets[0]) and (new_term.split(':')[0] in targets):  # general
-        relation_found = True
-    else:
-        relation_found = False
 
-    return relation_found
+class TargetMatcher:
+    """
+    Matches terms against targets and excluded terms. Built once (e.g. per `Relations` call) and reused for every
+    source, since it is checked for every edge that a search follows.
+    """
+
+    def __init__(self, targets, excluded=None):
+        """
+        :param targets: list of targets. Targets can be specific terms, e.g. ['UBERON:123219', 'UBERON:1288990'],
+          general ontology prefixes, e.g. ['UBERON'], or a mixture of both, e.g. ['UBERON', 'CL:0000048'].
+        :param excluded: a list/set of terms which are never matched, and which searches may not pass through.
+        """
+        if excluded is None:
+            excluded = []
+        self.specific = frozenset(target for target in targets if ':' in target)
+        self.prefixes = frozenset(target for target in targets if ':' not in target)
+        self.excluded = frozenset(excluded)
+
+        if not self.prefixes:
+            self.is_target = self.specific.__contains__
+        self.is_excluded = self.excluded.__contains__
+
+    def is_target(self, term: str) -> bool:
+        """
+        Checks if `term` matches the targets.
+
+        :param term: term to check, e.g. 'UBERON:0000948'.
+        :return:
+        """
+        return term in self.specific or term.partition(':')[0] in self.prefixes
+
+    def is_excluded(self, term: str) -> bool:
+        """
+        Checks if `term` is excluded.
+
+        :param term: term to check, e.g. 'UBERON:0000061'.
+        :return:
+        """
+        return term in self.excluded
 
 
 class Relations(pd.DataFrame):
 
-    def __init__(self, allowed_relations: list, ont, sources=None, targets=None, source_targets=None, excluded=None, col_names=None, mode='any'):
+    # statistics of finding the relations (see `ontolopy.stats`), if they were being collected, the sources whose
+    # search was interrupted (see `progress`, `cancel` and `timeout`) and the sources that were resolved to other terms
+    # (see `resolve_ids`)
+    _metadata = ['stats', 'incomplete', 'resolved']
+    stats = None
+    incomplete = None
+    resolved = None
+
+    def __init__(self, allowed_relations: list, ont, sources=None, targets=None, source_targets=None, excluded=None,
+                 col_names=None, mode='any', max_depth=None, max_paths_per_source=None, k_shortest=None,
+                 direction='up', progress=None, cancel=None, timeout=None, source_timeout=None, resolve_ids=True):
         """
         Pandas Dataframe containing relationships between `sources` and `targets` terms according to `ont`.
-        Finds relationships that do not pass through `excluded` terms and uses only `allowed_relations`. We keep looking
-        until we find a relation to a target (if mode == 'any') or we run out of leads.
+        Finds relationships that do not pass through `excluded` terms and uses only `allowed_relations` (and their
+        sub-properties, if `ont` has [Typedef] stanzas that define any). We keep looking until we find a relation to a
+        target (if mode == 'any') or we run out of leads.
 
         :param allowed_relations: a list of allowed relations, e.g. ['is_a', 'part_of']
         :param sources: list of sources. For mode `all` must be a list of source-target tuple airs.
-        :param mode: 'any' or 'all' - 'all is looking for specific term1-term2 pairs, while 'any' is looking for any
-          relationship between something in specific source and anything in targets.
+        :param mode: 'any', 'all' or 'pair' - 'all is looking for specific term1-term2 pairs, while 'any' is looking for
+          any relationship between something in specific source and anything in targets. 'pair' looks for the shortest
+          relationship between each of the `source_targets` pairs, searching from both ends (see `shortest_relation`).
         :param targets: list of targets.
         :param source_targets: list of tuples of source-target pairs. Do not provide source or targets if using this
-          parameter. Only runs in "all" mode.
+          parameter. Only runs in "pair" mode.
         :param ont: Obo ontology object.
         :param excluded: a list/set of terms which are explicitly not being searched for (which may otherwise match the
           targets). Useful e.g. if we want to look for any tissue targets with prefix 'UBERON', except for very general
           ones. Does not allow relationships that pass through this term.
         :param col_names: Alternative column names for the output of Relations Data Frame, by default is
           ['from', 'relation_path', 'relation_text', 'to']
+        :param max_depth: if given, the maximum number of relations in a path (modes 'any' and 'all').
+        :param max_paths_per_source: if given, the maximum number of paths found for each source (mode 'all'). Paths
+          are found in order of increasing length, so these are the shortest ones.
+        :param k_shortest: if given, the maximum number of paths found from each source to each target term
+          (mode 'all'), again keeping the shortest.
+        :param direction: 'up' (default) to find relationships from sources to targets, e.g. "left ventricle part of
+          heart", or 'down' to find relationships from targets to sources, written from the source, e.g. "heart has
+          part left ventricle" (modes 'any' and 'all').
+        :param progress: optional function called with the number of sources searched, the total number of sources,
+          and an estimate of the seconds left (or None), at most twice a second (see `ontolopy.progress.Progress`).
+        :param cancel: optional `ontolopy.progress.CancelToken` that stops the search when cancelled, e.g. from another
+          thread.
+        :param timeout: optional time budget in seconds for the whole search.
+        :param source_timeout: optional time budget in seconds for the search from each source.
+        :param resolve_ids: if True, alternative and obsolete identifiers of sources and targets are resolved to current
+          terms before searching (see `Obo.id_resolution`). The index keeps the original sources, and
+          `Relations.resolved` maps each resolved source to the term searched from.
+
+        Sources whose search is cancelled or runs out of time keep the relations found so far (if any), and are listed
+        in `Relations.incomplete`, mapping each source to 'cancelled' or 'timeout'.
         """
         # TODO: Add default for allowed_relations?
         # TODO: put parameters in order
 
-        assert (mode in ['any', 'all'])
+        assert (mode in ['any', 'all', 'pair'])
 
         if source_targets:
-            assert mode == 'all'
+            assert mode == 'pair'
             assert (not sources)
             assert (not targets)
-            assert (not excluded)
+            source_targets = list(source_targets)
+            sources = [source for source, _ in source_targets]
         else:
+            assert mode != 'pair'
             assert targets
             assert isinstance(targets, list)
 
@@ -146,55 +257,154 @@ class Relations(pd.DataFrame):
                                         dtype=None,
                                         copy=True)
         self.index.rename(col_names[0], inplace=True)
+        self.incomplete = {}
+        self.resolved = {}
+
+        search_sources = list(self.index)
+        resolution = ont.id_resolution() if resolve_ids else None
+        if resolution:
+            search_sources = ont.resolve_ids(search_sources)
+            self.resolved = {source: resolution[source] for source in self.index if source in resolution}
+            if source_targets:
+                source_targets = list(zip(search_sources, ont.resolve_ids(target for _, target in source_targets)))
+            else:
+                targets = ont.resolve_ids(targets)
+            if excluded:
+                excluded = ont.resolve_ids(excluded)
+
+        job = {'progress': progress, 'cancel': job_token(cancel, timeout), 'source_timeout': source_timeout}
+        if _stats.recording():
+            # keep the statistics of finding these relations with them (as `Relations.stats`)
+            with _stats.collect() as stats:
+                with _stats.timer('relations'):
+                    self._calculate(mode, allowed_relations, search_sources, targets, source_targets, ont, excluded,
+                                    max_depth, max_paths_per_source, k_shortest, direction, **job)
+            self.stats = stats
+        else:
+            self._calculate(mode, allowed_relations, search_sources, targets, source_targets, ont, excluded,
+                            max_depth, max_paths_per_source, k_shortest, direction, **job)
 
+    def _calculate(self, mode, allowed_relations, sources, targets, source_targets, ont, excluded, max_depth,
+                   max_paths_per_source, k_shortest, direction, **job):
         if mode == 'any':
-            self._calculate_any(allowed_relations, targets, ont, excluded)
+            self._calculate_any(allowed_relations, sources, TargetMatcher(targets, excluded), ont, max_depth,
+                                direction, **job)
         elif mode == 'all':
             # TODO: fix/test for both source-target and source-and-target modes
-            self._calculate_all(allowed_relations, targets, ont, excluded)
+            self._calculate_all(allowed_relations, sources, TargetMatcher(targets, excluded), ont, max_depth,
+                                max_paths_per_source, k_shortest, direction, **job)
+        elif mode == 'pair':
+            self._calculate_pair(allowed_relations, source_targets, ont, excluded, **job)
 
-    def _calculate_all(self, allowed_relations, targets, ont, excluded):
+    def _search_sources(self, search, items, empty, progress=None, cancel=None, source_timeout=None):
+        """
+        Runs `search(item, token)` for each of `items` (one per source, in the order of `self.index`), where `token` is
+        the `CancelToken` for that source (or None), reporting progress and stopping early if the job is cancelled.
+        Sources that are interrupted keep whatever was found so far (or `empty()`), and are added to `self.incomplete`.
+
+        :return: list of results, one per source.
+        """
+        reporter = Progress(progress, len(self.index)) if progress is not None else None
+        results = []
+        for source, item in zip(self.index, items):
+            reason = cancel.reason if cancel is not None else None
+            if reason is not None:
+                self.incomplete[source] = reason
+                results.append(empty())
+                continue
+
+            token = cancel if source_timeout is None else CancelToken(source_timeout, parent=cancel)
+            try:
+                results.append(search(item, token))
+            except Interrupted as interrupted:
+                self.incomplete[source] = interrupted.reason
+                results.append(empty() if interrupted.partial is None else interrupted.partial)
+            if reporter is not None:
+                reporter.update()
+        return results
+
+    def _calculate_all(self, allowed_relations, sources, matcher, ont, max_depth=None, max_paths_per_source=None,
+                       k_shortest=None, direction='up', **job):
         """
         Looks for relations between all specified pairs of source term to target term.
 
-        Basically, only stops looking when we stop getting new relations.
+        Basically, only stops looking when we stop getting new relations, or reach one of the limits.
 
         :param allowed_relations:
+        :param sources: terms to search from, in the same order as `self.index`.
+        :param matcher: `TargetMatcher` for the targets and excluded terms.
         :param ont:
-        :param excluded:
+        :param max_depth:
+        :param max_paths_per_source:
+        :param k_shortest:
+        :param direction:
+        :param job: `progress`, `cancel` and `source_timeout` (see `_search_sources`).
         :return:
         """
         # TODO: Add functionaltiy for source_targets, or remove because this function is the same as _calculate_any
-        found_relation_paths = []
-        for source in self.index:
-            found_relation_path_list = _find_relation(source, allowed_relations, targets, ont, excluded, 'all')
-            found_relation_paths.append(found_relation_path_list)
+        found_relation_paths = self._search_sources(
+            lambda source, token: _find_relation(source, allowed_relations, matcher, ont, mode='all',
+                                                 max_depth=max_depth, max_paths_per_source=max_paths_per_source,
+                                                 k_shortest=k_shortest, direction=direction, cancel=token),
+            sources, list, **job)
 
         # Format output:
-        self.iloc[:, 0] = found_relation_paths
-        self.iloc[:, 1] = [[relation_path_to_text(pth, ont) for pth in lst] for lst in found_relation_paths]
-        self.iloc[:, 2] = [[_found_term(pth) for pth in lst] for lst in found_relation_paths]
+        self._fill(found_relation_paths,
+                   [[relation_path_to_text(pth, ont) for pth in lst] for lst in found_relation_paths],
+                   [[_found_term(pth) for pth in lst] for lst in found_relation_paths])
 
-    def _calculate_any(self, allowed_relations, targets, ont, excluded):
+    def _calculate_any(self, allowed_relations, sources, matcher, ont, max_depth=None, direction='up', **job):
         """
         Looks for relation of any souce term to any target term. Stops looking when relation found.
 
         :param allowed_relations:
-        :param targets:
+        :param sources: terms to search from, in the same order as `self.index`.
+        :param matcher: `TargetMatcher` for the targets and excluded terms.
+        :param ont:
+        :param max_depth:
+        :param direction:
+        :param job: `progress`, `cancel` and `source_timeout` (see `_search_sources`).
+        :return:
+        """
+        found_relation_paths = self._search_sources(
+            lambda source, token: _find_relation(source, allowed_relations, matcher, ont, max_depth=max_depth,
+                                                 direction=direction, cancel=token),
+            sources, lambda: np.nan, **job)
+
+        # Format output:
+        self._fill(found_relation_paths,
+                   [relation_path_to_text(relation_path, ont) for relation_path in found_relation_paths],
+                   [_found_term(relation_path) for relation_path in found_relation_paths])
+
+    def _calculate_pair(self, allowed_relations, source_targets, ont, excluded, **job):
+        """
+        Looks for the shortest relation from each source term to its paired target term.
+
+        :param allowed_relations:
+        :param source_targets: list of (source, target) tuples, in the same order as `self.index`.
         :param ont:
         :param excluded:
+        :param job: `progress`, `cancel` and `source_timeout` (see `_search_sources`).
         :return:
         """
-        found_relation_paths = []
-        for source in self.index:
-            # TODO: Make sure that _check_if_found can handle both types of target
-            found_relation_path = _find_relation(source, allowed_relations, targets, ont, excluded)
-            found_relation_paths.append(found_relation_path)
+        found_relation_paths = self._search_sources(
+            lambda source_target, token: shortest_relation(*source_target, allowed_relations, ont, excluded,
+                                                           cancel=token),
+            source_targets, lambda: np.nan, **job)
+
+        # Format output:
+        self._fill(found_relation_paths,
+                   [relation_path_to_text(relation_path, ont) for relation_path in found_relation_paths],
+                   [_found_term(relation_path) for relation_path in found_relation_paths])
 
-            # Format output:
-        self.iloc[:, 0] = found_relation_paths
-        self.iloc[:, 1] = [relation_path_to_text(relation_path, ont) for relation_path in found_relation_paths]
-        self.iloc[:, 2] = [_found_term(relation_path) for relation_path in found_relation_paths]
+    def _fill(self, relation_paths, relation_texts, found_terms):
+        """
+        Fills in the columns (relation paths, relation texts, targets).
+        """
+        with _stats.timer('relations.dataframe'):
+            self.iloc[:, 0] = relation_paths
+            self.iloc[:, 1] = relation_texts
+            self.iloc[:, 2] = found_terms
 
     def format_all(self, ont, targets):
         """
@@ -222,80 +432,514 @@ class Relations(pd.DataFrame):
 
         return formatted_df
 
+    def to_parquet(self, path, compression='snappy'):
+        """
+        Writes the relationships to a Parquet file (see `read_relations`). Needs `pyarrow`.
+
+        Relation paths, texts and targets are list columns in mode 'all', and otherwise string columns with the targets
+        dictionary encoded (a categorical column when read by pandas).
+
+        :param path: file to write to, e.g. 'relations.parquet'.
+        :param compression: Parquet compression, e.g. 'snappy', 'zstd' or None.
+        :return:
+        """
+        import pyarrow.parquet as pq
 
-def _find_relation(source, allowed_relations, targets, ont, excluded, mode='any'):
+        frame = pd.DataFrame(self).reset_index()
+        lists = any(isinstance(value, list) for value in frame.iloc[:, 1])
+        schema = _parquet_schema(frame.columns, lists)
+        pq.write_table(_parquet_table(frame, schema), path, compression=compression)
+
+
+def _parquet_schema(columns, lists):
     """
-    Searches ontology `ont` for a relationship path between `source` and `target` (self.index), which does not pass
-    through `excluded` and uses only `allowed_relations`.
+    Arrow schema for relationships with `columns` (source, relation path, relation text, target), with list columns if
+    `lists` (mode 'all').
+    """
+    import pyarrow as pa
+
+    if lists:
+        column_types = [pa.list_(pa.string())] * 3
+    else:
+        column_types = [pa.string(), pa.string(), pa.dictionary(pa.int32(), pa.string())]
+    return pa.schema([(columns[0], pa.string())] + list(zip(columns[1:], column_types)))
+
+
+def _parquet_table(frame, schema):
+    """
+    Converts relationships (with the source as a column) to an Arrow table with `schema` (see `_parquet_schema`).
+    Relationships that weren't found (NaN) become nulls.
+    """
+    import pyarrow as pa
+
+    arrays = []
+    for column, field in zip(frame.columns, schema):
+        values = [None if not isinstance(value, list) and pd.isna(value) else value for value in frame[column]]
+        value_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+        arrays.append(pa.array(values, value_type).cast(field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def read_relations(path, columns=None):
+    """
+    Reads relationships written by `Relations.to_parquet` or `write_relations`.
+
+    :param path: Parquet file, e.g. 'relations.parquet'.
+    :param columns: optional list of columns to read (besides the source column, which is the index).
+    :return: `pd.DataFrame` indexed by source, with lists for list columns.
+    """
+    import pyarrow.parquet as pq
+
+    if columns is not None:
+        columns = [pq.read_schema(path).names[0]] + list(columns)
+    frame = pq.read_table(path, columns=columns).to_pandas()
+    for column in frame.columns[1:]:
+        if frame[column].dtype == object and any(hasattr(value, 'tolist') for value in frame[column]):
+            frame[column] = [value.tolist() if hasattr(value, 'tolist') else value for value in frame[column]]
+    return frame.set_index(frame.columns[0])
+
 
-    We keep looking until we find a relation to a target (relation_found == True) or we run out of leads
-    (unchanged == True, i.e. we have no new relation strings after another loop).
+def _relation_record(source, allowed_relations, matcher, ont, mode='any', limits=None, resolution=None):
+    """
+    Finds the relations of a single source, as a (source, relation_path, relation_text, to) tuple (see `Relations`).
 
+    :param source: source term, or (source, target) tuple in mode 'pair'.
     :param allowed_relations:
-    :param targets: list of types of targets, e.g. ["GO"]
+    :param matcher: `TargetMatcher` for the targets and excluded terms.
     :param ont:
-    :param excluded:
+    :param mode: 'any', 'all' or 'pair'.
+    :param limits: `dict` of keyword arguments for `_find_relation`, e.g. `{'max_depth': 3}`.
+    :param resolution: optional `dict` resolving alternative and obsolete identifiers (see `Obo.id_resolution`).
     :return:
     """
-    # TODO: check if it's quicker to have a list of tuples ('is_a', 'termID') instead of long string.
-    #
+    if resolution is None:
+        resolution = {}
+    if mode == 'pair':
+        source, target = source
+        relation_path = shortest_relation(resolution.get(source, source), resolution.get(target, target),
+                                          allowed_relations, ont, matcher.excluded)
+    else:
+        relation_path = _find_relation(resolution.get(source, source), allowed_relations, matcher, ont, mode=mode,
+                                       **(limits or {}))
+
     if mode == 'all':
-        found_relation_paths = set()
+        return (source, relation_path, [relation_path_to_text(pth, ont) for pth in relation_path],
+                [_found_term(pth) for pth in relation_path])
+    return source, relation_path, relation_path_to_text(relation_path, ont), _found_term(relation_path)
 
-    checked_terms = set()
 
-    relation_paths = [source]
-    relation_found = False
-    unchanged = False
+# Arguments for `_relation_record` in worker processes, set once per worker by `_init_worker`.
+_worker_args = None
 
-    while (not (relation_found and mode == 'any')) and (not unchanged):
-        new_relation_paths = []
-        for relation_path in relation_paths:
-            most_recent_term = relation_path.split(divider_rt)[-1]
 
-            if most_recent_term in checked_terms:
-                continue
+def _init_worker(*args):
+    global _worker_args
+    _worker_args = args
+
+
+def _worker_relation_record(source):
+    return _relation_record(source, *_worker_args)
+
+
+def _imap_windows(pool, function, items, chunksize, n_chunks):
+    """
+    Like `pool.imap(function, items, chunksize)`, but only reads `n_chunks` chunks of `items` at a time (and waits
+    for their results before reading more), so a fast or unbounded iterable of items is not all read into memory.
+    """
+    items = iter(items)
+    while True:
+        window = list(islice(items, chunksize * n_chunks))
+        if not window:
+            return
+        yield from pool.imap(function, window, chunksize=chunksize)
+
+
+def iter_relations(allowed_relations: list, ont, sources, targets=None, excluded=None, mode='any', chunksize=None,
+                   processes=None, col_names=None, resolve_ids=True, **limits):
+    """
+    Generates the relationships between `sources` and `targets` as they are found, with the same semantics as
+    `Relations`, without holding all of them in memory.
+
+    :param allowed_relations: a list of allowed relations, e.g. ['is_a', 'part_of']
+    :param ont: Obo ontology object.
+    :param sources: iterable of source terms (e.g. a generator), or of (source, target) tuples in mode 'pair'.
+    :param targets: list of targets (not used in mode 'pair').
+    :param excluded: a list/set of terms which relationships may not pass through.
+    :param mode: 'any', 'all' or 'pair' (see `Relations`).
+    :param chunksize: if given, generate `pd.DataFrame` chunks of (up to) this many sources, formatted like `Relations`,
+      instead of tuples.
+    :param processes: if given, the number of worker processes to search from sources in parallel. Results are still
+      generated in the order of `sources`.
+    :param col_names: Alternative column names, by default ['from', 'relation_path', 'relation_text', 'to']
+    :param resolve_ids: if True, search from (and to) the current terms of alternative and obsolete identifiers (see
+      `Obo.id_resolution`). Records keep the original sources.
+    :param limits: `max_depth`, `max_paths_per_source`, `k_shortest`, `direction` (see `Relations`).
+    :return: generator of (source, relation_path, relation_text, to) tuples, or of `pd.DataFrame` chunks.
+    """
+    assert (mode in ['any', 'all', 'pair'])
+    if mode != 'pair':
+        assert targets
+        assert isinstance(targets, list)
+
+    if col_names is None:
+        col_names = ['from', 'relation_path', 'relation_text', 'to']
+    else:
+        assert len(col_names) == 4
+
+    resolution = ont.id_resolution() if resolve_ids else {}
+    if resolution:
+        targets = targets and ont.resolve_ids(targets)
+        excluded = excluded and ont.resolve_ids(excluded)
+    args = (frozenset(allowed_relations), TargetMatcher(targets or [], excluded), ont, mode, limits, resolution or None)
+
+    pool = None
+    if processes:
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=args)
+        records = _imap_windows(pool, _worker_relation_record, sources, 100, 4 * processes)
+    else:
+        records = (_relation_record(source, *args) for source in sources)
+
+    try:
+        if chunksize is None:
+            yield from records
+        else:
+            while True:
+                chunk = list(islice(records, chunksize))
+                if not chunk:
+                    break
+                yield pd.DataFrame.from_records(chunk, columns=col_names).set_index(col_names[0])
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def write_relations(path, allowed_relations: list, ont, sources, targets=None, chunksize=10000, **kwargs):
+    """
+    Writes the relationships between `sources` and `targets` to a CSV or Parquet file, one chunk at a time (see
+    `iter_relations`). Parquet files (path ending with '.parquet', see `read_relations`) need `pyarrow`.
+
+    :param path: file to write to, e.g. 'relations.csv' or 'relations.parquet'.
+    :param allowed_relations: a list of allowed relations, e.g. ['is_a', 'part_of']
+    :param ont: Obo ontology object.
+    :param sources: iterable of source terms.
+    :param targets: list of targets.
+    :param chunksize: number of sources to find relations for between writes.
+    :param kwargs: other arguments for `iter_relations`, e.g. `processes`, `mode`, `excluded`.
+    :return: number of rows written.
+    """
+    parquet = str(path).endswith('.parquet')
+    writer = None
+    n_rows = 0
+    try:
+        for chunk in iter_relations(allowed_relations, ont, sources, targets, chunksize=chunksize, **kwargs):
+            if parquet:
+                import pyarrow.parquet as pq
+
+                chunk = chunk.reset_index()
+                if writer is None:
+                    schema = _parquet_schema(chunk.columns, kwargs.get('mode') == 'all')
+                    writer = pq.ParquetWriter(path, schema)
+                writer.write_table(_parquet_table(chunk, schema))
             else:
-                checked_terms.add(most_recent_term)
+                chunk.to_csv(path, mode='a' if n_rows else 'w', header=not n_rows)
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
 
-            # Ontologies can contain external terms, e.g. `NCBITaxon:9606`
-            try:
-                relations = ont[most_recent_term].keys()
-            except KeyError:
-                relations = []
 
-            for relation in relations:
-                if relation not in allowed_relations:
-                    new_terms = []
+def iter_relation_paths(source, allowed_relations, targets, ont, excluded=None, max_depth=None, direction='up',
+                        cancel=None):
+    """
+    Generates relationship paths from `source` to `targets` in order of increasing length, which do not pass through
+    `excluded` and use only `allowed_relations` (and their sub-properties, if the ontology defines any). Each term is
+    only searched onwards from once (from the shortest path that reaches it), but every path that reaches a target is
+    generated.
+
+    Stop iterating when you have enough paths, and the search stops with it.
+
+    :param source: source term, e.g. 'UBERON:0002084'.
+    :param allowed_relations: a list of allowed relations, e.g. ['is_a', 'part_of']
+    :param targets: list of targets, e.g. ['GO'], or a `TargetMatcher` (in which case `excluded` is ignored).
+    :param ont: Obo ontology object.
+    :param excluded: a list/set of terms which relationships may not pass through.
+    :param max_depth: if given, the maximum number of relations in a path.
+    :param direction: 'up' to search from terms to the terms they are related to (e.g. parents), 'down' to search from
+      terms to the terms that are related to them (e.g. children), using the ontology's cached reverse adjacency.
+      Relations in 'down' paths are named by their inverse, e.g. "UBERON:0000948.has_part~UBERON:0002084".
+    :param cancel: optional `ontolopy.progress.CancelToken`, checked at each depth and every 256 terms searched from.
+      Raises `ontolopy.progress.Interrupted` when it is cancelled.
+    :return: generator of relation paths, e.g. "UBERON:0002084.part_of~UBERON:0000948".
+    """
+    if isinstance(targets, TargetMatcher):
+        matcher = targets
+    else:
+        matcher = TargetMatcher(targets, excluded)
+    is_target = matcher.is_target
+    is_excluded = matcher.is_excluded
+    allowed_relations = frozenset(_expand_relations(allowed_relations, ont))
+
+    assert (direction in ['up', 'down'])
+    if direction == 'down':
+        reverse = ont._reverse_adjacency(allowed_relations)
+        inverse_names = {relation: _inverse_relation(relation, ont) for relation in allowed_relations}
+
+    checked_terms = set()
+
+    # (relation path, terms in relation path)
+    relation_paths = [(source, (source,))]
+    depth = 0
+
+    # counted for `ontolopy.stats` (recorded when the search stops, if statistics are being collected)
+    n_expanded = n_cycle_skips = n_paths = max_frontier = 0
+    try:
+        while relation_paths and (max_depth is None or depth < max_depth):
+            depth += 1
+            if cancel is not None:
+                cancel.check()
+            if len(relation_paths) > max_frontier:
+                max_frontier = len(relation_paths)
+            new_relation_paths = []
+            for relation_path, path_terms in relation_paths:
+                most_recent_term = path_terms[-1]
+
+                if most_recent_term in checked_terms:
+                    continue
+                else:
+                    checked_terms.add(most_recent_term)
+                n_expanded += 1
+                if cancel is not None and not n_expanded % 256:
+                    cancel.check()
+
+                if direction == 'up':
+                    # Ontologies can contain external terms, e.g. `NCBITaxon:9606`
+                    attributes = ont.get(most_recent_term, {})
+                    steps = [(relation, new_term) for relation in attributes if relation in allowed_relations
+                             for new_term in attributes[relation]]
                 else:
-                    new_terms = ont[most_recent_term][relation]
+                    steps = [(inverse_names[relation], new_term)
+                             for relation, new_term in reverse.get(most_recent_term, [])]
 
                 # For each new term, check for wanted relation:
-                for new_term in new_terms:
+                for relation, new_term in steps:
 
-                    if new_term in excluded:
+                    if is_excluded(new_term):
                         continue
 
-                    if new_term in relation_path:
+                    if new_term in path_terms:
+                        n_cycle_skips += 1
                         logging.info(f'cyclic relationship: '
                                      f'{relation_path}{divider_tr}{relation}{divider_rt}{new_term}')
                         continue
 
                     new_relation_path = f'{relation_path}{divider_tr}{relation}{divider_rt}{new_term}'
-                    new_relation_paths.append(new_relation_path)
+                    new_relation_paths.append((new_relation_path, path_terms + (new_term,)))
 
-                    relation_found = _check_if_found(new_term, targets)
-                    if relation_found and mode == 'all':
-                        found_relation_paths.add(new_relation_path)
-                    elif relation_found and mode == 'any':
-                        return new_relation_path
+                    if is_target(new_term):
+                        n_paths += 1
+                        yield new_relation_path
 
-        if len(new_relation_paths) == 0:
-            unchanged = True
-        relation_paths = new_relation_paths
+            relation_paths = new_relation_paths
+    finally:
+        if _stats.recording():
+            _stats.count(nodes_expanded=n_expanded, cycle_skips=n_cycle_skips, paths_found=n_paths)
+            _stats.peak(frontier_size=max_frontier)
+
+
+def _find_relation(source, allowed_relations, targets, ont, excluded=None, mode='any', max_depth=None,
+                   max_paths_per_source=None, k_shortest=None, direction='up', cancel=None):
+    """
+    Searches ontology `ont` for a relationship path between `source` and `target` (self.index), which does not pass
+    through `excluded` and uses only `allowed_relations`.
+
+    We keep looking until we find a relation to a target (if mode == 'any') or we run out of leads or reach one of the
+    limits (if mode == 'all').
+
+    :param allowed_relations:
+    :param targets: list of types of targets, e.g. ["GO"], or a `TargetMatcher` (in which case `excluded` is ignored).
+    :param ont:
+    :param excluded:
+    :param max_depth: if given, the maximum number of relations in a path.
+    :param max_paths_per_source: if given, stop after finding this many paths (mode 'all' only).
+    :param k_shortest: if given, keep only the `k_shortest` shortest paths to each target term (mode 'all' only).
+    :param direction: 'up' or 'down' (see `iter_relation_paths`).
+    :param cancel: optional `ontolopy.progress.CancelToken`. When it is cancelled, raises
+      `ontolopy.progress.Interrupted` with the paths found so far as its `partial` (mode 'all').
+    :return: relation path, or `np.nan` if none found (mode 'any'); list of relation paths, shortest first (mode 'all').
+    """
+    if not _stats.recording():
+        return _search_relations(source, allowed_relations, targets, ont, excluded, mode, max_depth,
+                                 max_paths_per_source, k_shortest, direction, cancel)
+    start = time.perf_counter()
+    try:
+        return _search_relations(source, allowed_relations, targets, ont, excluded, mode, max_depth,
+                                 max_paths_per_source, k_shortest, direction, cancel)
+    finally:
+        _stats.add_time('find_relation', time.perf_counter() - start)
+
+
+def _search_relations(source, allowed_relations, targets, ont, excluded, mode, max_depth, max_paths_per_source,
+                      k_shortest, direction, cancel=None):
+    if not isinstance(targets, TargetMatcher):
+        targets = TargetMatcher(targets, excluded)
+    relation_paths = iter_relation_paths(source, allowed_relations, targets, ont, max_depth=max_depth,
+                                         direction=direction, cancel=cancel)
 
     if mode == 'any':
+        found = next(relation_paths, np.nan)
+        relation_paths.close()  # stops the search (and records its statistics) straight away
+        return found
+
+    found_relation_paths = []
+    try:
+        _collect_relation_paths(relation_paths, found_relation_paths, targets, max_paths_per_source, k_shortest)
+    except Interrupted as interrupted:
+        interrupted.partial = found_relation_paths
+        raise
+    return found_relation_paths
+
+
+def _collect_relation_paths(relation_paths, found_relation_paths, targets, max_paths_per_source, k_shortest):
+    """
+    Adds paths from `relation_paths` to `found_relation_paths` until there are no more or one of the limits is reached.
+    """
+    n_paths_to = {}
+    for relation_path in relation_paths:
+        if k_shortest is not None:
+            to = _found_term(relation_path)
+            n_paths_to[to] = n_paths_to.get(to, 0) + 1
+            if n_paths_to[to] > k_shortest:
+                continue
+        found_relation_paths.append(relation_path)
+
+        if max_paths_per_source is not None and len(found_relation_paths) >= max_paths_per_source:
+            break
+        # if every specific target has all the paths it needs, there is nothing left to find.
+        if (k_shortest is not None and not targets.prefixes
+                and all(n_paths_to.get(target, 0) >= k_shortest for target in targets.specific)):
+            break
+
+
+def shortest_relation(source, target, allowed_relations, ont, excluded=None, use_levels=True, cancel=None):
+    """
+    Finds a shortest relationship path from `source` to the specific term `target`, which does not pass through
+    `excluded` and uses only `allowed_relations` (and their sub-properties, if the ontology defines any).
+
+    Searches upwards from `source` and downwards from `target` (over the ontology's cached reverse adjacency), one
+    layer at a time from whichever side has the smaller frontier, until the two searches meet in the middle.
+
+    :param source: source term, e.g. 'UBERON:0002084'.
+    :param target: target term, e.g. 'UBERON:0000948'.
+    :param allowed_relations: a list of allowed relations, e.g. ['is_a', 'part_of']
+    :param ont: Obo ontology object.
+    :param excluded: a list/set of terms which relationships may not pass through.
+    :param use_levels: if True, use the ontology's hierarchy levels to reject impossible pairs straight away, bound
+      the length of the path, and prune terms that cannot be on a path between `source` and `target`.
+    :param cancel: optional `ontolopy.progress.CancelToken`, checked before each layer is searched. Raises
+      `ontolopy.progress.Interrupted` when it is cancelled.
+    :return: relation path, e.g. "UBERON:0002084.part_of~UBERON:0000948", or `np.nan` if there is no relationship.
+    """
+    excluded = frozenset(excluded) if excluded is not None else frozenset()
+    if source == target or target in excluded:
         return np.nan
-    if mode == 'all':
-        return found_relation_paths
 
+    allowed_relations = frozenset(_expand_relations(allowed_relations, ont))
+    reverse = ont._reverse_adjacency(allowed_relations)
+
+    levels = ont._levels(allowed_relations) if use_levels else {}
+    source_level = levels.get(source)
+    target_level = levels.get(target)
+    bounded = source_level is not None and target_level is not None
+    if bounded and source_level <= target_level:
+        return np.nan
+
+    # term: (neighbouring term on the way to source/target, relation), for rebuilding the path
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+    forward_depth = backward_depth = 0
+
+    while forward_frontier and backward_frontier:
+        if bounded and forward_depth + backward_depth >= source_level - target_level:
+            break
+        if cancel is not None:
+            cancel.check()
+
+        meeting = []
+        if len(forward_frontier) <= len(backward_frontier):
+            new_frontier = []
+            for term in forward_frontier:
+                attributes = ont.get(term, {})
+                for relation in attributes:
+                    if relation not in allowed_relations:
+                        continue
+                    for new_term in attributes[relation]:
+                        if new_term in forward or new_term in excluded:
+                            continue
+                        if bounded and new_term != target and levels.get(new_term, -1) <= target_level:
+                            continue
+                        forward[new_term] = (term, relation)
+                        new_frontier.append(new_term)
+                        if new_term in backward:
+                            meeting.append(new_term)
+            forward_frontier = new_frontier
+            forward_depth += 1
+        else:
+            new_frontier = []
+            for term in backward_frontier:
+                for relation, new_term in reverse.get(term, []):
+                    if new_term in backward or (new_term in excluded and new_term != source):
+                        continue
+                    if bounded and new_term != source and levels.get(new_term, source_level) >= source_level:
+                        continue
+                    backward[new_term] = (term, relation)
+                    new_frontier.append(new_term)
+                    if new_term in forward:
+                        meeting.append(new_term)
+            backward_frontier = new_frontier
+            backward_depth += 1
+
+        if meeting:
+            return _join_relation_path(_closest_meeting(meeting, forward, backward), forward, backward)
+
+    return np.nan
+
+
+def _steps(term, links):
+    """
+    Counts the steps from `term` back to the start of its search.
+    """
+    n = 0
+    while links[term] is not None:
+        term = links[term][0]
+        n += 1
+    return n
+
+
+def _closest_meeting(meeting, forward, backward):
+    """
+    Chooses the meeting term that gives the shortest path overall.
+    """
+    return min(meeting, key=lambda term: _steps(term, forward) + _steps(term, backward))
+
+
+def _join_relation_path(meeting, forward, backward):
+    """
+    Joins the two halves of a bidirectional search into a relation path string.
+    """
+    steps = []
+    term = meeting
+    while forward[term] is not None:
+        previous_term, relation = forward[term]
+        steps.append(f'{divider_tr}{relation}{divider_rt}{term}')
+        term = previous_term
+    relation_path = term + ''.join(reversed(steps))
+
+    term = meeting
+    while backward[term] is not None:
+        next_term, relation = backward[term]
+        relation_path += f'{divider_tr}{relation}{divider_rt}{next_term}'
+        term = next_term
+    return relation_path
@@ -0,0 +1,355 @@
+"""
+This module contains a local query server, which keeps one ontology (and its cached indexes) loaded for many clients,
+and a client with the same signatures as `Relations` and `Uberon.sample_map_by_name`, e.g.:
+
+    ontolopy serve --ontology data/uberon --port 8765
+
+    client = OntologyClient('http://127.0.0.1:8765')
+    tissues = client.relations(['is_a', 'part_of'], sources=samples, targets=['UBERON'])
+
+The server answers JSON POST requests to `/relations`, `/sample_map_by_name` and `/holds` (each with a batch of
+sources, names or relationships to check) and GET requests to `/info`, handling requests concurrently (one thread per
+request). Responses are cached (by request) on the server and by clients, unless the search timed out for some
+sources.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ServerError(Exception):
+    """
+    Raised by `OntologyClient` when the server could not answer a query, e.g. because of invalid arguments.
+    """
+
+
+class _ResponseCache:
+    """
+    Thread-safe least-recently-used cache of responses, keyed by request.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = self.misses = 0
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            response = self._responses.get(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._responses.move_to_end(key)
+            return response
+
+    def put(self, key, response):
+        if not self.size:
+            return
+        with self._lock:
+            self._responses[key] = response
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.size:
+                self._responses.popitem(last=False)
+
+
+def _json_value(value):
+    """
+    JSON-compatible version of a value from a `pd.DataFrame` (missing values become None).
+    """
+    if isinstance(value, list):
+        return value
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _frame_to_json(frame):
+    return {
+        'index_name': frame.index.name,
+        'index': [_json_value(value) for value in frame.index],
+        'columns': list(frame.columns),
+        'data': [[_json_value(value) for value in row] for row in frame.itertuples(index=False)],
+        'incomplete': {str(key): reason for key, reason in
+                       (getattr(frame, 'incomplete', None) or frame.attrs.get('incomplete', {})).items()},
+    }
+
+
+def _frame_from_json(response):
+    import numpy as np
+    import pandas as pd
+
+    frame = pd.DataFrame([[np.nan if value is None else value for value in row] for row in response['data']],
+                         index=pd.Index(response['index'], name=response['index_name']), columns=response['columns'],
+                         dtype=object)
+    frame.attrs['incomplete'] = response['incomplete']
+    return frame
+
+
+# arguments that clients may set (not e.g. `processes`, `progress` or `cancel`)
+_relations_arguments = ['allowed_relations', 'sources', 'targets', 'source_targets', 'excluded', 'col_names', 'mode',
+                        'max_depth', 'max_paths_per_source', 'k_shortest', 'direction', 'timeout', 'source_timeout']
+_sample_map_arguments = ['sample_names', 'to', 'col_names', 'xref', 'synonym_types', 'fuzzy', 'min_similarity',
+                         'timeout']
+
+
+def _check_query(query, allowed):
+    """
+    Raises `ValueError` if a query is not a JSON object or has arguments that are not `allowed`.
+    """
+    if not isinstance(query, dict):
+        raise ValueError('the query must be a JSON object')
+    unknown = sorted(set(query) - set(allowed))
+    if unknown:
+        raise ValueError(f'unknown arguments: {", ".join(unknown)}')
+
+
+class OntologyServer:
+    """
+    HTTP server answering queries about one ontology, which it keeps loaded with its indexes warm.
+    """
+
+    def __init__(self, ont, host='127.0.0.1', port=0, cache_size=1024, warm=True):
+        """
+        :param ont: Obo ontology object (an `Uberon` object for `/sample_map_by_name`).
+        :param host: address to listen on (by default only local clients can connect).
+        :param port: port to listen on, or 0 for any free port (see `OntologyServer.url`).
+        :param cache_size: maximum number of responses to cache.
+        :param warm: if True, build the ontology's relation registry and (for `Uberon` objects) name index straight
+          away, instead of for the first query that needs them.
+        """
+        self.ont = ont
+        self.cache = _ResponseCache(cache_size)
+        if warm:
+            ont.relation_registry()
+            if hasattr(ont, 'sample_map_by_name'):
+                ont.name_index(['UBERON'])
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def start(self):
+        """
+        Starts serving in a background thread (e.g. for tests or notebooks).
+
+        :return: the server.
+        """
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def info(self):
+        return {'terms': len(self.ont), 'typedefs': sorted(self.ont.typedefs), 'cache_hits': self.cache.hits,
+                'cache_misses': self.cache.misses}
+
+    def relations(self, query):
+        from .relations import Relations
+
+        _check_query(query, _relations_arguments)
+        query = dict(query)
+        if query.get('source_targets') is not None:
+            query['source_targets'] = [tuple(source_target) for source_target in query['source_targets']]
+        return _frame_to_json(Relations(ont=self.ont, **query))
+
+    def sample_map_by_name(self, query):
+        if not hasattr(self.ont, 'sample_map_by_name'):
+            raise ValueError('the ontology is not an `Uberon` object')
+        import pandas as pd
+
+        _check_query(query, _sample_map_arguments)
+        query = dict(query)
+        # (identifier, name) pairs, in the client's order and with its identifier types
+        pairs = query['sample_names']
+        query['sample_names'] = pd.Series([name for _, name in pairs], index=[sample for sample, _ in pairs],
+                                          dtype=object)
+        return _frame_to_json(self.ont.sample_map_by_name(**query))
+
+    def holds(self, query):
+        return {'holds': [self.ont.holds(term, relation, other) for term, relation, other in query['queries']]}
+
+    def answer(self, endpoint, body):
+        """
+        Answers a query (cached by `endpoint` and `body`, unless the search was interrupted for some sources).
+
+        :param endpoint: 'relations', 'sample_map_by_name' or 'holds'.
+        :param body: JSON request body.
+        :return: JSON response body.
+        """
+        key = (endpoint, body)
+        response = self.cache.get(key)
+        if response is None:
+            result = getattr(self, endpoint)(json.loads(body))
+            response = json.dumps(result).encode()
+            if not result.get('incomplete'):
+                self.cache.put(key, response)
+        return response
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.strip('/') != 'info':
+                    self._send(404, {'error': f'unknown endpoint {self.path}'})
+                    return
+                self._send(200, server.info())
+
+            def do_POST(self):
+                endpoint = self.path.strip('/')
+                if endpoint not in ['relations', 'sample_map_by_name', 'holds']:
+                    self._send(404, {'error': f'unknown endpoint {self.path}'})
+                    return
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                try:
+                    response = server.answer(endpoint, body)
+                except (AssertionError, KeyError, TypeError, ValueError) as error:
+                    self._send(400, {'error': f'{type(error).__name__}: {error}'})
+                    return
+                except Exception as error:
+                    # still answer in JSON, so clients get the error instead of a closed connection
+                    self._send(500, {'error': f'{type(error).__name__}: {error}'})
+                    return
+                self._send(200, response)
+
+            def _send(self, status, response):
+                if not isinstance(response, bytes):
+                    response = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *args):
+                pass  # no log line for every request
+
+        return Handler
+
+
+def serve(ont, host='127.0.0.1', port=8765, cache_size=1024):
+    """
+    Serves queries about `ont` until interrupted (see `OntologyServer`).
+    """
+    server = OntologyServer(ont, host, port, cache_size)
+    print(f'Serving {len(ont)} terms at {server.url}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+class OntologyClient:
+    """
+    Client of an `OntologyServer`, with the same signatures as `Relations` and `Uberon.sample_map_by_name` (without
+    the ontology). Complete responses are cached, so repeated queries are not sent again.
+    """
+
+    def __init__(self, url='http://127.0.0.1:8765', cache_size=128, timeout=None):
+        """
+        :param url: URL of the server.
+        :param cache_size: maximum number of responses to cache (0 to not cache responses).
+        :param timeout: optional timeout of requests in seconds.
+        """
+        self.url = url.rstrip('/')
+        self.cache = _ResponseCache(cache_size)
+        self.timeout = timeout
+
+    def _post(self, endpoint, query):
+        body = json.dumps(query)
+        key = (endpoint, json.dumps(query, sort_keys=True))
+        response = self.cache.get(key)
+        if response is None:
+            response = self._request(f'/{endpoint}', body.encode())
+            if not response.get('incomplete'):
+                self.cache.put(key, response)
+        return response
+
+    def _request(self, path, data=None):
+        import urllib.error
+        import urllib.request
+
+        request = urllib.request.Request(self.url + path, data=data, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as error:
+            raise ServerError(json.loads(error.read()).get('error', str(error))) from None
+
+    def info(self):
+        """
+        :return: `dict` of information about the server's ontology and cache.
+        """
+        return self._request('/info')
+
+    def relations(self, allowed_relations: list, sources=None, targets=None, source_targets=None, excluded=None,
+                  col_names=None, mode='any', max_depth=None, max_paths_per_source=None, k_shortest=None,
+                  direction='up', timeout=None, source_timeout=None):
+        """
+        Finds relations on the server (see `Relations`).
+
+        :return: `pd.DataFrame` like `Relations`, with the incomplete sources in its `attrs['incomplete']`.
+        """
+        query = {'allowed_relations': allowed_relations, 'sources': None if sources is None else list(sources),
+                 'targets': targets, 'excluded': None if excluded is None else list(excluded), 'col_names': col_names,
+                 'mode': mode, 'max_depth': max_depth, 'max_paths_per_source': max_paths_per_source,
+                 'k_shortest': k_shortest, 'direction': direction, 'timeout': timeout,
+                 'source_timeout': source_timeout}
+        if source_targets is not None:
+            query['source_targets'] = [list(source_target) for source_target in source_targets]
+        return _frame_from_json(self._post('relations', query))
+
+    def sample_map_by_name(self, sample_names, to=None, col_names=None, xref=None, synonym_types=None, fuzzy=False,
+                           min_similarity=0.9, timeout=None):
+        """
+        Maps sample names to terms on the server (see `Uberon.sample_map_by_name`).
+
+        :param sample_names: map from sample identifiers to names (`dict` or `pd.Series`), or an iterable of names.
+        :return: `pd.DataFrame`.
+        """
+        # sent as ordered (identifier, name) pairs, since JSON objects would have string keys (and be sorted)
+        samples = sample_names.items() if hasattr(sample_names, 'items') else enumerate(sample_names)
+        pairs = [[sample, _json_value(name)] for sample, name in samples]
+        query = {'sample_names': pairs, 'to': to, 'col_names': col_names, 'xref': xref, 'synonym_types': synonym_types,
+                 'fuzzy': fuzzy, 'min_similarity': min_similarity, 'timeout': timeout}
+        return _frame_from_json(self._post('sample_map_by_name', query))
+
+    def holds(self, term, relation, other):
+        """
+        Checks whether the relationship `term` `relation` `other` holds (see `Obo.holds`).
+        """
+        return self.holds_batch([(term, relation, other)])[0]
+
+    def holds_batch(self, queries):
+        """
+        Checks many relationships in one request.
+
+        :param queries: iterable of (term, relation, other) tuples.
+        :return: list of bool.
+        """
+        return self._post('holds', {'queries': [list(query) for query in queries]})['holds']
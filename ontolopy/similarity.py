@@ -0,0 +1,202 @@
+"""
+This module contains code for the semantic similarity of ontology terms, based on the information content of the
+ancestors that they have in common.
+"""
+
+from collections import Counter
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+_default_relations = ['is_a', 'part_of']
+
+
+class Similarity:
+    """
+    Semantic similarity of ontology terms.
+
+    The information content (IC) of a term is -log(p), where p is the proportion of terms (or of annotations, if an
+    annotation corpus is given) that are the term or one of its descendants. The Resnik similarity of two terms is the
+    IC of their most informative common ancestor, and their Lin similarity is 2 * Resnik / (IC(a) + IC(b)). Terms
+    count as their own ancestors. Ancestors are looked up in the ontology's cached ancestor closure.
+    """
+
+    def __init__(self, ont, relations=None, annotations=None):
+        """
+        :param ont: `Obo` ontology object.
+        :param relations: list of relation types that lead to ancestors, by default ['is_a', 'part_of'].
+        :param annotations: optional annotation corpus: either a mapping (e.g. `dict` or `pd.Series`) of term to number
+          of annotations, or an iterable of annotated terms (one per annotation). By default each term counts once.
+        """
+        if relations is None:
+            relations = _default_relations
+        self.relations = ont.relation_registry().expand(relations)
+        self.closure = ont._ancestor_closure(self.relations)
+
+        # terms (including ancestors that are not in the ontology, e.g. from an import) and their numbers
+        terms = dict.fromkeys(self.closure)
+        for ancestors in self.closure.values():
+            terms.update(dict.fromkeys(ancestors))
+        self.terms = list(terms)
+        self._index = {term: i for i, term in enumerate(self.terms)}
+
+        if annotations is None:
+            counts = np.ones(len(self.terms))
+        else:
+            if not isinstance(annotations, (Mapping, pd.Series)):
+                annotations = Counter(annotations)
+            counts = np.zeros(len(self.terms))
+            for term, count in annotations.items():
+                if term in self._index:
+                    counts[self._index[term]] += count
+
+        # each term's count is added to the frequency of the term and each of its ancestors
+        term_numbers = []
+        ancestor_numbers = []
+        for term, ancestors in self.closure.items():
+            i = self._index[term]
+            for ancestor in ancestors:
+                if ancestor != term:
+                    term_numbers.append(i)
+                    ancestor_numbers.append(self._index[ancestor])
+        frequency = counts + np.bincount(ancestor_numbers, weights=counts[term_numbers], minlength=len(self.terms))
+
+        # Terms without any annotations get the highest IC of any annotated term.
+        total = counts.sum()
+        annotated = frequency > 0
+        ic = np.zeros(len(self.terms))
+        ic[annotated] = -np.log(frequency[annotated] / total)
+        ic[~annotated] = ic[annotated].max() if annotated.any() else 0
+        self._ic = ic
+
+        self._ancestor_numbers = {}
+
+    def __len__(self):
+        return len(self.terms)
+
+    @property
+    def information_content(self):
+        """
+        Information content of each term.
+
+        :return: `pd.Series` of IC, indexed by term.
+        """
+        return pd.Series(self._ic, index=self.terms, name='information_content')
+
+    def ancestors(self, term):
+        """
+        :param term: term, e.g. 'UBERON:0002084'.
+        :return: `frozenset` of the term's ancestors, including the term itself.
+        """
+        if term not in self._index:
+            return frozenset()
+        return self.closure.get(term, frozenset()) | {term}
+
+    def _ancestors_of(self, term):
+        """
+        Numbers of the ancestors (including itself) of `term`, cached.
+        """
+        try:
+            return self._ancestor_numbers[term]
+        except KeyError:
+            numbers = np.array([self._index[ancestor] for ancestor in self.ancestors(term)], dtype=np.int64)
+            self._ancestor_numbers[term] = numbers
+            return numbers
+
+    def common_ancestors(self, term_a, term_b):
+        """
+        :return: `frozenset` of the ancestors that `term_a` and `term_b` have in common (including the terms themselves).
+        """
+        return self.ancestors(term_a) & self.ancestors(term_b)
+
+    def lowest_common_ancestors(self, term_a, term_b):
+        """
+        Common ancestors of `term_a` and `term_b` that are not an ancestor of another common ancestor.
+
+        :return: `set` of terms.
+        """
+        common = self.common_ancestors(term_a, term_b)
+        return {term for term in common
+                if not any(term in self.closure.get(other, ()) and other not in self.closure.get(term, ())
+                           for other in common)}
+
+    def most_informative_common_ancestor(self, term_a, term_b):
+        """
+        :return: the common ancestor of `term_a` and `term_b` with the highest IC, or None if they have no common
+          ancestor.
+        """
+        common = self.common_ancestors(term_a, term_b)
+        if not common:
+            return None
+        return max(sorted(common), key=lambda term: self._ic[self._index[term]])
+
+    def _terms_by_ancestor(self, terms):
+        """
+        Maps ancestor number to an array of the positions in `terms` of the terms that it is an ancestor of.
+        """
+        positions = {}
+        for position, term in enumerate(terms):
+            for ancestor in self._ancestors_of(term):
+                positions.setdefault(ancestor, []).append(position)
+        return {ancestor: np.array(term_positions) for ancestor, term_positions in positions.items()}
+
+    def resnik(self, terms_a, terms_b=None, dtype=np.float64):
+        """
+        Resnik similarity (IC of the most informative common ancestor) of each pair of terms.
+
+        Common ancestors are visited in order of increasing IC, and each one sets the similarity of the block of pairs
+        of terms that it is an ancestor of, so that each pair is left with the IC of its most informative common
+        ancestor. Terms that are not in the ontology have similarity 0.
+
+        :param terms_a: list of N terms.
+        :param terms_b: list of M terms, by default `terms_a`.
+        :param dtype: dtype of the matrix, e.g. np.float32 to halve its memory usage.
+        :return: N x M `np.ndarray`.
+        """
+        if terms_b is None:
+            terms_b = terms_a
+        similarity = np.zeros((len(terms_a), len(terms_b)), dtype=dtype)
+
+        rows_by_ancestor = self._terms_by_ancestor(terms_a)
+        columns_by_ancestor = self._terms_by_ancestor(terms_b)
+        common = [ancestor for ancestor in rows_by_ancestor
+                  if ancestor in columns_by_ancestor and self._ic[ancestor] > 0]
+        for ancestor in sorted(common, key=lambda ancestor: self._ic[ancestor]):
+            rows = rows_by_ancestor[ancestor]
+            columns = columns_by_ancestor[ancestor]
+            if len(rows) == len(terms_a):
+                similarity[:, columns] = self._ic[ancestor]
+            elif len(columns) == len(terms_b):
+                similarity[rows, :] = self._ic[ancestor]
+            else:
+                similarity[np.ix_(rows, columns)] = self._ic[ancestor]
+        return similarity
+
+    def lin(self, terms_a, terms_b=None, dtype=np.float64):
+        """
+        Lin similarity (2 * Resnik / (IC(a) + IC(b))) of each pair of terms. Pairs of the same term have similarity 1,
+        and terms that are not in the ontology have similarity 0.
+
+        :param terms_a: list of N terms.
+        :param terms_b: list of M terms, by default `terms_a`.
+        :param dtype: dtype of the matrix, e.g. np.float32 to halve its memory usage.
+        :return: N x M `np.ndarray`.
+        """
+        if terms_b is None:
+            terms_b = terms_a
+        similarity = self.resnik(terms_a, terms_b, dtype)
+
+        numbers_a = np.array([self._index.get(term, -1) for term in terms_a], dtype=np.int64)
+        numbers_b = np.array([self._index.get(term, -1) for term in terms_b], dtype=np.int64)
+        ic_a = np.where(numbers_a >= 0, self._ic[numbers_a], 0).astype(dtype)
+        ic_b = np.where(numbers_b >= 0, self._ic[numbers_b], 0).astype(dtype)
+
+        denominator = np.add.outer(ic_a, ic_b)
+        similarity *= 2
+        np.divide(similarity, denominator, out=similarity, where=denominator > 0)
+
+        # pairs of uninformative terms (e.g. the root) are only similar to themselves
+        rows, columns = np.nonzero(denominator == 0)
+        similarity[rows, columns] = (numbers_a[rows] == numbers_b[columns]) & (numbers_a[rows] >= 0)
+        return similarity
@@ -0,0 +1,160 @@
+"""
+This module contains code for (opt-in) instrumentation: timings of the stages of loading ontologies and finding
+relations, and counters of the work done (e.g. terms expanded, cache hits).
+
+Nothing is recorded unless statistics are being collected, e.g.:
+
+    with opy.stats.collect() as stats:
+        relations = opy.Relations(...)
+    print(stats)
+
+`Relations` and ontologies from `load_obo` also keep the statistics of their own creation (as `Relations.stats` and
+`Obo.stats`) if they are created while statistics are being collected. Work done in worker processes (e.g.
+`iter_relations(processes=4)`) is not recorded.
+
+`collect()` only records the work done in its own thread (or asyncio task), so e.g. concurrent `Relations` in the
+threads of an `OntologyServer` each get their own statistics. `enable()` records the work done in every thread.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+# collectors started by `collect()` in the current thread or asyncio task, innermost last
+_collectors = contextvars.ContextVar('ontolopy_stats_collectors', default=())
+# collectors started by `enable()`, which record the work done in every thread
+_enabled = []
+
+
+class Stats:
+    """
+    Statistics of the work done by Ontolopy:
+
+    - `timings`: total seconds spent in each stage, e.g. 'load_obo.parse', 'find_relation', 'relation_path_to_text'.
+    - `calls`: number of times each stage was timed.
+    - `counts`: counters, e.g. 'nodes_expanded', 'cycle_skips', 'paths_found', 'cache_hits', 'cache_misses'.
+    - `maxima`: largest values seen, e.g. 'frontier_size'.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.calls = {}
+        self.counts = {}
+        self.maxima = {}
+
+    def add_time(self, stage, seconds):
+        self.timings[stage] = self.timings.get(stage, 0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def count(self, **counts):
+        for name, n in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def peak(self, **values):
+        for name, value in values.items():
+            if value > self.maxima.get(name, value - 1):
+                self.maxima[name] = value
+
+    def update(self, other):
+        """
+        Adds the statistics of `other` (another `Stats` object) to these.
+        """
+        for stage, seconds in other.timings.items():
+            self.timings[stage] = self.timings.get(stage, 0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + other.calls[stage]
+        self.count(**other.counts)
+        self.peak(**other.maxima)
+
+    def as_dict(self):
+        return {'timings': dict(self.timings), 'calls': dict(self.calls), 'counts': dict(self.counts),
+                'maxima': dict(self.maxima)}
+
+    def __repr__(self):
+        lines = ['Stats(']
+        lines += [f'  {stage}: {seconds:.4f}s ({self.calls[stage]} calls)' for stage, seconds in self.timings.items()]
+        lines += [f'  {name}: {n}' for name, n in self.counts.items()]
+        lines += [f'  max {name}: {value}' for name, value in self.maxima.items()]
+        return '\n'.join(lines) + '\n)'
+
+
+def recording() -> bool:
+    """
+    Whether statistics are being collected (in this thread).
+    """
+    return bool(_enabled) or bool(_collectors.get())
+
+
+def _active():
+    return _enabled + list(_collectors.get())
+
+
+def add_time(stage, seconds):
+    for collector in _active():
+        collector.add_time(stage, seconds)
+
+
+def count(**counts):
+    for collector in _active():
+        collector.count(**counts)
+
+
+def peak(**values):
+    for collector in _active():
+        collector.peak(**values)
+
+
+@contextmanager
+def timer(stage):
+    """
+    Times the code in the `with` block as `stage`, if statistics are being collected.
+    """
+    if not recording():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def collect(stats=None, callback=None):
+    """
+    Collects statistics of the work done in the `with` block (in this thread or asyncio task).
+
+    :param stats: optional `Stats` object to add the statistics to.
+    :param callback: optional function called with the `Stats` object at the end of the block, e.g. to log them.
+    :return: `Stats` object.
+    """
+    if stats is None:
+        stats = Stats()
+    _collectors.set(_collectors.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _collectors.set(tuple(collector for collector in _collectors.get() if collector is not stats))
+        if callback is not None:
+            callback(stats)
+
+
+def enable():
+    """
+    Starts collecting statistics (of the work done in every thread) until `disable()` is called.
+
+    :return: `Stats` object.
+    """
+    stats = Stats()
+    _enabled.append(stats)
+    return stats
+
+
+def disable():
+    """
+    Stops collecting statistics started by `enable()`.
+
+    :return: the `Stats` object, or None if statistics were not enabled.
+    """
+    if not _enabled:
+        return None
+    return _enabled.pop()
@@ -0,0 +1,139 @@
+"""
+This module contains code for generating synthetic ontologies of any size and shape, for testing and benchmarking.
+The same seed always generates the same ontology.
+"""
+
+import random
+from collections import deque
+from itertools import islice
+
+from .obo import Obo, _open_text, _term_lines, _typedef_lines
+
+_words = ['left', 'right', 'anterior', 'posterior', 'upper', 'lower', 'inner', 'outer', 'medial', 'lateral', 'heart',
+          'lung', 'liver', 'kidney', 'brain', 'muscle', 'vessel', 'nerve', 'bone', 'gland', 'duct', 'lobe', 'wall',
+          'tissue', 'epithelium', 'layer', 'region', 'segment', 'cortex', 'valve']
+
+_synonym_types = ['EXACT', 'EXACT', 'NARROW', 'BROAD', 'RELATED']
+
+_default_relations = {'part_of': 0.3, 'develops_from': 0.05}
+
+_typedefs = {
+    'part_of': {'id': 'part_of', 'name': 'part of', 'is_transitive': 'true', 'inverse_of': ['has_part']},
+}
+
+
+def _name(rng, i):
+    """
+    Random name of three words for term number `i`, e.g. 'left lung lobe 12'.
+    """
+    return f'{rng.choice(_words)} {rng.choice(_words)} {rng.choice(_words)} {i}'
+
+
+def synthetic_terms(n_terms=10000, depth=10, branching=4, fan_in=0.1, relations=None, synonyms=2,
+                    xref_probability=0.2, obsolete_probability=0.01, prefix='SYN', xref_prefix='XSYN', seed=0):
+    """
+    Generates the terms of a synthetic ontology, one at a time.
+
+    The is_a hierarchy is filled level by level: each term is_a one of the earliest terms that has fewer than
+    `branching` children (or starts a new hierarchy if all terms are full or `depth` levels deep). Other relationships
+    are to earlier terms at higher levels, so the ontology has no cycles.
+
+    :param n_terms: number of terms.
+    :param depth: maximum depth of the is_a hierarchy.
+    :param branching: maximum number of is_a children of each term.
+    :param fan_in: probability that a term is_a a second (random, higher-level) term, making the hierarchy a DAG.
+    :param relations: `dict` mapping other relation types to the probability that a term has one, by default
+      {'part_of': 0.3, 'develops_from': 0.05}.
+    :param synonyms: number of synonyms of each term (of mixed types).
+    :param xref_probability: probability that a term has an xref to a term with prefix `xref_prefix`.
+    :param obsolete_probability: probability that a term is obsolete (and replaced_by an earlier term).
+    :param prefix: ontology prefix of the term identifiers.
+    :param xref_prefix: ontology prefix of xrefs.
+    :param seed: random seed.
+    :return: generator of (term, attributes) tuples, e.g. ('SYN:0000001', {'id': 'SYN:0000001', 'name': ...}).
+    """
+    if relations is None:
+        relations = _default_relations
+    rng = random.Random(seed)
+
+    levels = []  # level of each term, or None if obsolete
+    n_children = []
+    is_open = deque()  # terms that can have more children, in order
+    for i in range(n_terms):
+        term = f'{prefix}:{i:07d}'
+        attributes = {'id': term, 'name': _name(rng, i)}
+        synonym_lines = [f'"{_name(rng, i)}" {rng.choice(_synonym_types)} []' for _ in range(synonyms)]
+        if synonym_lines:
+            attributes['synonym'] = synonym_lines
+        if rng.random() < xref_probability:
+            attributes['xref'] = [f'{xref_prefix}:{rng.randrange(n_terms):07d}']
+
+        if i and rng.random() < obsolete_probability:
+            attributes['name'] = f"obsolete {attributes['name']}"
+            attributes['is_obsolete'] = ['true']
+            replacement = rng.randrange(i)
+            if levels[replacement] is not None:
+                attributes['replaced_by'] = [f'{prefix}:{replacement:07d}']
+            levels.append(None)
+            n_children.append(0)
+            yield term, attributes
+            continue
+
+        while is_open and n_children[is_open[0]] >= branching:
+            is_open.popleft()
+        level = 0
+        if is_open:
+            parent = rng.choice([j for j in islice(is_open, branching) if n_children[j] < branching])
+            n_children[parent] += 1
+            level = levels[parent] + 1
+            attributes['is_a'] = [f'{prefix}:{parent:07d}']
+
+            # other relationships, to random earlier terms at higher levels
+            for relation, probability in [('is_a', fan_in)] + list(relations.items()):
+                if rng.random() < probability:
+                    other = rng.randrange(parent + 1)
+                    other_term = f'{prefix}:{other:07d}'
+                    if (levels[other] is not None and levels[other] < level
+                            and other_term not in attributes.get(relation, [])):
+                        attributes.setdefault(relation, []).append(other_term)
+
+        levels.append(level)
+        n_children.append(0)
+        if level + 1 < depth:
+            is_open.append(i)
+        yield term, attributes
+
+
+def write_synthetic_obo(path, **kwargs):
+    """
+    Writes a synthetic ontology (see `synthetic_terms`) to an `.obo` file, one term at a time, so that files with
+    millions of terms can be written.
+
+    :param path: file to write, gzip compressed if it ends with '.gz'.
+    :param kwargs: arguments for `synthetic_terms`, e.g. `n_terms`, `depth`, `seed`.
+    :return: number of terms written.
+    """
+    relations = set(kwargs.get('relations') or _default_relations)
+    n_terms = 0
+    with _open_text(path, 'w') as f:
+        f.write('format-version: 1.2\n\n')
+        for term, attributes in synthetic_terms(**kwargs):
+            f.write('\n'.join(_term_lines(term, attributes, relations)) + '\n')
+            n_terms += 1
+        for typedef, properties in _typedefs.items():
+            f.write('\n'.join(_typedef_lines(typedef, properties)) + '\n')
+    return n_terms
+
+
+def synthetic_obo(**kwargs):
+    """
+    Creates a synthetic ontology (see `synthetic_terms`) without writing a file.
+
+    :param kwargs: arguments for `synthetic_terms`, e.g. `n_terms`, `depth`, `seed`.
+    :return: `Obo` ontology object.
+    """
+    ont = Obo()
+    dict.update(ont, synthetic_terms(**kwargs))
+    for typedef, properties in _typedefs.items():
+        ont.typedefs[typedef] = dict(properties)
+    return ont
@@ -2,26 +2,34 @@
 This module contains code for creating and working with the Uberon class: ontology containing Uberon terms.
 """
 import logging
+import sys
 import pandas as pd
 import numpy as np
 
-from .obo import Obo, _extract_synonym, _extract_synonym_type
-from .relations import Relations
+from .names import match_names
+from .obo import Obo, OboView
+from .progress import Progress, job_token
+from .relations import Relations, TargetMatcher, _find_relation, _found_term, relation_path_to_text, \
+    shortest_relation
 
 # TODO: Properly consider this architecture. Seems a bit weird :/.
 
 
-def uberon_from_obo(obo):
+def uberon_from_obo(obo, copy=True):
     """
     Creates an `Uberon` object from an `Obo` object.
     Uberon objects have additional functions they can use.
 
     :param obo: `Obo` object
+    :param copy: If False, return a read-only view of `obo` with `Uberon` methods (an `OboView`) instead of copying it.
     :return uberon: `Uberon` object
     """
+    if not copy:
+        Uberon._check_terms(obo)
+        return OboView(obo, cls=Uberon)
+
     uberon = Uberon()
-    for term, value in obo.items():
-        uberon[term] = value
+    dict.update(uberon, obo)
 
     for att_key, att_val in obo.__dict__.items():
         uberon.__dict__[att_key] = att_val
@@ -31,11 +39,48 @@ def uberon_from_obo(obo):
     return uberon
 
 
+def _sample_map_frame(sample_names, name_to_term, col_names):
+    """
+    Mapping of samples to terms (see `Uberon.sample_map_by_name`) from a map of their names to matched terms.
+    """
+    sample_to_uberon = pd.DataFrame({
+        col_names[1]: sample_names,
+        col_names[2]: sample_names.map(name_to_term),
+    })
+    sample_to_uberon.index.rename(col_names[0], inplace=True)
+    return sample_to_uberon
+
+
 class Uberon(Obo):
     """
     An UBERON-specific ontology object.
     """
 
+    # Defaults for sample_map_by_ont:
+    _sample_map_exclude = [
+        'UBERON:0000061',  # anatomical structure
+        'UBERON:0000479',  # tissue
+        'UBERON:0000467',  # anatomical system
+        'UBERON:0011216',  # organ system subdivision
+        'UBERON:0000922',  # embryo
+        'UBERON:0007023',  # adult organism
+        'CL:0000048',  # multi fate stem cell
+    ]
+
+    _sample_map_relation_types = [
+        'is_a',
+        'related_to',
+        'part_of',
+        'derives_from',
+        'intersection_of',
+        'union_of',
+        # 'is_model_for',
+        'replaced_by',
+        # 'develops_from',
+    ]
+
+    _sample_map_to = ['UBERON']
+
     def __init__(self):
         self._check_terms()
 
@@ -44,80 +89,102 @@ class Uberon(Obo):
             return None
 
         try:
-            assert('UBERON' in {x.split(':')[0] for x in self.terms})
+            assert('UBERON' in self._prefix_index())
         except AssertionError:
             logging.error(f"There are no UBERON terms in your Uberon object.")
 
-    def sample_map_by_ont(self, sample_ids: list, exclude=None, relation_types=None, to=None, child_mapping=False):
+    def _sample_map_config(self, exclude=None, relation_types=None, to=None):
         """
-        Map tissues from sample names to uberon identifiers. Will only work if ontology contains Uberon + Sample terms.
+        Fills in the defaults for `sample_map_by_ont` arguments.
 
-        :param sample_ids: list of sample identifiers
-        :param exclude: list of tissues to exclude, i.e. because they are too general.
-        :param relation_types: list of relation types in ontology that relate to position in body.
-        :param to: list of ontology prefixes that you want to map to.
-        :param child_mapping: If True, searches children instead of parents.
-        :return:
+        :return: (exclude, relation_types, to)
         """
-
-        # TODO: add child_mapping functionality
         if exclude is None:
-            exclude = [
-                'UBERON:0000061',  # anatomical structure
-                'UBERON:0000479',  # tissue
-                'UBERON:0000467',  # anatomical system
-                'UBERON:0011216',  # organ system subdivision
-                'UBERON:0000922',  # embryo
-                'UBERON:0007023',  # adult organism
-                'CL:0000048',  # multi fate stem cell
-            ]
+            exclude = self._sample_map_exclude
         else:
             assert(isinstance(exclude, list))
 
         if relation_types is None:
-            relation_types = [
-                'is_a',
-                'related_to',
-                'part_of',
-                'derives_from',
-                'intersection_of',
-                'union_of',
-                # 'is_model_for',
-                'replaced_by',
-                # 'develops_from',
-            ]
+            relation_types = self._sample_map_relation_types
         else:
             assert(isinstance(relation_types, list))
 
         if to is None:
-            to = ['UBERON']
+            to = self._sample_map_to
         else:
             assert(isinstance(to, list))
 
+        return exclude, relation_types, to
+
+    def mapper(self, exclude=None, relation_types=None, to=None):
+        """
+        Creates a reusable `SampleMapper`, for mapping many batches of samples to tissues with the same configuration
+        as `sample_map_by_ont`. See `SampleMapper` for details.
+
+        :param exclude: list of tissues to exclude, i.e. because they are too general.
+        :param relation_types: list of relation types in ontology that relate to position in body.
+        :param to: list of ontology prefixes that you want to map to.
+        :return: `SampleMapper` object.
+        """
+        return SampleMapper(self, exclude, relation_types, to)
+
+    def sample_map_by_ont(self, sample_ids: list, exclude=None, relation_types=None, to=None, child_mapping=False):
+        """
+        Map tissues from sample names to uberon identifiers. Will only work if ontology contains Uberon + Sample terms.
+
+        :param sample_ids: list of sample identifiers
+        :param exclude: list of tissues to exclude, i.e. because they are too general.
+        :param relation_types: list of relation types in ontology that relate to position in body.
+        :param to: list of ontology prefixes that you want to map to.
+        :param child_mapping: If True, searches children instead of parents.
+        :return: `Relations`. Sample identifiers that are alternative or obsolete identifiers are mapped from their
+          current terms (see `Obo.id_resolution` and `Relations.resolved`).
+        """
+        exclude, relation_types, to = self._sample_map_config(exclude, relation_types, to)
+
         tissue_relations = Relations(
             allowed_relations=relation_types,
             sources=sample_ids,
             targets=to,
             ont=self,
             excluded=exclude,
+            direction='down' if child_mapping else 'up',
         )
 
         return tissue_relations
 
-    def sample_map_by_name(self, sample_names, to=None, col_names=None, xref=None, synonym_types=None):
+    def sample_map_by_name(self, sample_names, to=None, col_names=None, xref=None, synonym_types=None, fuzzy=False,
+                           min_similarity=0.9, processes=None, chunksize=10000, name_index=None, progress=None,
+                           cancel=None, timeout=None):
         """
         Map tissues from sample identifiers to uberon identifers.
 
+        A term whose name matches a sample name is preferred over terms with a matching synonym.
+
         :param sample_names: map from sample identifiers to tissue/sample descriptors/names for values.
-          May be `dict` or `pd.Series`
+          May be `dict` or `pd.Series`, or an iterable of names (which are then identified by their position).
         :param to: list of ontology prefixes that you want to map to.
         :param xref: An ontology identifier (e.g. FMA) the presence of which denotes a preferred term.
         :param col_names: Column names of returned relationships
-        :return:
+        :param synonym_types: list of synonym types to match on, by default ['EXACT', 'BROAD', 'NARROW'].
+        :param fuzzy: If True, names that don't match exactly are matched ignoring punctuation and word order, or else
+          approximately (see `ontolopy.names.NameIndex`).
+        :param min_similarity: minimum similarity of approximate matches, between 0 and 1 (1 - edit distance / length).
+        :param processes: if given, the number of worker processes to match names in parallel.
+        :param chunksize: number of (unique) names matched at a time, e.g. by each worker.
+        :param name_index: a `NameIndex` to use, e.g. one that was built once and is reused for many calls. By default,
+          the ontology's cached `name_index(to, synonym_types)`.
+        :param progress: optional function called with the number of (unique) names matched, the total number of
+          names, and an estimate of the seconds left (or None), at most twice a second.
+        :param cancel: optional `ontolopy.progress.CancelToken` that stops the matching when cancelled, e.g. from
+          another thread. It is checked before the first name is matched and after each name is matched (names that
+          worker processes are already matching are finished first).
+        :param timeout: optional time budget in seconds for the whole matching (checked like `cancel`; there is no
+          budget for each name).
+        :return: `pd.DataFrame`. If the matching was cancelled or ran out of time, the samples whose names were not
+          matched are listed in its `attrs['incomplete']`, mapping each sample to 'cancelled' or 'timeout'.
         """
 
-        # TODO: Currently mapping each name once for each sample... Should just get a a unique name list and go through that.
-
         # TODO: Make more general (like Relations) and move to Obo() as might want to look at other types of matched
         #  names such as phenotype.
 
@@ -134,75 +201,43 @@ class Uberon(Obo):
 
         if isinstance(sample_names, dict):
             sample_names = pd.Series(sample_names)
-        assert(isinstance(sample_names, pd.Series))
-
-        if synonym_types is None:
-            synonym_types = ['EXACT', 'BROAD', 'NARROW']
-        else:
-            assert(isinstance(synonym_types, list))
-
-        name_to_uberon = {}
-        for tissue_name in sample_names.unique():
-            found = False
-            options = []
-            if pd.isna(tissue_name):
-                name_to_uberon[tissue_name] = np.nan
-                continue
+        elif not isinstance(sample_names, pd.Series):
+            sample_names = pd.Series(list(sample_names))
 
-            tissue_name_l = tissue_name.lower()
-            for uberon_term in self.terms:
+        if name_index is None:
+            name_index = self.name_index(to, synonym_types)
 
-                if uberon_term.split(':')[0] not in to:
-                    continue
+        # Check for XREF to preferred ontology (e.g. FMA for human)
+        preferred = None
+        if xref is not None:
+            preferred = self.xref_index().terms_with(xref)
 
-                if self[uberon_term]['name'].lower() == tissue_name_l:
-                    name_to_uberon[tissue_name] = uberon_term
-                    found = True
+        # TODO: Check Taxon requirements here
+        tissue_names = [tissue_name for tissue_name in sample_names.unique() if not pd.isna(tissue_name)]
+        cancel = job_token(cancel, timeout)
+        reporter = Progress(progress, len(tissue_names)) if progress is not None else None
+        name_to_uberon = {}
+        reason = None if cancel is None else cancel.reason
+        # nothing is matched (or sent to worker processes) if the matching is already cancelled
+        matched = match_names(name_index, tissue_names if reason is None else [], preferred, fuzzy, min_similarity,
+                              processes, chunksize)
+        for tissue_name, uberon_term in zip(tissue_names, matched):
+            name_to_uberon[tissue_name] = np.nan if uberon_term is None else uberon_term
+            if reporter is not None:
+                reporter.update()
+            if cancel is not None:
+                reason = cancel.reason
+                if reason is not None and len(name_to_uberon) < len(tissue_names):
+                    matched.close()  # stops the worker processes
                     break
 
-                try:
-                    synonyms_info = self[uberon_term]['synonym']
-                except KeyError:
-                    continue
-
-                # TODO: Allow change allowed syn types
-                for synonym_info in synonyms_info:
-                    syn_type = _extract_synonym_type(synonym_info)
-                    if syn_type not in synonym_types:
-                        continue
-                    synonym = _extract_synonym(synonym_info)
-
-                    if tissue_name_l == synonym:
-                        # TODO: Check Taxon requirements here
-                        options.append((tissue_name, uberon_term, syn_type))
-                        found = True
-
-            if not found:
-                name_to_uberon[tissue_name] = np.nan
-            elif len(options) == 1:
-                tissue_name, uberon_term, _ = options[0]
-                name_to_uberon[tissue_name] = uberon_term
-            elif len(options) >= 1:  # Choose best option of synonyms:
-                chosen = False
-
-                # Check for XREF to preferred ontology (e.g. FMA for human)
-                if xref is not None:
-                    for option in options:
-                        tissue_name, uberon_term, _ = option
-                        if xref in self[uberon_term].keys():
-                            chosen = option
-
-                if not chosen:
-                    # TODO: If no XREF choose most specific/most exact synonym? (Currently just pick first)
-                    chosen = options[0]
-                tissue_name, uberon_term, _ = chosen
-                name_to_uberon[tissue_name] = uberon_term
-
         # Create sample_to_uberon
-        sample_to_uberon = pd.DataFrame(columns=col_names[1:], index=sample_names.keys())
-        sample_to_uberon.index.rename(col_names[0], inplace=True)
-        sample_to_uberon[col_names[1]] = sample_names
-        sample_to_uberon[col_names[2]] = sample_names.map(name_to_uberon)
+        sample_to_uberon = _sample_map_frame(sample_names, name_to_uberon, col_names)
+        incomplete = {}
+        if len(name_to_uberon) < len(tissue_names):
+            unmatched = ~sample_names.isin(list(name_to_uberon)) & sample_names.notna()
+            incomplete = {sample: reason for sample in sample_names.index[unmatched]}
+        sample_to_uberon.attrs['incomplete'] = incomplete
 
         return sample_to_uberon
 
@@ -264,14 +299,8 @@ class Uberon(Obo):
                 overall = by_ont
                 mapped_using = "both (same)"
             elif by_name != by_ont:  # mappable but different
-                name_to_ont = Relations(allowed_relations=rel,
-                                        sources=[by_name],
-                                        targets=[by_ont],
-                                        ont=self).loc[by_name, 'to']
-                ont_to_name = Relations(allowed_relations=rel,
-                                        sources=[by_ont],
-                                        targets=[by_name],
-                                        ont=self).loc[by_ont, 'to']
+                name_to_ont = shortest_relation(by_name, by_ont, rel, self)
+                ont_to_name = shortest_relation(by_ont, by_name, rel, self)
 
                 if pd.isna(name_to_ont) and pd.isna(ont_to_name):  # no relation between by_ont and by_name
                     disagreements.loc[sample] = [by_name, by_ont, relation_text, name_matched_on]
@@ -280,25 +309,224 @@ class Uberon(Obo):
                 elif pd.isna(name_to_ont) and not pd.isna(ont_to_name):  # If one is (part of) another:
                     overall = by_name
                     mapped_using = "name"
-                    logging.info("name", ont_to_name)
+                    logging.info(f"name: {ont_to_name}")
                 elif not pd.isna(name_to_ont) and pd.isna(ont_to_name):
                     overall = by_ont
                     mapped_using = "ontology"
-                    logging.info("ont", name_to_ont)
+                    logging.info(f"ont: {name_to_ont}")
             overall_mapping.loc[sample] = [by_name, by_ont, overall, mapped_using]
 
         return overall_mapping, disagreements
 
-    # TODO: Write restrict_to_taxon, would need to read in NCBI ontology, since it is hierarchical (e.g. vertebrates)
-    # def restrict_to_taxon(ont, ncbi_id, valid_terms = ['UBERON'], keep_dubious=False, only_yes=False):
-    #     """
-    #     Loops through valid_terms terms in ontology `ont`, and removes any that are never in taxon with ID `ncbi_id`
-    #     """
-    #     yes_relations = ['only_in_taxon', 'present_in_taxon']
-    #     never = 'never_in_taxon'
-    #     dubious = 'dubious_for_taxon'
+    def taxon_constraints(self):
+        """
+        Index of the taxon constraints of terms (see `TaxonConstraints`). Built once and cached.
+
+        :return: `TaxonConstraints` object.
+        """
+        return self._cached('taxon_constraints', lambda: TaxonConstraints(self))
+
+    def restrict_to_taxon(self, taxon, taxonomy=None, valid_terms=None, keep_dubious=False, only_yes=False):
+        """
+        Restricts the ontology to terms that can be found in `taxon`, according to their taxon constraints
+        (`never_in_taxon`, `only_in_taxon`, `dubious_for_taxon`, `present_in_taxon`).
+
+        Constraints on a taxon apply to all of its subtaxa (e.g. a term that is never in vertebrates is never in
+        humans), which is worked out using `taxonomy`.
+
+        :param taxon: NCBITaxon identifier, e.g. 'NCBITaxon:9606' (human).
+        :param taxonomy: `Obo` ontology containing the NCBITaxon hierarchy (through `is_a`), e.g. loaded from
+          `ncbitaxon.obo` or a taxslim. If None, only constraints on exactly `taxon` are used.
+        :param valid_terms: list of prefixes of terms to restrict, by default ['UBERON']. Other terms are kept.
+        :param keep_dubious: if True, keep terms that are `dubious_for_taxon`.
+        :param only_yes: if True, only keep terms which are known to be in `taxon` (`only_in_taxon` or
+          `present_in_taxon`).
+        :return: `OboView` of the ontology: no terms are copied.
+        """
+        if valid_terms is None:
+            valid_terms = ['UBERON']
+        else:
+            assert(isinstance(valid_terms, list))
+
+        constraints = self.taxon_constraints()
+        lineage = taxon_lineage(taxon, taxonomy)
+
+        if only_yes:
+            allowed = constraints.present(lineage) - constraints.excluded(lineage, keep_dubious)
+            return OboView(self, excluded={term for term in self.terms
+                                           if term.split(':')[0] in valid_terms and term not in allowed})
+
+        return OboView(self, excluded={term for term in constraints.excluded(lineage, keep_dubious)
+                                       if term.split(':')[0] in valid_terms})
 
-    #     for term in ont.keys():
-    #         if term.split(':')[0] not in valid_terms:
-    #             continue
 
+def taxon_lineage(taxon, taxonomy=None):
+    """
+    The lineage of `taxon`: the taxon itself and every taxon it is a subtaxon of. Cached on `taxonomy`.
+
+    :param taxon: NCBITaxon identifier, e.g. 'NCBITaxon:9606'.
+    :param taxonomy: `Obo` ontology containing the NCBITaxon hierarchy (through `is_a`), or None.
+    :return: `frozenset` of NCBITaxon identifiers.
+    """
+    if taxonomy is None:
+        return frozenset([taxon])
+
+    def build():
+        lineage = {taxon}
+        to_check = [taxon]
+        while to_check:
+            for parent in taxonomy.get(to_check.pop(), {}).get('is_a', []):
+                if parent not in lineage:
+                    lineage.add(parent)
+                    to_check.append(parent)
+        return frozenset(lineage)
+
+    return taxonomy._cached(('lineage', taxon), build)
+
+
+class TaxonConstraints:
+    """
+    Index of the taxon constraints of terms, from taxa to the terms that are constrained to them.
+    """
+
+    _relations = ['only_in_taxon', 'present_in_taxon', 'never_in_taxon', 'dubious_for_taxon']
+
+    def __init__(self, ont):
+        """
+        Builds the index in one pass over `ont`.
+
+        :param ont: `Obo` ontology object.
+        """
+        # relation: {taxon: set of terms}
+        self.by_taxon = {relation: {} for relation in self._relations}
+        # terms that are only in some taxa
+        self.only_in_some = set()
+
+        for term, attributes in ont.items():
+            for relation in self._relations:
+                for taxon in attributes.get(relation, []):
+                    self.by_taxon[relation].setdefault(taxon, set()).add(term)
+            if 'only_in_taxon' in attributes:
+                self.only_in_some.add(term)
+
+    def _terms(self, relation, lineage):
+        terms = set()
+        for taxon in lineage:
+            terms.update(self.by_taxon[relation].get(taxon, ()))
+        return terms
+
+    def excluded(self, lineage, keep_dubious=False):
+        """
+        Terms that are not in a taxon.
+
+        :param lineage: the taxon's lineage (see `taxon_lineage`).
+        :param keep_dubious: if True, don't exclude terms that are dubious for the taxon.
+        :return: `set` of terms.
+        """
+        excluded = self._terms('never_in_taxon', lineage)
+        excluded |= self.only_in_some - self._terms('only_in_taxon', lineage)
+        if not keep_dubious:
+            excluded |= self._terms('dubious_for_taxon', lineage)
+        return excluded
+
+    def present(self, lineage):
+        """
+        Terms that are known to be in a taxon.
+
+        :param lineage: the taxon's lineage (see `taxon_lineage`).
+        :return: `set` of terms.
+        """
+        return self._terms('only_in_taxon', lineage) | self._terms('present_in_taxon', lineage)
+
+
+class SampleMapper:
+    """
+    Maps sample terms to their nearest target term, with a fixed configuration (see `Uberon.sample_map_by_ont`).
+
+    Each term's mapping is found once and stored in a lookup table, so mapping later batches of samples that use
+    the same terms is a table lookup. Use `warm_up` to fill in the table ahead of time. If the ontology is changed
+    the mapper should be created again.
+    """
+
+    def __init__(self, ont, exclude=None, relation_types=None, to=None, col_names=None):
+        """
+        :param ont: `Uberon` ontology object.
+        :param exclude: list of tissues to exclude, i.e. because they are too general.
+        :param relation_types: list of relation types in ontology that relate to position in body.
+        :param to: list of ontology prefixes that you want to map to.
+        :param col_names: Column names of returned mappings, by default ['from', 'relation_path', 'relation_text', 'to']
+        """
+        if col_names is None:
+            col_names = ['from', 'relation_path', 'relation_text', 'to']
+        else:
+            assert(len(col_names) == 4)
+
+        self.ont = ont
+        self.exclude, self.relation_types, self.to = ont._sample_map_config(exclude, relation_types, to)
+        self.col_names = col_names
+
+        self._relation_types = frozenset(self.relation_types)
+        self._matcher = TargetMatcher(self.to, ont.resolve_ids(self.exclude))
+        self._resolution = ont.id_resolution()
+        self._relation_paths = {}
+        self._relation_texts = {}
+        self._found_terms = {}
+
+    def __len__(self):
+        """
+        Number of terms in the lookup table.
+        """
+        return len(self._relation_paths)
+
+    def _add(self, terms):
+        for term in terms:
+            if pd.isna(term) or term in self._relation_paths:
+                continue
+            relation_path = _find_relation(self._resolution.get(term, term), self._relation_types, self._matcher,
+                                           self.ont)
+            self._relation_paths[term] = relation_path
+            self._relation_texts[term] = relation_path_to_text(relation_path, self.ont)
+            self._found_terms[term] = _found_term(relation_path)
+
+    def warm_up(self, terms=None):
+        """
+        Fills in the lookup table ahead of time.
+
+        :param terms: terms to find mappings for, by default every term in the ontology.
+        :return: self
+        """
+        if terms is None:
+            terms = self.ont.terms
+        self._add(terms)
+        return self
+
+    def map(self, sample_ids):
+        """
+        Map tissues from sample identifiers to target identifiers, like `Uberon.sample_map_by_ont`.
+
+        :param sample_ids: list of sample identifiers
+        :return: `pd.DataFrame` indexed by sample identifier, with relation path, relation text and mapped term columns.
+        """
+        sample_ids = pd.Series(list(sample_ids))
+        self._add(sample_ids.unique())
+
+        mapped = pd.DataFrame({
+            self.col_names[1]: sample_ids.map(self._relation_paths),
+            self.col_names[2]: sample_ids.map(self._relation_texts),
+            self.col_names[3]: sample_ids.map(self._found_terms),
+        })
+        mapped.index = pd.Index(sample_ids, name=self.col_names[0])
+        return mapped
+
+    def memory_usage(self):
+        """
+        Approximate memory used by the lookup table.
+
+        :return: `dict` with the number of terms in the table (`'terms'`) and the size of the table in bytes
+          (`'bytes'`), not counting the ontology or the term identifiers (which are shared with the ontology).
+        """
+        n_bytes = 0
+        for table in [self._relation_paths, self._relation_texts, self._found_terms]:
+            n_bytes += sys.getsizeof(table)
+            n_bytes += sum(sys.getsizeof(value) for value in table.values())
+        return {'terms': len(self), 'bytes': n_bytes}
@@ -20,6 +20,9 @@ setup(name='ontolopy',
       long_description_content_type='text/markdown',
       long_description=long_description,
       packages=find_packages(),
+      entry_points={
+            'console_scripts': ['ontolopy = ontolopy.cli:main'],
+      },
       url='https://github.com/NatalieThurlby/ontolopy',
       author='Natalie Thurlby',
       classifiers=[
@@ -0,0 +1,64 @@
+import asyncio
+import ontolopy as opy
+import pandas as pd
+import pytest
+from ontolopy.aio import AsyncMapper
+
+
+@pytest.fixture
+def uberon():
+	return opy.uberon_from_obo(opy.Obo({
+		'UBERON:1': {'id': 'UBERON:1', 'name': 'left ventricle', 'is_a': ['UBERON:2'], 'part_of': ['UBERON:3']},
+		'UBERON:2': {'id': 'UBERON:2', 'name': 'ventricle', 'part_of': ['UBERON:3']},
+		'UBERON:3': {'id': 'UBERON:3', 'name': 'heart', 'part_of': ['UBERON:4']},
+		'UBERON:4': {'id': 'UBERON:4', 'name': 'circulatory system'},
+		'UBERON:5': {'id': 'UBERON:5', 'name': 'lung'},
+	}))
+
+
+def test_relations_coalesced(uberon, monkeypatch):
+	jobs = []
+
+	def relations(*args, **kwargs):
+		jobs.append(kwargs)
+		return opy.Relations(*args, **kwargs)
+
+	monkeypatch.setattr(opy.aio, 'Relations', relations)
+
+	async def main():
+		async with AsyncMapper(uberon) as mapper:
+			return await asyncio.gather(
+				mapper.relations(['is_a', 'part_of'], ['UBERON:1', 'UBERON:2'], targets=['UBERON:4']),
+				mapper.relations(['is_a', 'part_of'], ['UBERON:2', 'UBERON:5'], targets=['UBERON:4']),
+				mapper.relations(['is_a'], ['UBERON:1'], targets=['UBERON:2']),
+				mapper.relations(['part_of'], source_targets=[('UBERON:1', 'UBERON:4')], mode='pair'),
+			)
+
+	a, b, c, d = asyncio.run(main())
+	assert(len(jobs) == 3)
+	assert(jobs[0]['sources'] == ['UBERON:1', 'UBERON:2', 'UBERON:5'])
+
+	expected = opy.Relations(['is_a', 'part_of'], uberon, sources=['UBERON:2', 'UBERON:5'], targets=['UBERON:4'])
+	pd.testing.assert_frame_equal(b, pd.DataFrame(expected))
+	assert(list(a.index) == ['UBERON:1', 'UBERON:2'])
+	assert(a.attrs['incomplete'] == {})
+	assert(c.loc['UBERON:1', 'to'] == 'UBERON:2')
+	assert(d.loc['UBERON:1', 'relation_text'] == 'left ventricle part of heart part of circulatory system')
+
+
+def test_sample_map_by_name_coalesced(uberon):
+	async def main():
+		mapper = AsyncMapper(uberon)
+		try:
+			return await asyncio.gather(
+				mapper.sample_map_by_name({'s1': 'heart', 's2': 'lung', 's3': None}),
+				mapper.sample_map_by_name(['lung', 'hart']),
+				mapper.sample_map_by_name(['lung', 'hart'], fuzzy=True, min_similarity=0.75),
+			)
+		finally:
+			mapper.close()
+
+	a, b, c = asyncio.run(main())
+	pd.testing.assert_frame_equal(a, uberon.sample_map_by_name({'s1': 'heart', 's2': 'lung', 's3': None}))
+	pd.testing.assert_frame_equal(b, uberon.sample_map_by_name(['lung', 'hart']))
+	assert(list(c['to']) == ['UBERON:5', 'UBERON:3'])
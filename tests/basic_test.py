@@ -66,3 +66,230 @@ def test_read_line_obo():
 		except AssertionError:
 			print(opy.obo._read_line_obo(line_list, ont_ids), output)
 			raise
+
+
+def test_xref_index():
+	ont = opy.Obo({
+		'UBERON:1': {'id': 'UBERON:1', 'xref': ['FMA:1', 'MA:1'], 'is_a': ['UBERON:2']},
+		'UBERON:2': {'id': 'UBERON:2', 'FMA': ['FMA:2'], 'synonym': ['"b" EXACT [FMA:2]']},
+		'UBERON:3': {'id': 'UBERON:3', 'xref': ['FMA:2']},
+	})
+	xrefs = ont.xref_index()
+	assert(xrefs.terms_with('FMA') == {'UBERON:1', 'UBERON:2', 'UBERON:3'})
+	assert(xrefs.terms_with('MA') == {'UBERON:1'})
+	assert(xrefs.terms_for('FMA:2') == ['UBERON:2', 'UBERON:3'])
+	assert(list(xrefs.translate(['FMA:1', 'FMA:2', 'FMA:3']).fillna('')) == ['UBERON:1', 'UBERON:2', ''])
+
+
+def test_views():
+	ont = opy.Obo({
+		'UBERON:1': {'id': 'UBERON:1', 'subset': ['uberon_slim'], 'namespace': ['uberon'], 'is_a': ['UBERON:2']},
+		'UBERON:2': {'id': 'UBERON:2', 'namespace': ['uberon']},
+		'CL:1': {'id': 'CL:1', 'subset': ['uberon_slim'], 'namespace': ['cell'], 'part_of': ['UBERON:1']},
+	})
+	assert(ont.terms_from(['UBERON']) == {'UBERON:1', 'UBERON:2'})
+	assert(list(ont.view(prefixes=['UBERON'])) == ['UBERON:1', 'UBERON:2'])
+	assert(set(ont.view(subset='uberon_slim')) == {'UBERON:1', 'CL:1'})
+	assert(set(ont.view(subset='uberon_slim', namespace='uberon')) == {'UBERON:1'})
+	view = ont.view(predicate=lambda term, attributes: 'is_a' in attributes or 'part_of' in attributes)
+	assert(set(view) == {'UBERON:1', 'CL:1'})
+	assert(view['CL:1'] is ont['CL:1'])
+	assert('UBERON:2' not in view)
+	assert(view.leaves == {'CL:1'})
+	assert(set(view.view(prefixes=['CL'])) == {'CL:1'})
+
+	uberon = opy.uberon_from_obo(ont, copy=False)
+	assert(len(uberon) == 3)
+	assert(uberon['UBERON:1'] is ont['UBERON:1'])
+
+	# the view's caches are rebuilt after the ontology changes
+	assert(uberon.sample_map_by_name({'a': 'lung'})['to'].isna().all())
+	ont['UBERON:3'] = {'id': 'UBERON:3', 'name': 'lung'}
+	assert(uberon.sample_map_by_name({'a': 'lung'})['to'].tolist() == ['UBERON:3'])
+	ont.pop('UBERON:3')
+	assert(uberon.sample_map_by_name({'a': 'lung'})['to'].isna().all())
+
+
+def test_cache_cleared():
+	ont = opy.Obo({'UBERON:1': {'id': 'UBERON:1', 'is_a': ['UBERON:2']}, 'UBERON:2': {'id': 'UBERON:2'}})
+	for change in [lambda: ont.update({'UBERON:3': {'id': 'UBERON:3', 'is_a': ['UBERON:1']}}),
+				   lambda: ont.setdefault('UBERON:4', {'id': 'UBERON:4'}),
+				   lambda: ont.pop('UBERON:4'),
+				   lambda: ont.popitem(),
+				   lambda: ont.__ior__({'UBERON:5': {'id': 'UBERON:5'}}),
+				   lambda: ont.clear()]:
+		terms = ont.terms_from(['UBERON'])  # cached prefix index
+		change()
+		assert(ont.terms_from(['UBERON']) == set(ont))
+		assert(terms != set(ont))
+
+
+obo_text = '''format-version: 1.2
+
+[Term]
+id: UBERON:0000948
+name: heart
+is_a: UBERON:0000062 ! organ
+
+[Term]
+id: UBERON:0002084
+name: heart left ventricle
+relationship: part_of UBERON:0000948 ! heart
+
+[Term]
+id: UBERON:0002349
+name: myocardium
+relationship: regional_part_of UBERON:0002084 ! heart left ventricle
+
+[Typedef]
+id: part_of
+name: part of
+is_transitive: true
+inverse_of: has_part ! has part
+
+[Typedef]
+id: regional_part_of
+name: regional part of
+is_a: part_of ! part of
+'''
+
+
+def test_load_obo_typedefs(tmp_path):
+	obo_file = tmp_path / 'test.obo'
+	obo_file.write_text(obo_text)
+	ont = opy.load_obo(str(obo_file), ont_ids=['UBERON'])
+	assert(set(ont.terms) == {'UBERON:0000948', 'UBERON:0002084', 'UBERON:0002349'})
+	assert(ont['UBERON:0002349']['regional_part_of'] == ['UBERON:0002084'])
+	assert('relationship' not in ont['UBERON:0002349'])
+	assert(set(ont.typedefs) == {'part_of', 'regional_part_of'})
+	# UBERON:0002084's only child is through a typedef relation
+	assert(ont.leaves == {'UBERON:0002349'})
+
+	registry = ont.relation_registry()
+	assert(registry.is_transitive('part_of'))
+	assert(not registry.is_transitive('regional_part_of'))
+	assert(registry.inverse('has_part') == 'part_of')
+	assert(registry.expand(['is_a', 'part_of']) == ['is_a', 'part_of', 'regional_part_of'])
+
+	assert(ont.holds('UBERON:0002349', 'part_of', 'UBERON:0000948'))
+	assert(not ont.holds('UBERON:0002349', 'regional_part_of', 'UBERON:0000948'))
+	relations = opy.Relations(['part_of'], ont, sources=['UBERON:0002349'], targets=['UBERON:0000948'])
+	assert(relations.loc['UBERON:0002349', 'relation_text'] ==
+		   'myocardium regional part of heart left ventricle part of heart')
+
+
+def test_parquet(tmp_path):
+	pytest.importorskip('pyarrow')
+	obo_file = tmp_path / 'test.obo'
+	obo_file.write_text(obo_text)
+	ont = opy.load_obo(str(obo_file), ont_ids=['UBERON'])
+	ont['UBERON:0002084']['synonym'] = ['"left ventricle" EXACT []']
+
+	ont.to_parquet(tmp_path / 'ont')
+	loaded = opy.Obo.from_parquet(tmp_path / 'ont')
+	assert(loaded == ont)
+	assert(loaded.typedefs == ont.typedefs)
+
+	edges_only = opy.Obo.from_parquet(tmp_path / 'ont', tables=['terms', 'edges'])
+	assert(edges_only['UBERON:0002084'] == {'name': ont['UBERON:0002084']['name'], 'part_of': ['UBERON:0000948']})
+
+	from ontolopy.parquet import read_obo_table
+	synonyms = read_obo_table(tmp_path / 'ont', 'synonyms', columns=['term', 'synonym'])
+	assert(synonyms.values.tolist() == [['UBERON:0002084', 'left ventricle']])
+
+
+def test_parquet_typedefs_to_obo(tmp_path):
+	pytest.importorskip('pyarrow')
+	obo_file = tmp_path / 'test.obo'
+	obo_file.write_text(obo_text.replace('inverse_of: has_part ! has part\n',
+										 'inverse_of: has_part ! has part\nholds_over_chain: part_of part_of\n'))
+	ont = opy.load_obo(str(obo_file), ont_ids=['UBERON'])
+	assert(ont.typedefs['part_of']['holds_over_chain'] == [('part_of', 'part_of')])
+
+	ont.to_parquet(tmp_path / 'ont')
+	loaded = opy.Obo.from_parquet(tmp_path / 'ont')
+	assert(loaded.typedefs == ont.typedefs)
+	loaded.to_obo(tmp_path / 'copy.obo')
+	assert('holds_over_chain: part_of part_of\n' in (tmp_path / 'copy.obo').read_text())
+	copy = opy.load_obo(str(tmp_path / 'copy.obo'), ont_ids=['UBERON'])
+	assert(copy.typedefs == ont.typedefs)
+	assert(copy.relation_registry().is_transitive('part_of'))
+
+
+def test_to_obo(tmp_path):
+	text = obo_text.replace('name: heart\n', '''name: heart
+def: "A myogenic muscular circulating organ." [UBERON:cjm, http://en.wikipedia.org/wiki/Heart]
+subset: organ_slim
+synonym: "cardium" EXACT [UBERON:0000948]
+synonym: "chambered heart" NARROW [FMA:7088]
+xref: FMA:7088
+relationship: never_in_taxon NCBITaxon:4751 ! Fungi
+''') + '''
+[Typedef]
+id: part_of_part_of
+name: part of part of
+holds_over_chain: part_of part_of
+'''
+	obo_file = tmp_path / 'test.obo'
+	obo_file.write_text(text)
+	ont = opy.load_obo(str(obo_file), ont_ids=['UBERON', 'FMA'])
+	assert(ont['UBERON:0000948']['FMA'] == ['FMA:7088'])
+	assert(ont['UBERON:0000948']['never_in_taxon'] == ['NCBITaxon:4751'])
+
+	assert(ont.to_obo(tmp_path / 'out.obo') == 3)
+	loaded = opy.load_obo(str(tmp_path / 'out.obo'), ont_ids=['UBERON', 'FMA'])
+	assert(loaded == ont)
+	assert(loaded.typedefs == ont.typedefs)
+	assert(len(loaded.typedefs['part_of_part_of']['holds_over_chain']) == 1)
+
+	ont.to_obo(tmp_path / 'out.obo.gz', header={'ontology': 'uberon'})
+	assert(opy.load_obo(str(tmp_path / 'out.obo.gz'), ont_ids=['UBERON', 'FMA']) == ont)
+
+	loaded.to_obo(tmp_path / 'again.obo')
+	assert((tmp_path / 'again.obo').read_text() == (tmp_path / 'out.obo').read_text())
+
+
+def test_id_resolution(tmp_path):
+	text = obo_text.replace('name: heart left ventricle\n', 'name: heart left ventricle\nalt_id: UBERON:0000001\n')
+	text += '''
+[Term]
+id: UBERON:0000002
+name: obsolete cardiac muscle
+comment: not obsolete, just a comment mentioning it
+is_obsolete: true
+replaced_by: UBERON:0000003
+
+[Term]
+id: UBERON:0000003
+name: obsolete myocardium
+is_obsolete: true
+consider: UBERON:0002349
+
+[Term]
+id: UBERON:0000004
+name: heart chamber
+comment: described as obsolete in an old release, but it is not
+'''
+	obo_file = tmp_path / 'test.obo'
+	obo_file.write_text(text)
+	ont = opy.load_obo(str(obo_file), ont_ids=['UBERON'])
+	assert('UBERON:0000002' not in ont and 'UBERON:0000003' not in ont and 'UBERON:0000004' in ont)
+	assert(ont.id_resolution() == {'UBERON:0000001': 'UBERON:0002084', 'UBERON:0000002': 'UBERON:0002349',
+								   'UBERON:0000003': 'UBERON:0002349'})
+	assert(ont.resolve_ids(['UBERON:0000001', 'UBERON:0000948', 'X:1']) == ['UBERON:0002084', 'UBERON:0000948', 'X:1'])
+	kept = opy.load_obo(str(obo_file), ont_ids=['UBERON'], discard_obsolete=False)
+	assert(kept.id_resolution() == ont.id_resolution())
+
+	sources = ['UBERON:0000001', 'UBERON:0000002', 'UBERON:0002349']
+	relations = opy.Relations(['part_of'], ont, sources=sources, targets=['UBERON:0000948'])
+	assert(list(relations.index) == sources)
+	assert(relations.resolved == {'UBERON:0000001': 'UBERON:0002084', 'UBERON:0000002': 'UBERON:0002349'})
+	assert(relations['to'].tolist() == ['UBERON:0000948'] * 3)
+	assert(relations['relation_text'].tolist()[1:] == [relations['relation_text'].iloc[2]] * 2)
+	unresolved = opy.Relations(['part_of'], ont, sources=sources, targets=['UBERON:0000948'], resolve_ids=False)
+	assert(unresolved['to'].isna().tolist() == [True, True, False])
+
+	assert(opy.relation_path_to_text('UBERON:0000001.part_of~UBERON:0000948', ont) == 'heart left ventricle part of heart')
+	records = list(opy.iter_relations(['part_of'], ont, sources, targets=['UBERON:0000948']))
+	assert([record[0] for record in records] == sources)
+	assert([record[3] for record in records] == ['UBERON:0000948'] * 3)
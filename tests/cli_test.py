@@ -0,0 +1,78 @@
+import os
+import ontolopy as opy
+import pandas as pd
+import pytest
+from ontolopy.cli import main
+
+obo_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'data',
+						'uberon-subset.obo')
+
+
+def test_compile_and_leaves(tmp_path, capsys):
+	pytest.importorskip('pyarrow')
+	main(['compile', obo_file, str(tmp_path / 'uberon')])
+	ont = opy.load_obo(obo_file, ont_ids=['UBERON', 'CL'])
+	assert(opy.Obo.from_parquet(tmp_path / 'uberon') == ont)
+
+	capsys.readouterr()
+	main(['leaves', '--ontology', str(tmp_path / 'uberon'), '--prefix', 'UBERON'])
+	assert(capsys.readouterr().out.split() == sorted(ont._get_leaves(['UBERON'])))
+
+
+def test_map_by_ont(tmp_path, capsys):
+	pytest.importorskip('pyarrow')
+	samples = tmp_path / 'samples.csv'
+	pd.DataFrame({'sample_id': ['s1', 's2', 's3'], 'term': ['CL:0000746', 'UBERON:0002084', None]}).to_csv(
+		samples, index=False)
+	main(['map-by-ont', '--ontology', obo_file, str(samples), '--column', 'term', '--chunk-size', '1',
+		  '--workers', '2', '--output', str(tmp_path / 'tissues.parquet')])
+	mapped = pd.read_parquet(tmp_path / 'tissues.parquet')
+
+	uberon = opy.uberon_from_obo(opy.load_obo(obo_file, ont_ids=['UBERON', 'CL']))
+	expected = uberon.sample_map_by_ont(['CL:0000746', 'UBERON:0002084'])
+	assert(list(mapped['from']) == list(expected.index))
+	assert(list(mapped['to']) == list(expected['to']))
+
+	main(['map-by-ont', '--ontology', obo_file, str(samples), '--column', 'term'])
+	out = capsys.readouterr().out
+	assert(out.splitlines()[0] == 'from,relation_path,relation_text,to')
+	assert(len(out.splitlines()) == 3)
+
+
+def test_map_by_name(tmp_path, capsys):
+	samples = tmp_path / 'samples.csv'
+	samples.write_text('s1,heart\ns2,hart\ns3,\n')
+	main(['map-by-name', '--ontology', obo_file, str(samples), '--no-header', '--id-column', '0',
+		  '--name-column', '1', '--fuzzy', '--min-similarity', '0.75', '--chunk-size', '2'])
+	assert(capsys.readouterr().out.splitlines() ==
+		   ['from,name_matched_on,to', 's1,heart,UBERON:0000948', 's2,hart,UBERON:0000948', 's3,,'])
+
+
+def test_map_by_name_workers(tmp_path, capsys, monkeypatch):
+	import multiprocessing
+	pools = []
+	new_pool = multiprocessing.Pool
+
+	def pool(*args, **kwargs):
+		pools.append(args)
+		return new_pool(*args, **kwargs)
+
+	monkeypatch.setattr(opy.names.multiprocessing, 'Pool', pool)
+	samples = tmp_path / 'samples.csv'
+	samples.write_text('sample_id,tissue\ns1,heart\ns2,hart\ns3,\ns4,heart\ns5,\ns6,lung\n')
+	main(['map-by-name', '--ontology', obo_file, str(samples), '--id-column', 'sample_id', '--name-column',
+		  'tissue', '--fuzzy', '--min-similarity', '0.75', '--chunk-size', '2', '--workers', '2'])
+	lines = capsys.readouterr().out.splitlines()
+	assert(len(pools) == 1)
+	assert(lines[:6] == ['from,name_matched_on,to', 's1,heart,UBERON:0000948', 's2,hart,UBERON:0000948', 's3,,',
+						 's4,heart,UBERON:0000948', 's5,,'])
+	assert(len(lines) == 7)
+
+
+def test_map_by_name_parquet(tmp_path, capsys):
+	pytest.importorskip('pyarrow')
+	samples = tmp_path / 'samples.parquet'
+	pd.DataFrame({'tissue': ['heart', 'lung', 'heart']}).to_parquet(samples)
+	main(['map-by-name', '--ontology', obo_file, str(samples), '--chunk-size', '2'])
+	lines = capsys.readouterr().out.splitlines()
+	assert([line.split(',')[0] for line in lines] == ['from', '0', '1', '2'])
@@ -0,0 +1,58 @@
+import ontolopy as opy
+import pandas as pd
+import pytest
+from ontolopy.graph import adjacency_matrices, adjacency_matrix, edge_list, edge_table, from_edge_list, term_index
+
+
+@pytest.fixture
+def ont():
+	return opy.Obo({
+		'UBERON:1': {'id': 'UBERON:1', 'name': 'left ventricle', 'is_a': ['UBERON:2'], 'part_of': ['UBERON:3']},
+		'UBERON:2': {'id': 'UBERON:2', 'name': 'ventricle', 'part_of': ['UBERON:3']},
+		'UBERON:3': {'id': 'UBERON:3', 'name': 'heart', 'part_of': ['UBERON:4']},
+		'UBERON:5': {'id': 'UBERON:5', 'name': 'anatomical system'},
+		'CL:1': {'id': 'CL:1', 'name': 'cardiac muscle cell', 'part_of': ['UBERON:1'],
+				 'never_in_taxon': ['NCBITaxon:1']},
+	})
+
+
+def test_edge_list(ont):
+	pytest.importorskip('pyarrow')
+	terms = term_index(ont)
+	assert(list(terms) == ['UBERON:1', 'UBERON:2', 'UBERON:3', 'UBERON:5', 'CL:1', 'UBERON:4', 'NCBITaxon:1'])
+
+	edges = edge_list(ont, ['is_a', 'part_of'])
+	assert(list(edges.columns) == ['source', 'relation', 'target'])
+	assert(edges.values.tolist()[:2] == [['UBERON:1', 'is_a', 'UBERON:2'], ['UBERON:1', 'part_of', 'UBERON:3']])
+	assert(len(edges) == 5)
+	assert(edge_table(ont).num_rows == 6)
+
+
+def test_adjacency_matrices(ont):
+	pytest.importorskip('scipy')
+	terms = term_index(ont)
+	matrices = adjacency_matrices(ont, ['is_a', 'part_of'])
+	assert(matrices['is_a'].shape == (7, 7))
+	assert(matrices['part_of'].sum() == 4)
+	assert(matrices['part_of'][4, 0] == 1)
+
+	# reachability: terms that UBERON:1 is (transitively) part of
+	part_of = matrices['part_of'].toarray()
+	reached = part_of[0]
+	for _ in range(len(terms)):
+		reached = reached | (reached @ part_of > 0)
+	assert(set(terms[reached > 0]) == {'UBERON:3', 'UBERON:4'})
+
+	matrix, relations = adjacency_matrix(ont, ['part_of', 'is_a'])
+	assert(relations == ['part_of', 'is_a'])
+	assert(matrix[0, 1] == 2)
+	assert(matrix[0, 2] == 1)
+	assert(matrix.nnz == 5)
+
+
+def test_from_edge_list(ont):
+	pytest.importorskip('pyarrow')
+	names = pd.Series({term: attributes['name'] for term, attributes in ont.items()})
+	copy = from_edge_list(edge_table(ont), terms=ont.terms, names=names)
+	assert(copy == ont)
+	assert(list(from_edge_list(edge_list(ont, ['is_a']))) == ['UBERON:1'])
@@ -0,0 +1,95 @@
+import ontolopy as opy
+import numpy as np
+import pytest
+from ontolopy.progress import CancelToken
+from ontolopy.synthetic import synthetic_obo
+
+
+@pytest.fixture
+def ont():
+	return synthetic_obo(n_terms=2000, depth=8, branching=3, seed=1)
+
+
+class CountdownToken(CancelToken):
+	"""
+	Token that times out after it has been checked `n_checks` times.
+	"""
+
+	def __init__(self, n_checks):
+		super().__init__()
+		self.n_checks = n_checks
+
+	@property
+	def reason(self):
+		self.n_checks -= 1
+		return 'timeout' if self.n_checks < 0 else None
+
+
+def test_relations_progress(ont):
+	sources = list(ont)[-50:]
+	reports = []
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=sources, targets=['SYN:0000000'],
+							  progress=lambda *report: reports.append(report))
+	assert(relations.incomplete == {})
+	assert(reports[-1][:2] == (50, 50))
+	assert(reports[-1][2] == 0)
+	assert(all(done <= total for done, total, _ in reports))
+
+
+def test_relations_cancel(ont):
+	sources = list(ont)[-50:]
+	token = CancelToken()
+	token.cancel()
+	assert(token.cancelled and token.reason == 'cancelled')
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=sources, targets=['SYN:0000000'], cancel=token)
+	assert(relations.incomplete == {source: 'cancelled' for source in sources})
+	assert(relations['to'].isna().all())
+
+	relations = opy.Relations(['is_a'], ont, source_targets=[(sources[0], 'SYN:0000000')], mode='pair', timeout=0)
+	assert(relations.incomplete == {sources[0]: 'timeout'})
+
+	# the child token is cancelled by its parent
+	assert(CancelToken(10, parent=token).reason == 'cancelled')
+	assert(not CancelToken(10).cancelled)
+
+
+def test_relations_source_timeout(ont):
+	sources = list(ont)[-3:]
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=sources, targets=['SYN'], mode='all',
+							  source_timeout=0)
+	assert(relations.incomplete == {source: 'timeout' for source in sources})
+	assert(all(paths == [] for paths in relations['relation_path']))
+
+	# interrupted searches keep the paths found so far
+	complete = opy.Relations(['is_a', 'part_of'], ont, sources=sources[:1], targets=['SYN'], mode='all')
+	partial = opy.Relations(['is_a', 'part_of'], ont, sources=sources[:1], targets=['SYN'], mode='all',
+							cancel=CountdownToken(3))
+	assert(partial.incomplete == {sources[0]: 'timeout'})
+	partial_paths, paths = partial['relation_path'].iloc[0], complete['relation_path'].iloc[0]
+	assert(0 < len(partial_paths) < len(paths))
+	assert(partial_paths == paths[:len(partial_paths)])
+
+
+def test_sample_map_by_name_cancel():
+	uberon = opy.uberon_from_obo(opy.Obo({
+		'UBERON:1': {'id': 'UBERON:1', 'name': 'heart'},
+		'UBERON:2': {'id': 'UBERON:2', 'name': 'lung'},
+	}))
+	names = {'s1': 'heart', 's2': 'lung', 's3': None, 's4': 'heart'}
+	reports = []
+	mapped = uberon.sample_map_by_name(names, progress=lambda *report: reports.append(report))
+	assert(mapped.attrs['incomplete'] == {})
+	assert(reports[-1][:2] == (2, 2))
+
+	# checked before the first name, then after each name
+	mapped = uberon.sample_map_by_name(names, chunksize=1, cancel=CountdownToken(1))
+	assert(list(mapped['to']) == ['UBERON:1', np.nan, np.nan, 'UBERON:1'])
+	assert(mapped.attrs['incomplete'] == {'s2': 'timeout'})
+
+	# already cancelled: no names are matched
+	token = CancelToken()
+	token.cancel()
+	for processes in [None, 2]:
+		mapped = uberon.sample_map_by_name(names, processes=processes, cancel=token)
+		assert(mapped['to'].isna().all())
+		assert(mapped.attrs['incomplete'] == {'s1': 'cancelled', 's2': 'cancelled', 's4': 'cancelled'})
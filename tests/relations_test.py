@@ -0,0 +1,126 @@
+import ontolopy as opy
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def ont():
+	return opy.Obo({
+		'UBERON:1': {'id': 'UBERON:1', 'name': 'left ventricle', 'is_a': ['UBERON:2'], 'part_of': ['UBERON:3']},
+		'UBERON:2': {'id': 'UBERON:2', 'name': 'ventricle', 'part_of': ['UBERON:3']},
+		'UBERON:3': {'id': 'UBERON:3', 'name': 'heart', 'part_of': ['UBERON:4']},
+		'UBERON:4': {'id': 'UBERON:4', 'name': 'circulatory system', 'is_a': ['UBERON:5']},
+		'UBERON:5': {'id': 'UBERON:5', 'name': 'anatomical system'},
+		'CL:1': {'id': 'CL:1', 'name': 'cardiac muscle cell', 'part_of': ['UBERON:1']},
+	})
+
+
+def test_shortest_relation(ont):
+	assert(opy.shortest_relation('CL:1', 'UBERON:4', ['is_a', 'part_of'], ont) ==
+		   'CL:1.part_of~UBERON:1.part_of~UBERON:3.part_of~UBERON:4')
+	assert(opy.shortest_relation('UBERON:1', 'UBERON:5', ['is_a', 'part_of'], ont, use_levels=False) ==
+		   'UBERON:1.part_of~UBERON:3.part_of~UBERON:4.is_a~UBERON:5')
+	assert(np.isnan(opy.shortest_relation('UBERON:5', 'UBERON:1', ['is_a', 'part_of'], ont)))
+	assert(np.isnan(opy.shortest_relation('UBERON:1', 'UBERON:4', ['is_a'], ont)))
+	assert(np.isnan(opy.shortest_relation('CL:1', 'UBERON:3', ['is_a', 'part_of'], ont, excluded=['UBERON:1'])))
+
+
+def test_relations_pair_mode(ont):
+	relations = opy.Relations(['is_a', 'part_of'], ont, source_targets=[('CL:1', 'UBERON:3'), ('UBERON:3', 'CL:1')],
+							  mode='pair')
+	assert(relations.loc['CL:1', 'to'] == 'UBERON:3')
+	assert(relations.loc['CL:1', 'relation_text'] == 'cardiac muscle cell part of left ventricle part of heart')
+	assert(relations['to'].isna().sum() == 1)
+
+
+def test_target_matcher():
+	matcher = opy.relations.TargetMatcher(['UBERON', 'CL:2'], excluded=['UBERON:5'])
+	assert(matcher.is_target('UBERON:1'))
+	assert(matcher.is_target('CL:2'))
+	assert(not matcher.is_target('CL:1'))
+	assert(matcher.is_excluded('UBERON:5'))
+
+
+def test_relations_mixed_targets(ont):
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=['CL:1', 'UBERON:4'], targets=['CL:1', 'UBERON'],
+							  excluded=['UBERON:1', 'UBERON:2'])
+	assert(pd.isna(relations.loc['CL:1', 'to']))
+	assert(relations.loc['UBERON:4', 'to'] == 'UBERON:5')
+
+
+def test_relations_all_mode_limits(ont):
+	paths = list(opy.iter_relation_paths('CL:1', ['is_a', 'part_of'], ['UBERON'], ont))
+	assert([path.count('~') for path in paths] == sorted(path.count('~') for path in paths))
+	assert(paths[0] == 'CL:1.part_of~UBERON:1')
+
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=['CL:1'], targets=['UBERON'], mode='all')
+	assert(relations.loc['CL:1', 'relation_path'] == paths)
+
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=['CL:1'], targets=['UBERON'], mode='all',
+							  max_depth=2)
+	assert(max(path.count('~') for path in relations.loc['CL:1', 'relation_path']) == 2)
+
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=['CL:1'], targets=['UBERON'], mode='all',
+							  max_paths_per_source=2)
+	assert(relations.loc['CL:1', 'relation_path'] == paths[:2])
+
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=['CL:1'], targets=['UBERON:3'], mode='all',
+							  k_shortest=1)
+	assert(relations.loc['CL:1', 'relation_path'] == ['CL:1.part_of~UBERON:1.part_of~UBERON:3'])
+
+
+def test_iter_relations(ont, tmp_path):
+	sources = ['CL:1', 'UBERON:3', 'UBERON:5']
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=sources, targets=['UBERON:4'])
+	records = list(opy.iter_relations(['is_a', 'part_of'], ont, iter(sources), ['UBERON:4']))
+	assert([record[0] for record in records] == sources)
+	assert([record[1] for record in records][:2] == list(relations['relation_path'])[:2])
+
+	chunks = list(opy.iter_relations(['is_a', 'part_of'], ont, sources, ['UBERON:4'], chunksize=2, processes=2))
+	assert([len(chunk) for chunk in chunks] == [2, 1])
+	pd.testing.assert_frame_equal(pd.concat(chunks), pd.DataFrame(relations), check_dtype=False)
+
+	# worker processes read sources a few chunks ahead of the results, not all at once
+	read = []
+
+	def many_sources():
+		for i in range(100000):
+			read.append(i)
+			yield 'UBERON:3'
+
+	records = opy.iter_relations(['is_a', 'part_of'], ont, many_sources(), ['UBERON:4'], processes=2)
+	assert(next(records)[3] == 'UBERON:4')
+	assert(len(read) <= 800)
+	records.close()
+
+	out_file = tmp_path / 'relations.csv'
+	assert(opy.write_relations(out_file, ['is_a', 'part_of'], ont, sources, ['UBERON:4'], chunksize=2) == 3)
+	assert(list(pd.read_csv(out_file, index_col=0)['to'].fillna('')) == ['UBERON:4', 'UBERON:4', ''])
+
+
+def test_relations_down(ont):
+	assert(ont.children('UBERON:3') == [('part_of', 'UBERON:1'), ('part_of', 'UBERON:2')])
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=['UBERON:3', 'UBERON:2'], targets=['CL'],
+							  direction='down')
+	assert(relations.loc['UBERON:3', 'relation_path'] == 'UBERON:3.inverse_part_of~UBERON:1.inverse_part_of~CL:1')
+	assert(relations.loc['UBERON:2', 'relation_text'] == 'ventricle has subclass left ventricle inverse part of cardiac muscle cell')
+
+
+def test_relations_parquet(ont, tmp_path):
+	pytest.importorskip('pyarrow')
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=['CL:1', 'UBERON:5'], targets=['UBERON:4'])
+	relations.to_parquet(tmp_path / 'any.parquet')
+	loaded = opy.read_relations(tmp_path / 'any.parquet')
+	assert(isinstance(loaded['to'].dtype, pd.CategoricalDtype))
+	assert(loaded.loc['CL:1', 'relation_path'] == relations.loc['CL:1', 'relation_path'])
+	assert(loaded['to'].isna().tolist() == [False, True])
+
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=['UBERON:1'], targets=['UBERON'], mode='all')
+	relations.to_parquet(tmp_path / 'all.parquet')
+	loaded = opy.read_relations(tmp_path / 'all.parquet', columns=['to'])
+	assert(loaded.loc['UBERON:1', 'to'] == relations.loc['UBERON:1', 'to'])
+
+	assert(opy.write_relations(tmp_path / 'chunks.parquet', ['is_a', 'part_of'], ont, ['CL:1', 'UBERON:2', 'UBERON:5'],
+							   ['UBERON:4'], chunksize=2) == 3)
+	assert(opy.read_relations(tmp_path / 'chunks.parquet')['to'].tolist()[:2] == ['UBERON:4', 'UBERON:4'])
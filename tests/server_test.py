@@ -0,0 +1,94 @@
+import os
+import ontolopy as opy
+import pandas as pd
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from ontolopy.server import OntologyClient, OntologyServer, ServerError
+
+obo_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'data',
+						'uberon-subset.obo')
+
+
+@pytest.fixture(scope='module')
+def uberon():
+	return opy.uberon_from_obo(opy.load_obo(obo_file, ont_ids=['UBERON', 'CL']))
+
+
+@pytest.fixture(scope='module')
+def server(uberon):
+	with OntologyServer(uberon) as server:
+		yield server
+
+
+def test_relations(uberon, server):
+	client = OntologyClient(server.url)
+	sources = ['CL:0000746', 'UBERON:0002084', 'CL:0000540']
+	expected = opy.Relations(['is_a', 'part_of'], uberon, sources=sources, targets=['UBERON'])
+	relations = client.relations(['is_a', 'part_of'], sources=sources, targets=['UBERON'])
+	pd.testing.assert_frame_equal(relations, pd.DataFrame(expected).astype(object))
+	assert(relations.attrs['incomplete'] == {})
+
+	paths = client.relations(['is_a', 'part_of'], sources=sources[:1], targets=['UBERON'], mode='all')
+	assert(paths['relation_path'].iloc[0] == opy.Relations(['is_a', 'part_of'], uberon, sources=sources[:1],
+														   targets=['UBERON'], mode='all')['relation_path'].iloc[0])
+
+	# cached by the client, then by the server
+	info = client.info()
+	client.relations(['is_a', 'part_of'], sources=sources, targets=['UBERON'])
+	assert(client.info()['cache_misses'] == info['cache_misses'])
+	OntologyClient(server.url).relations(['is_a', 'part_of'], sources=sources, targets=['UBERON'])
+	assert(client.info()['cache_hits'] == info['cache_hits'] + 1)
+
+	with pytest.raises(ServerError):
+		client.relations(['is_a'], sources=sources, targets=None)
+	with pytest.raises(ServerError, match='processes'):
+		client._post('relations', {'allowed_relations': ['is_a'], 'sources': sources, 'processes': 64})
+	with pytest.raises(ServerError, match='cancel'):
+		client._post('sample_map_by_name', {'sample_names': ['heart'], 'cancel': 'x'})
+
+
+def test_incomplete_not_cached(server):
+	client = OntologyClient(server.url)
+	sources = ['CL:0000746', 'UBERON:0002084']
+	info = client.info()
+	for _ in range(2):
+		relations = client.relations(['is_a', 'part_of'], sources=sources, targets=['UBERON'], timeout=0)
+		assert(relations.attrs['incomplete'] == {source: 'timeout' for source in sources})
+	assert(client.info()['cache_misses'] == info['cache_misses'] + 2)
+	assert(client.info()['cache_hits'] == info['cache_hits'])
+	assert(client.cache.hits == 0)
+
+
+def test_sample_map_by_name_and_holds(uberon, server):
+	client = OntologyClient(server.url, cache_size=0)
+	names = {'s1': 'heart', 's2': 'hart', 's3': None}
+	expected = uberon.sample_map_by_name(names, fuzzy=True, min_similarity=0.75)
+	pd.testing.assert_frame_equal(client.sample_map_by_name(names, fuzzy=True, min_similarity=0.75),
+								  expected.astype(object))
+
+	# same order and identifier types as local calls
+	for names in [{'s9': 'heart', 's1': 'lung', 's5': None}, {3: 'heart', 1: 'hart', 2: 'lung'},
+				  pd.Series(['lung', 'heart'], index=[20, 10]), ['lung', 'heart']]:
+		pd.testing.assert_frame_equal(client.sample_map_by_name(names, fuzzy=True, min_similarity=0.75),
+									  uberon.sample_map_by_name(names, fuzzy=True, min_similarity=0.75).astype(object))
+
+	queries = [('UBERON:0002084', 'part_of', 'UBERON:0000948'), ('UBERON:0000948', 'part_of', 'UBERON:0002084'),
+			   ('CL:0000746', 'is_a', 'CL:0000000')]
+	assert(client.holds_batch(queries) == [uberon.holds(*query) for query in queries])
+	assert(client.holds(*queries[0]) == uberon.holds(*queries[0]))
+
+	# concurrent clients
+	with ThreadPoolExecutor(8) as executor:
+		results = list(executor.map(lambda i: client.holds_batch(queries), range(32)))
+	assert(all(result == results[0] for result in results))
+
+
+def test_server_error(server, monkeypatch):
+	def holds(query):
+		raise RuntimeError('broken')
+
+	monkeypatch.setattr(server, 'holds', holds)
+	client = OntologyClient(server.url, cache_size=0)
+	with pytest.raises(ServerError, match='RuntimeError: broken'):
+		client.holds('UBERON:0000948', 'part_of', 'UBERON:0000948')
+	assert('terms' in client.info())
@@ -0,0 +1,54 @@
+import ontolopy as opy
+import numpy as np
+import pytest
+from ontolopy.similarity import Similarity
+
+
+@pytest.fixture
+def ont():
+	return opy.Obo({
+		'UBERON:1': {'id': 'UBERON:1', 'name': 'left ventricle', 'is_a': ['UBERON:2'], 'part_of': ['UBERON:3']},
+		'UBERON:2': {'id': 'UBERON:2', 'name': 'ventricle', 'part_of': ['UBERON:3']},
+		'UBERON:3': {'id': 'UBERON:3', 'name': 'heart', 'part_of': ['UBERON:4']},
+		'UBERON:4': {'id': 'UBERON:4', 'name': 'circulatory system'},
+		'UBERON:6': {'id': 'UBERON:6', 'name': 'atrium', 'part_of': ['UBERON:3']},
+		'CL:1': {'id': 'CL:1', 'name': 'cardiac muscle cell', 'part_of': ['UBERON:1']},
+	})
+
+
+def test_information_content(ont):
+	similarity = ont.similarity()
+	ic = similarity.information_content
+	assert(ic['UBERON:4'] == 0)
+	assert(np.isclose(ic['UBERON:3'], -np.log(5 / 6)))
+	assert(np.isclose(ic['CL:1'], np.log(6)))
+
+	corpus = Similarity(ont, annotations=['UBERON:1', 'UBERON:1', 'UBERON:6', 'CL:1'])
+	assert(np.isclose(corpus.information_content['UBERON:1'], -np.log(3 / 4)))
+	assert(corpus.information_content['UBERON:2'] == corpus.information_content['UBERON:1'])
+
+
+def test_common_ancestors(ont):
+	similarity = ont.similarity()
+	assert(similarity.common_ancestors('CL:1', 'UBERON:6') == {'UBERON:3', 'UBERON:4'})
+	assert(similarity.lowest_common_ancestors('CL:1', 'UBERON:2') == {'UBERON:2'})
+	assert(similarity.lowest_common_ancestors('UBERON:1', 'UBERON:6') == {'UBERON:3'})
+	assert(similarity.most_informative_common_ancestor('CL:1', 'UBERON:6') == 'UBERON:3')
+
+
+def test_similarity_matrices(ont):
+	similarity = ont.similarity()
+	ic = similarity.information_content
+	terms_a = ['CL:1', 'UBERON:1', 'UBERON:4', 'UBERON:7']
+	terms_b = ['UBERON:6', 'UBERON:2', 'CL:1']
+	resnik = similarity.resnik(terms_a, terms_b)
+	assert(resnik.shape == (4, 3))
+	for i, a in enumerate(terms_a):
+		for j, b in enumerate(terms_b):
+			mica = similarity.most_informative_common_ancestor(a, b)
+			assert(np.isclose(resnik[i, j], 0 if mica is None else ic[mica]))
+
+	lin = similarity.lin(terms_a, dtype=np.float32)
+	assert(lin.dtype == np.float32)
+	assert(np.allclose(np.diag(lin), [1, 1, 1, 0]))
+	assert(np.isclose(lin[0, 1], 2 * ic['UBERON:1'] / (ic['CL:1'] + ic['UBERON:1'])))
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+obo_file = os.path.join(package_dir, 'benchmarks', 'data', 'uberon-subset.obo')
+
+
+def _run(code):
+	return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=package_dir,
+						  env=dict(os.environ, PYTHONPATH=package_dir)).stdout.split()
+
+
+def test_import_time():
+	seconds, *loaded = _run(
+		'import sys, time\n'
+		'start = time.perf_counter()\n'
+		'import ontolopy\n'
+		'print(time.perf_counter() - start)\n'
+		'print(*[module for module in ["pandas", "numpy", "validators", "urllib.request"] if module in sys.modules])\n')
+	print(f'import ontolopy: {float(seconds):.3f}s')
+	# no timing assertion, which would be flaky on slow CI machines: not importing these modules is what matters
+	assert(loaded == [])
+
+
+def test_lazy_imports():
+	loaded = _run(
+		'import sys, ontolopy as opy\n'
+		f'ont = opy.load_obo({obo_file!r}, ont_ids=["UBERON", "CL"])\n'
+		'ont.name_index()\n'
+		'print(*[module for module in ["pandas", "numpy"] if module in sys.modules])\n'
+		'opy.Relations\n'
+		'print(*[module for module in ["pandas", "numpy"] if module in sys.modules])\n')
+	assert(loaded == ['pandas', 'numpy'])
@@ -0,0 +1,74 @@
+import ontolopy as opy
+import pytest
+from ontolopy.synthetic import write_synthetic_obo
+
+
+@pytest.fixture
+def ont():
+	return opy.Obo({
+		'UBERON:1': {'id': 'UBERON:1', 'name': 'left ventricle', 'is_a': ['UBERON:2'], 'part_of': ['UBERON:3']},
+		'UBERON:2': {'id': 'UBERON:2', 'name': 'ventricle', 'part_of': ['UBERON:3']},
+		'UBERON:3': {'id': 'UBERON:3', 'name': 'heart', 'part_of': ['UBERON:4', 'UBERON:1']},
+		'UBERON:4': {'id': 'UBERON:4', 'name': 'circulatory system'},
+		'CL:1': {'id': 'CL:1', 'name': 'cardiac muscle cell', 'part_of': ['UBERON:1']},
+	})
+
+
+def test_relations_stats(ont):
+	relations = opy.Relations(['is_a', 'part_of'], ont, sources=['CL:1'], targets=['UBERON:4'])
+	assert(relations.stats is None)
+
+	calls = []
+	with opy.stats.collect(callback=calls.append) as stats:
+		relations = opy.Relations(['is_a', 'part_of'], ont, sources=['CL:1', 'UBERON:2'], targets=['UBERON:4'],
+								  mode='all')
+		ont._ancestor_closure(['is_a'])
+		ont._ancestor_closure(['is_a'])
+	assert(calls == [stats])
+	assert(not opy.stats.recording())
+
+	assert(relations.stats.calls['find_relation'] == 2)
+	assert(relations.stats.calls['relation_path_to_text'] == 2)
+	assert(set(relations.stats.timings) == {'relations', 'find_relation', 'relation_path_to_text',
+											'relations.dataframe'})
+	assert('build.ancestor_closure' in stats.timings)
+	assert(relations.stats.counts['paths_found'] == 2)
+	assert(relations.stats.counts['cycle_skips'] > 0)
+	assert(relations.stats.maxima['frontier_size'] == 2)
+	assert(stats.counts['cache_hits'] > relations.stats.counts['cache_hits'])
+	assert(stats.counts['paths_found'] == 2)
+
+
+def test_load_obo_stats(tmp_path):
+	write_synthetic_obo(tmp_path / 'synthetic.obo', n_terms=100, obsolete_probability=0)
+	stats = opy.stats.enable()
+	ont = opy.load_obo(str(tmp_path / 'synthetic.obo'), ont_ids=['SYN'])
+	assert(opy.stats.disable() is stats)
+	assert(opy.stats.disable() is None)
+
+	assert(ont.stats.counts['terms_loaded'] == 100)
+	assert(set(ont.stats.timings) == {'load_obo', 'load_obo.parse', 'load_obo.typedefs'})
+	assert(stats.timings['load_obo'] == ont.stats.timings['load_obo'])
+	assert(opy.load_obo(str(tmp_path / 'synthetic.obo'), ont_ids=['SYN']).stats is None)
+
+
+def test_collect_threads(ont):
+	import threading
+	barrier = threading.Barrier(2)
+	results = {}
+
+	def run(sources):
+		with opy.stats.collect() as stats:
+			barrier.wait()  # both threads are collecting
+			opy.Relations(['is_a', 'part_of'], ont, sources=sources, targets=['UBERON:4'], mode='all')
+			barrier.wait()
+		results[len(sources)] = stats
+
+	threads = [threading.Thread(target=run, args=(sources,)) for sources in [['CL:1'], ['CL:1', 'UBERON:1', 'UBERON:2']]]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	assert(results[1].calls['find_relation'] == 1)
+	assert(results[3].calls['find_relation'] == 3)
+	assert(not opy.stats.recording())
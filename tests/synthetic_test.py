@@ -0,0 +1,23 @@
+import ontolopy as opy
+from ontolopy.synthetic import synthetic_obo, write_synthetic_obo
+
+
+def test_synthetic_obo(tmp_path):
+	ont = synthetic_obo(n_terms=2000, depth=5, branching=3, obsolete_probability=0.05, seed=1)
+	assert(len(ont) == 2000)
+	assert(ont == synthetic_obo(n_terms=2000, depth=5, branching=3, obsolete_probability=0.05, seed=1))
+	assert(ont != synthetic_obo(n_terms=2000, depth=5, branching=3, obsolete_probability=0.05, seed=2))
+
+	levels = ont._levels(['is_a', 'part_of', 'develops_from'])
+	assert(len(levels) == 2000)
+	assert(max(levels.values()) < 5 * 2)
+	assert(any(len(attributes.get('is_a', [])) > 1 for attributes in ont.values()))
+	assert(any('is_obsolete' in attributes for attributes in ont.values()))
+	tree = synthetic_obo(n_terms=500, branching=3, fan_in=0, seed=1)
+	assert(all(len(tree.children(term, ['is_a'])) <= 3 for term in tree))
+
+	assert(write_synthetic_obo(tmp_path / 'synthetic.obo.gz', n_terms=2000, depth=5, branching=3,
+							   obsolete_probability=0.05, seed=1) == 2000)
+	loaded = opy.load_obo(str(tmp_path / 'synthetic.obo.gz'), ont_ids=['SYN', 'XSYN'], discard_obsolete=False)
+	assert(loaded == ont)
+	assert(loaded.typedefs == ont.typedefs)
@@ -0,0 +1,113 @@
+import ontolopy as opy
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def uberon():
+	return opy.uberon_from_obo(opy.Obo({
+		'UBERON:0000061': {'id': 'UBERON:0000061', 'name': 'anatomical structure'},
+		'UBERON:0000948': {'id': 'UBERON:0000948', 'name': 'heart', 'is_a': ['UBERON:0000061'],
+						   'synonym': ['"cardium" EXACT []', '"chambered heart" NARROW [FMA:7088]'], 'FMA': ['FMA:7088']},
+		'UBERON:0002084': {'id': 'UBERON:0002084', 'name': 'heart left ventricle', 'part_of': ['UBERON:0000948'],
+						   'synonym': ['"left ventricle" EXACT []']},
+		'UBERON:0002082': {'id': 'UBERON:0002082', 'name': 'cardiac ventricle', 'part_of': ['UBERON:0000948'],
+						   'synonym': ['"chambered heart" EXACT [FMA:7100]'], 'FMA': ['FMA:7100']},
+		'FF:1': {'id': 'FF:1', 'name': 'heart sample', 'is_model_for': ['UBERON:0000948'], 'is_a': ['FF:2']},
+		'FF:2': {'id': 'FF:2', 'name': 'sample'},
+		'CL:1': {'id': 'CL:1', 'name': 'cardiac muscle cell', 'part_of': ['UBERON:0002084']},
+	}))
+
+
+def test_mapper(uberon):
+	samples = ['CL:1', 'FF:1', 'CL:1', 'UBERON:0002084']
+	by_ont = uberon.sample_map_by_ont(samples, relation_types=['is_a', 'part_of', 'is_model_for'])
+	mapper = uberon.mapper(relation_types=['is_a', 'part_of', 'is_model_for'])
+	mapped = mapper.map(samples)
+	pd.testing.assert_frame_equal(mapped, pd.DataFrame(by_ont), check_dtype=False, check_index_type=False)
+	assert(len(mapper) == 3)
+	assert(mapper.warm_up().memory_usage()['terms'] == len(uberon))
+
+
+def test_sample_map_by_name(uberon):
+	sample_names = pd.Series({'s1': 'Heart', 's2': 'chambered heart', 's3': 'Left ventricle, heart', 's4': 'hart',
+							  's5': 'left ventricle'})
+	mapped = uberon.sample_map_by_name(sample_names)
+	assert(list(mapped['to'].fillna('')) == ['UBERON:0000948', 'UBERON:0000948', '', '', 'UBERON:0002084'])
+	assert(uberon.sample_map_by_name(sample_names, xref='FMA').loc['s2', 'to'] == 'UBERON:0002082')
+
+	mapped = uberon.sample_map_by_name(sample_names, fuzzy=True, min_similarity=0.75)
+	assert(list(mapped['to']) == ['UBERON:0000948', 'UBERON:0000948', 'UBERON:0002084', 'UBERON:0000948',
+								  'UBERON:0002084'])
+
+
+def test_edit_distance():
+	assert(opy.names._edit_distance('heart', 'hart', 2) == 1)
+	assert(opy.names._edit_distance('kitten', 'sitting', 2) == 3)
+	assert(opy.names._edit_distance('kitten', 'sitting', 5) == 3)
+
+
+def test_candidates_boundary():
+	index = opy.names.NameIndex({'UBERON:1': {'id': 'UBERON:1', 'name': 'myocardium'}})
+	# one edit in ten characters: similarity exactly 0.9
+	assert(index.match('myocardiu', fuzzy=True, min_similarity=0.9) is None)
+	assert(index.match('myocardiux', fuzzy=True, min_similarity=0.9) == 'UBERON:1')
+	assert(index.candidates('myocardiux', 0.9) == [('myocardium', 0.9)])
+
+
+def test_sample_map_by_name_chunked(uberon):
+	names = ['heart', 'left ventricle', 'hart', None, 'heart'] * 3
+	expected = uberon.sample_map_by_name(names, fuzzy=True, min_similarity=0.75)
+	assert(list(expected.index) == list(range(len(names))))
+	index = uberon.name_index(['UBERON'])
+	mapped = uberon.sample_map_by_name(iter(names), fuzzy=True, min_similarity=0.75, processes=2, chunksize=1,
+									   name_index=index)
+	pd.testing.assert_frame_equal(mapped, expected)
+
+
+def test_match_names_interleaved(uberon):
+	from ontolopy.names import match_names
+
+	uberon_names = match_names(uberon.name_index(['UBERON']), ['heart', 'cardiac muscle cell'], chunksize=1)
+	cl_names = match_names(uberon.name_index(['CL']), ['cardiac muscle cell', 'heart'], chunksize=1)
+	assert([next(uberon_names), next(cl_names), next(uberon_names), next(cl_names)] ==
+		   ['UBERON:0000948', 'CL:1', None, None])
+
+
+def test_restrict_to_taxon():
+	uberon = opy.uberon_from_obo(opy.Obo({
+		'UBERON:1': {'id': 'UBERON:1', 'name': 'heart'},
+		'UBERON:2': {'id': 'UBERON:2', 'name': 'swim bladder', 'only_in_taxon': ['NCBITaxon:7898']},
+		'UBERON:3': {'id': 'UBERON:3', 'name': 'mammary gland', 'never_in_taxon': ['NCBITaxon:7898'],
+					 'present_in_taxon': ['NCBITaxon:40674']},
+		'UBERON:4': {'id': 'UBERON:4', 'name': 'odd thing', 'dubious_for_taxon': ['NCBITaxon:9606'],
+					 'part_of': ['UBERON:1']},
+		'CL:1': {'id': 'CL:1', 'name': 'cell', 'never_in_taxon': ['NCBITaxon:9606']},
+	}))
+	taxonomy = opy.Obo({
+		'NCBITaxon:9606': {'id': 'NCBITaxon:9606', 'name': 'Homo sapiens', 'is_a': ['NCBITaxon:40674']},
+		'NCBITaxon:40674': {'id': 'NCBITaxon:40674', 'name': 'Mammalia', 'is_a': ['NCBITaxon:7742']},
+		'NCBITaxon:7955': {'id': 'NCBITaxon:7955', 'name': 'Danio rerio', 'is_a': ['NCBITaxon:7898']},
+		'NCBITaxon:7898': {'id': 'NCBITaxon:7898', 'name': 'Actinopterygii', 'is_a': ['NCBITaxon:7742']},
+		'NCBITaxon:7742': {'id': 'NCBITaxon:7742', 'name': 'Vertebrata'},
+	})
+
+	human = uberon.restrict_to_taxon('NCBITaxon:9606', taxonomy)
+	assert(isinstance(human, opy.obo.OboView))
+	assert(set(human.terms) == {'UBERON:1', 'UBERON:3', 'CL:1'})
+	assert(human['UBERON:1'] is uberon['UBERON:1'])
+	assert(set(uberon.restrict_to_taxon('NCBITaxon:9606', taxonomy, keep_dubious=True)) ==
+		   {'UBERON:1', 'UBERON:3', 'UBERON:4', 'CL:1'})
+	assert(set(uberon.restrict_to_taxon('NCBITaxon:9606', taxonomy, only_yes=True)) == {'UBERON:3', 'CL:1'})
+	zebrafish = uberon.restrict_to_taxon('NCBITaxon:7955', taxonomy)
+	assert(set(zebrafish) == {'UBERON:1', 'UBERON:2', 'UBERON:4', 'CL:1'})
+
+	# Uberon methods work on the view:
+	mapped = zebrafish.sample_map_by_name({'s1': 'mammary gland', 's2': 'swim bladder'})
+	assert(list(mapped['to'].fillna('')) == ['', 'UBERON:2'])
+	assert(zebrafish.leaves == {'UBERON:2', 'UBERON:4', 'CL:1'})
+
+
+def test_sample_map_by_ont_child_mapping(uberon):
+	mapped = uberon.sample_map_by_ont(['UBERON:0000948'], to=['CL'], child_mapping=True)
+	assert(mapped.loc['UBERON:0000948', 'to'] == 'CL:1')